@@ -0,0 +1,2 @@
+# Oturum event hook'larını (önbellek geçersiz kılma, müşteri özeti) kaydeder
+from app.crud import customer_cache, customer_summary_crud  # noqa: F401
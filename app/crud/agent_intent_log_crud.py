@@ -1,18 +1,24 @@
+from sqlalchemy import insert
 from sqlmodel import Session, select
-from typing import List, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, Iterator, List, Mapping, Optional, Sequence
 from datetime import datetime
 from app.models.agentintentlog import AgentIntentLog
-from app.db.database import engine
+from app.db.database import session_scope, commit_session
+from app.db.replica import read_session_scope
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Page, paginate, page_query
+from app.crud.export import date_range_query, stream_rows
+from app.crud.customer_summary_crud import mark_rows_inserted
 from app.utils.logging_config import get_logger, log_database_operation, log_error
 
 logger = get_logger('app.crud.agent_intent_log')
 
 
-def get_agent_intent_logs() -> List[AgentIntentLog]:
+def get_agent_intent_logs(session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[AgentIntentLog]:
     """Tüm agent intent loglarını getir"""
     try:
         logger.info("Fetching all agent intent logs")
-        with Session(engine) as session:
+        with read_session_scope(session, max_lag) as session:
             result = session.exec(select(AgentIntentLog)).all()
             log_database_operation("SELECT", "agent_intent_logs", details=f"Retrieved {len(result)} records")
             return result
@@ -21,11 +27,17 @@ def get_agent_intent_logs() -> List[AgentIntentLog]:
         raise
 
 
-def get_agent_intent_log_by_id(log_id: int) -> Optional[AgentIntentLog]:
+def get_agent_intent_logs_page(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, as_rows: bool = False, session: Optional[Session] = None, max_lag: Optional[float] = None) -> Page:
+    """Agent intent loglarını en yeniden eskiye sayfalı getir (as_rows: ORM nesnesi yerine kolon satırları)"""
+    with read_session_scope(session, max_lag) as session:
+        return paginate(session, page_query(AgentIntentLog, as_rows), [AgentIntentLog.created_at, AgentIntentLog.id], limit, cursor, descending=True)
+
+
+def get_agent_intent_log_by_id(log_id: int, session: Optional[Session] = None) -> Optional[AgentIntentLog]:
     """ID'ye göre agent intent log getir"""
     try:
         logger.info(f"Fetching agent intent log by ID: {log_id}")
-        with Session(engine) as session:
+        with session_scope(session) as session:
             result = session.get(AgentIntentLog, log_id)
             if result:
                 log_database_operation("SELECT", "agent_intent_logs", record_id=log_id, details="Record found")
@@ -37,23 +49,42 @@ def get_agent_intent_log_by_id(log_id: int) -> Optional[AgentIntentLog]:
         raise
 
 
-def get_agent_intent_logs_by_user(user_id: int) -> List[AgentIntentLog]:
+def get_agent_intent_logs_by_user(user_id: int, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[AgentIntentLog]:
     """Kullanıcıya göre agent intent loglarını getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(AgentIntentLog).where(AgentIntentLog.user_id == user_id)
         return session.exec(query).all()
 
 
-def get_agent_intent_logs_by_intent(intent: str) -> List[AgentIntentLog]:
+async def get_agent_intent_logs_by_user_async(session: AsyncSession, user_id: int) -> List[AgentIntentLog]:
+    """Kullanıcıya göre agent intent loglarını getir (async)"""
+    query = select(AgentIntentLog).where(AgentIntentLog.user_id == user_id)
+    result = await session.exec(query)
+    return result.all()
+
+
+async def get_recent_agent_intent_logs_by_user_async(session: AsyncSession, user_id: int, limit: int = 20) -> List[AgentIntentLog]:
+    """Kullanıcının en son agent intent loglarını getir (async)"""
+    query = (
+        select(AgentIntentLog)
+        .where(AgentIntentLog.user_id == user_id)
+        .order_by(AgentIntentLog.created_at.desc())
+        .limit(limit)
+    )
+    result = await session.exec(query)
+    return result.all()
+
+
+def get_agent_intent_logs_by_intent(intent: str, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[AgentIntentLog]:
     """Intent'e göre logları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(AgentIntentLog).where(AgentIntentLog.intent == intent)
         return session.exec(query).all()
 
 
-def get_agent_intent_logs_by_date_range(start_date: datetime, end_date: datetime) -> List[AgentIntentLog]:
+def get_agent_intent_logs_by_date_range(start_date: datetime, end_date: datetime, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[AgentIntentLog]:
     """Belirli bir tarih aralığındaki logları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(AgentIntentLog).where(
             AgentIntentLog.created_at >= start_date,
             AgentIntentLog.created_at <= end_date
@@ -61,13 +92,13 @@ def get_agent_intent_logs_by_date_range(start_date: datetime, end_date: datetime
         return session.exec(query).all()
 
 
-def create_agent_intent_log(agent_intent_log: AgentIntentLog) -> AgentIntentLog:
+def create_agent_intent_log(agent_intent_log: AgentIntentLog, session: Optional[Session] = None) -> AgentIntentLog:
     """Yeni agent intent log oluştur"""
     try:
         logger.info(f"Creating new agent intent log for user: {agent_intent_log.user_id}, intent: {agent_intent_log.intent}")
-        with Session(engine) as session:
+        with session_scope(session) as session:
             session.add(agent_intent_log)
-            session.commit()
+            commit_session(session)
             session.refresh(agent_intent_log)
             log_database_operation("INSERT", "agent_intent_logs", record_id=agent_intent_log.id, 
                                  details=f"User: {agent_intent_log.user_id}, Intent: {agent_intent_log.intent}")
@@ -78,29 +109,58 @@ def create_agent_intent_log(agent_intent_log: AgentIntentLog) -> AgentIntentLog:
         raise
 
 
-def update_agent_intent_log(log_id: int, log_data: dict) -> Optional[AgentIntentLog]:
+def create_agent_intent_logs(agent_intent_logs: Sequence[AgentIntentLog], session: Optional[Session] = None) -> List[int]:
+    """Birden fazla agent intent log'u tek (çok satırlı) INSERT ile ekle, id'leri aynı sırayla döner
+
+    ORM flush'ı atlandığı için etkilenen müşterilerin özet ve önbellek güncellemeleri
+    açıkça işaretlenir.
+    """
+    if not agent_intent_logs:
+        return []
+    records = [log.model_dump(exclude={"id"}) for log in agent_intent_logs]
+    table = AgentIntentLog.__table__
+    try:
+        with session_scope(session) as session:
+            connection = session.connection()
+            # SQLite RETURNING sırasını garanti etmez; SQLAlchemy sıralı istekte satır başına
+            # INSERT'e düşer. Tek INSERT'te id'ler VALUES sırasıyla artarak verildiğinden sıralamak yeter.
+            ordered = connection.dialect.name != "sqlite"
+            result = connection.execute(
+                insert(table).returning(table.c.id, sort_by_parameter_order=ordered), records
+            )
+            ids = result.scalars().all() if ordered else sorted(result.scalars().all())
+            mark_rows_inserted(session, AgentIntentLog, records)
+            commit_session(session)
+            log_database_operation("INSERT", "agent_intent_logs", details=f"Bulk inserted {len(ids)} records")
+            return ids
+    except Exception as e:
+        log_error(e, f"Error bulk creating {len(records)} agent intent logs")
+        raise
+
+
+def update_agent_intent_log(log_id: int, log_data: dict, session: Optional[Session] = None) -> Optional[AgentIntentLog]:
     """Agent intent log bilgilerini güncelle"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         agent_intent_log = session.get(AgentIntentLog, log_id)
         if agent_intent_log:
             for key, value in log_data.items():
                 setattr(agent_intent_log, key, value)
             session.add(agent_intent_log)
-            session.commit()
+            commit_session(session)
             session.refresh(agent_intent_log)
             return agent_intent_log
         return None
 
 
-def delete_agent_intent_log(log_id: int) -> bool:
+def delete_agent_intent_log(log_id: int, session: Optional[Session] = None) -> bool:
     """Agent intent log sil"""
     try:
         logger.info(f"Deleting agent intent log with ID: {log_id}")
-        with Session(engine) as session:
+        with session_scope(session) as session:
             agent_intent_log = session.get(AgentIntentLog, log_id)
             if agent_intent_log:
                 session.delete(agent_intent_log)
-                session.commit()
+                commit_session(session)
                 log_database_operation("DELETE", "agent_intent_logs", record_id=log_id, details="Successfully deleted")
                 logger.info(f"Successfully deleted agent intent log with ID: {log_id}")
                 return True
@@ -112,18 +172,25 @@ def delete_agent_intent_log(log_id: int) -> bool:
         raise
 
 
-def get_recent_agent_intent_logs(limit: int = 50) -> List[AgentIntentLog]:
+def get_recent_agent_intent_logs(limit: int = 50, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[AgentIntentLog]:
     """En son logları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(AgentIntentLog).order_by(AgentIntentLog.created_at.desc()).limit(limit)
         return session.exec(query).all()
 
 
-def get_agent_intent_logs_by_user_and_intent(user_id: int, intent: str) -> List[AgentIntentLog]:
+def get_agent_intent_logs_by_user_and_intent(user_id: int, intent: str, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[AgentIntentLog]:
     """Kullanıcı ve intent'e göre logları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(AgentIntentLog).where(
             AgentIntentLog.user_id == user_id,
             AgentIntentLog.intent == intent
         )
         return session.exec(query).all()
+
+
+def iter_agent_intent_logs_for_export(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                                      max_lag: Optional[float] = None) -> Iterator[Mapping[str, Any]]:
+    """Agent intent loglarını tarih aralığına göre export için akıt"""
+    query = date_range_query(AgentIntentLog.__table__, AgentIntentLog.created_at, start_date, end_date)
+    return stream_rows(query.order_by(AgentIntentLog.created_at, AgentIntentLog.id), max_lag=max_lag)
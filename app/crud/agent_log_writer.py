@@ -0,0 +1,192 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlmodel import Session
+from app.db.config import get_settings
+from app.models.agentintentlog import AgentIntentLog
+from app.crud.agent_intent_log_crud import create_agent_intent_log, create_agent_intent_logs
+from app.utils.logging_config import get_logger, log_error
+
+logger = get_logger('app.crud.agent_log_writer')
+
+settings = get_settings()
+
+# Başarısız toplu yazma bu kadar kez, artan beklemeyle tekrar denenir
+MAX_WRITE_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 0.5
+# Satırın kendisinden kaynaklanan hatalar (FK/NOT NULL ihlali, geçersiz değer) tekrar denemeyle düzelmez
+ROW_ERRORS = (IntegrityError, DataError)
+
+
+class AgentLogQueueFullError(RuntimeError):
+    """Yazma kuyruğu dolu ve kayıt bekleme süresi içinde kuyruğa alınamadı (backpressure)"""
+
+
+class AgentLogWriteTimeoutError(AgentLogQueueFullError):
+    """Dayanıklı modda kaydın batch'i bekleme süresi içinde commit edilmedi (backpressure)
+
+    Kayıt kuyrukta kalır ve daha sonra yazılabilir; istemci tekrar denerken bunu hesaba katmalı.
+    """
+
+
+class AgentLogWriter:
+    """Agent intent loglarını sınırlı bir kuyrukta toplayıp arka planda toplu yazan yazıcı
+
+    Kayıtlar batch_size'a ulaşınca ya da ilk kayıttan flush_interval saniye sonra tek
+    INSERT ile yazılır. Kuyruk doluysa submit() en fazla timeout kadar bekler, sonra
+    AgentLogQueueFullError fırlatır. submit() dönen Future, kaydın batch'i commit
+    edildiğinde id ile tamamlanır; senkron dayanıklılık için sonucu beklemek yeterlidir.
+    Batch'teki hatalı bir kayıt yalnızca kendi Future'ını hatayla tamamlar, diğerleri yazılır.
+    """
+
+    def __init__(self, queue_size: int, batch_size: int, flush_interval: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Tuple[AgentIntentLog, Future]]" = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.enqueued = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="agent-log-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, agent_intent_log: AgentIntentLog, timeout: Optional[float] = None) -> Future:
+        """Kaydı kuyruğa al; Future yazılan kaydın id'si ile tamamlanır"""
+        if self._stopping.is_set():
+            raise AgentLogQueueFullError("Agent log writer is shutting down")
+        self.start()
+        future: Future = Future()
+        try:
+            self._queue.put((agent_intent_log, future), timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise AgentLogQueueFullError(f"Agent log queue is full ({self._queue.maxsize} records)")
+        with self._lock:
+            self.enqueued += 1
+        return future
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Yeni kayıt almayı bırak, kuyrukta kalanları yazıp arka plan thread'ini durdur"""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        logger.info(f"Agent log writer stopped, {self._queue.qsize()} records left unwritten")
+
+    def _run(self) -> None:
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self) -> List[Tuple[AgentIntentLog, Future]]:
+        # Kapanırken beklemeden boşalt
+        wait = 0 if self._stopping.is_set() else self.flush_interval
+        try:
+            batch = [self._queue.get(timeout=wait) if wait else self._queue.get_nowait()]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Tuple[AgentIntentLog, Future]]) -> None:
+        """Batch'i yaz; satır hatasında batch ikiye bölünür, yalnızca hatalı kayıtların Future'ı başarısız olur"""
+        try:
+            ids = self._insert(batch)
+        except ROW_ERRORS as e:
+            if len(batch) == 1:
+                self._fail(batch, e, f"Rejected agent intent log for user: {batch[0][0].user_id}")
+                return
+            middle = len(batch) // 2
+            self._write(batch[:middle])
+            self._write(batch[middle:])
+            return
+        except Exception as e:
+            self._fail(batch, e, f"Dropping {len(batch)} agent intent logs after {MAX_WRITE_ATTEMPTS} failed attempts")
+            return
+        with self._lock:
+            self.written += len(ids)
+            self.batches += 1
+        for (_, future), log_id in zip(batch, ids):
+            future.set_result(log_id)
+
+    def _insert(self, batch: List[Tuple[AgentIntentLog, Future]]) -> List[int]:
+        """Geçici hatalarda (bağlantı, kilit, ...) artan beklemeyle tekrar dene; satır hatalarını hemen ilet"""
+        logs = [agent_intent_log for agent_intent_log, _ in batch]
+        for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+            try:
+                return create_agent_intent_logs(logs)
+            except ROW_ERRORS:
+                raise
+            except Exception:
+                if attempt == MAX_WRITE_ATTEMPTS:
+                    raise
+                time.sleep(RETRY_BACKOFF_SECONDS * attempt)
+
+    def _fail(self, batch: List[Tuple[AgentIntentLog, Future]], error: Exception, message: str) -> None:
+        log_error(error, message)
+        with self._lock:
+            self.failed += len(batch)
+        for _, future in batch:
+            future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "queued": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "batch_size": self.batch_size,
+                "flush_interval_seconds": self.flush_interval,
+                "enqueued": self.enqueued,
+                "rejected": self.rejected,
+                "written": self.written,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
+
+
+agent_log_writer = AgentLogWriter(
+    queue_size=settings.AGENT_LOG_QUEUE_SIZE,
+    batch_size=settings.AGENT_LOG_BATCH_SIZE,
+    flush_interval=settings.AGENT_LOG_FLUSH_INTERVAL,
+)
+
+
+def ingest_agent_intent_log(agent_intent_log: AgentIntentLog, session: Optional[Session] = None) -> AgentIntentLog:
+    """Logu AGENT_LOG_INGEST_MODE ayarına göre hemen yaz ya da toplu yazma kuyruğuna al
+
+    write_behind modunda log kuyruğa alınıp id'siz döner; AGENT_LOG_DURABLE açıksa
+    batch'i en fazla AGENT_LOG_DURABLE_TIMEOUT kadar beklenir ve id ile döner. Süre
+    aşılırsa dolu kuyrukla aynı şekilde ele alınsın diye AgentLogWriteTimeoutError fırlatılır.
+    """
+    if settings.AGENT_LOG_INGEST_MODE != "write_behind":
+        return create_agent_intent_log(agent_intent_log, session=session)
+    future = agent_log_writer.submit(agent_intent_log, timeout=settings.AGENT_LOG_ENQUEUE_TIMEOUT)
+    if settings.AGENT_LOG_DURABLE:
+        try:
+            agent_intent_log.id = future.result(timeout=settings.AGENT_LOG_DURABLE_TIMEOUT)
+        except FutureTimeoutError:
+            raise AgentLogWriteTimeoutError(
+                f"Agent log was not committed within {settings.AGENT_LOG_DURABLE_TIMEOUT} seconds"
+            )
+    return agent_intent_log
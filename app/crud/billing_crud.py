@@ -0,0 +1,514 @@
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import exists, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from app.models.billingrun import BillingRun, BillingRunPartition
+from app.models.invoice import Invoice
+from app.models.invoiceitem import InvoiceItem
+from app.models.package import Package
+from app.models.servicepurchase import ServicePurchase
+from app.models.subscription import Subscription
+from app.db.config import get_settings
+from app.db.database import session_scope, commit_session
+from app.db.migrations import INVOICE_PERIOD_INDEX, ensure_invoice_period_index
+from app.db.sql_functions import dialect_insert
+from app.crud.customer_summary_crud import mark_rows_inserted
+from app.crud.invoice_number import next_invoice_numbers
+from app.utils.billing_calculator import DEFAULT_TAX_RATE, BatchAmounts, batch_amounts, from_cents
+from app.utils.logging_config import get_logger, log_error, setup_logging
+
+logger = get_logger('app.crud.billing')
+
+settings = get_settings()
+
+# Tek transaction'da faturası kesilen en fazla kullanıcı (checkpoint aralığı)
+BILLING_CHUNK_SIZE = 1000
+PAYMENT_DUE_DAYS = 15
+# Paralel çalışmada worker başına düşen user_id aralığı; küçük aralıklar yükü dengeler ve tekrar denemeyi ucuzlatır
+PARTITIONS_PER_WORKER = 4
+# Başarısız aralıklar bu kadar tura kadar, artan beklemeyle tekrar denenir
+MAX_PARTITION_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 1.0
+
+
+def month_period(year: int, month: int) -> Tuple[datetime, datetime]:
+    """Ayın ilk günü ve bir sonraki ayın ilk günü (bitiş hariç)"""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def get_billing_run(run_id: int, session: Optional[Session] = None) -> Optional[BillingRun]:
+    """ID'ye göre fatura kesim çalışmasını getir"""
+    with session_scope(session) as session:
+        return session.get(BillingRun, run_id)
+
+
+def get_billing_runs(limit: int = 20, session: Optional[Session] = None) -> List[BillingRun]:
+    """En son fatura kesim çalışmalarını getir"""
+    with session_scope(session) as session:
+        return session.exec(select(BillingRun).order_by(BillingRun.period_start.desc()).limit(limit)).all()
+
+
+def get_billing_run_partitions(run_id: int, session: Optional[Session] = None) -> List[BillingRunPartition]:
+    """Çalışmanın user_id aralıklarını ve her birinin ilerlemesini getir"""
+    with session_scope(session) as session:
+        return session.exec(
+            select(BillingRunPartition).where(BillingRunPartition.run_id == run_id).order_by(BillingRunPartition.user_id_from)
+        ).all()
+
+
+def get_or_create_billing_run(period_start: datetime, period_end: datetime, session: Optional[Session] = None) -> BillingRun:
+    """Dönemin çalışma kaydını getir, yoksa oluştur (dönem başına tek kayıt)"""
+    query = select(BillingRun).where(BillingRun.period_start == period_start, BillingRun.period_end == period_end)
+    with session_scope(session) as session:
+        run = session.exec(query).first()
+        if run is None:
+            run = BillingRun(period_start=period_start, period_end=period_end)
+            session.add(run)
+            try:
+                commit_session(session)
+            except IntegrityError:
+                # Aynı dönem için eş zamanlı başlatılan çalışma kaydı oluşturdu
+                session.rollback()
+                return session.exec(query).one()
+            session.refresh(run)
+        return run
+
+
+class BillingRunActiveError(Exception):
+    """Dönemin çalışması başka bir çalıştırıcı tarafından yürütülüyor"""
+
+
+class InvoicePeriodIndexMissingError(RuntimeError):
+    """Mükerrer dönem faturaları temizlenmeden toplu fatura kesimi yapılamaz"""
+
+
+def require_invoice_period_index(session: Optional[Session] = None) -> None:
+    """Toplu kesimin ON CONFLICT hedefi olan dönem index'ini gerekirse oluştur, oluşturulamıyorsa hata ver"""
+    with session_scope(session) as session:
+        ready = ensure_invoice_period_index(session.connection())
+        commit_session(session)
+    if not ready:
+        raise InvoicePeriodIndexMissingError(
+            f"{INVOICE_PERIOD_INDEX} is missing because some users have more than one invoice for the same "
+            "billing period; list them with python -m app.jobs.invoice_period_duplicates and resolve them first"
+        )
+
+
+def _last_heartbeat(session: Session, run: BillingRun) -> Optional[datetime]:
+    # Tek process'te çalışma satırı, paralel çalışmada aralık satırları her parçada güncellenir
+    partition_beat = session.exec(
+        select(func.max(BillingRunPartition.updated_at)).where(BillingRunPartition.run_id == run.id)
+    ).one()
+    return max((beat for beat in (run.updated_at, partition_beat) if beat is not None), default=None)
+
+
+def is_billing_run_active(run: BillingRun, session: Optional[Session] = None) -> bool:
+    """Çalışma 'running' durumunda ve son BILLING_RUN_STALE_SECONDS içinde ilerleme yazmış mı"""
+    if run.status != "running":
+        return False
+    with session_scope(session) as session:
+        heartbeat = _last_heartbeat(session, run)
+    return heartbeat is not None and datetime.utcnow() - heartbeat < timedelta(seconds=settings.BILLING_RUN_STALE_SECONDS)
+
+
+def claim_billing_run(period_start: datetime, period_end: datetime, session: Optional[Session] = None) -> Tuple[BillingRun, bool]:
+    """Dönemin çalışmasını sahiplen; (çalışma, sahiplenildi mi) döner
+
+    Tamamlanmış ya da başka bir çalıştırıcının ilerlettiği çalışma sahiplenilmez. Sahiplenme,
+    okunan durum ve updated_at değişmediyse yapılan koşullu UPDATE'tir; aynı anda gelen iki
+    istekten yalnızca biri kazanır. İlerleme yazmayı bırakmış (çökmüş) çalışma tekrar sahiplenilebilir.
+    """
+    run = get_or_create_billing_run(period_start, period_end, session=session)
+    with session_scope(session) as session:
+        run = session.get(BillingRun, run.id)
+        session.refresh(run)
+        if run.status == "completed" or is_billing_run_active(run, session=session):
+            return run, False
+        table = BillingRun.__table__
+        unchanged = table.c.updated_at.is_(None) if run.updated_at is None else table.c.updated_at == run.updated_at
+        claimed = session.connection().execute(
+            update(table)
+            .where(table.c.id == run.id, table.c.status == run.status, unchanged)
+            .values(status="running", error=None, updated_at=datetime.utcnow(), finished_at=None)
+        ).rowcount == 1
+        commit_session(session)
+        session.refresh(run)
+        return run, claimed
+
+
+def release_billing_run(run_id: int, error: str) -> BillingRun:
+    """Sahiplenilip başlatılamayan çalışmayı başarısız işaretle; sonraki istek tekrar sahiplenebilir"""
+    return _set_run_status(run_id, "failed", error=error[:2000])
+
+
+def _set_run_status(run_id: int, status: str, error: Optional[str] = None) -> BillingRun:
+    with session_scope() as session:
+        run = session.get(BillingRun, run_id)
+        run.status = status
+        run.error = error
+        run.updated_at = datetime.utcnow()
+        run.finished_at = run.updated_at if status != "running" else None
+        session.add(run)
+        session.commit()
+        session.refresh(run)
+        return run
+
+
+def _set_partition_status(partition_id: int, status: str, error: Optional[str] = None) -> None:
+    with session_scope() as session:
+        partition = session.get(BillingRunPartition, partition_id)
+        partition.status = status
+        partition.error = error
+        partition.updated_at = datetime.utcnow()
+        if status == "running":
+            partition.attempts += 1
+        session.add(partition)
+        session.commit()
+
+
+def _next_user_ids(
+    session: Session, run: BillingRun, after_user_id: int, limit: int, until_user_id: Optional[int] = None
+) -> List[int]:
+    """Checkpoint'ten sonraki, aktif aboneliği olan ve bu dönem faturası kesilmemiş kullanıcılar"""
+    already_billed = exists().where(
+        Invoice.user_id == Subscription.user_id,
+        Invoice.billing_period_start == run.period_start,
+        Invoice.billing_period_end == run.period_end,
+    )
+    query = select(Subscription.user_id).where(
+        Subscription.is_active == True, Subscription.user_id > after_user_id, ~already_billed
+    )
+    if until_user_id is not None:
+        query = query.where(Subscription.user_id <= until_user_id)
+    return session.exec(query.distinct().order_by(Subscription.user_id).limit(limit)).all()
+
+
+def _collect_invoice_lines(
+    session: Session, run: BillingRun, user_ids: List[int]
+) -> Tuple[Dict[int, List[dict]], List[Tuple[int, int]]]:
+    """Kullanıcıların paket ücreti ve faturalanmamış hizmet alımı kalemlerini iki küme sorgusuyla topla
+
+    Kullanıcı -> kalem listesi ve faturaya eklenen (hizmet alımı id, user_id) çiftleri döner.
+    """
+    lines: Dict[int, List[dict]] = defaultdict(list)
+
+    packages = session.exec(
+        select(Subscription.user_id, Package.name, Package.monthly_fee)
+        .join(Package, Package.id == Subscription.package_id)
+        .where(Subscription.user_id.in_(user_ids), Subscription.is_active == True, Package.monthly_fee > 0)
+        .order_by(Subscription.user_id, Subscription.id)
+    ).all()
+    for user_id, name, monthly_fee in packages:
+        lines[user_id].append({
+            "service_type": "Package",
+            "description": f"Aylık Paket Ücreti - {name}",
+            "quantity": 1,
+            "unit_price": monthly_fee,
+            "tax_rate": DEFAULT_TAX_RATE,
+        })
+
+    # ix_service_purchase_unbilled (user_id, purchase_date) WHERE is_used = false üzerinden okunur
+    purchases = session.exec(
+        select(
+            ServicePurchase.id,
+            ServicePurchase.user_id,
+            ServicePurchase.service_type,
+            ServicePurchase.count,
+            ServicePurchase.unit_price,
+            ServicePurchase.purchase_price,
+        )
+        .where(
+            ServicePurchase.user_id.in_(user_ids),
+            ServicePurchase.is_used == False,
+            ServicePurchase.purchase_date >= run.period_start,
+            ServicePurchase.purchase_date < run.period_end,
+        )
+        .order_by(ServicePurchase.user_id, ServicePurchase.id)
+    ).all()
+    for purchase in purchases:
+        lines[purchase.user_id].append({
+            "service_type": purchase.service_type,
+            "description": f"{purchase.service_type} - {purchase.count} adet",
+            "quantity": purchase.count,
+            "unit_price": purchase.unit_price,
+            # Kalem tutarı alımda kaydedilen fiyattır; _chunk_amounts kuruşa çevirip net olarak kullanır
+            "total_price": purchase.purchase_price,
+            "tax_rate": DEFAULT_TAX_RATE,
+        })
+    return lines, [(purchase.id, purchase.user_id) for purchase in purchases]
+
+
+def _chunk_amounts(billed: List[Tuple[int, List[dict]]]) -> BatchAmounts:
+    """Chunk'taki tüm kalemlerin tutarlarını tek seferde kuruş cinsinden hesapla; kalemlerin total_price'ını doldurur
+
+    total_price'ı önceden dolu kalemlerde (hizmet alımları) net o tutardır, diğerlerinde adet x birim fiyat.
+    """
+    items = [(index, item) for index, (_, user_items) in enumerate(billed) for item in user_items]
+    amounts = batch_amounts(
+        [index for index, _ in items],
+        [item["quantity"] for _, item in items],
+        [item["unit_price"] for _, item in items],
+        [item["tax_rate"] for _, item in items],
+        invoice_count=len(billed),
+        net_prices=[item.get("total_price") for _, item in items],
+    )
+    for (_, item), net in zip(items, amounts.item_net):
+        item["total_price"] = from_cents(net)
+    return amounts
+
+
+def _bill_chunk(session: Session, run_id: int, chunk_size: int, partition_id: Optional[int] = None) -> int:
+    """Checkpoint'ten sonraki chunk_size kullanıcının faturasını kes; işlenen kullanıcı sayısı döner
+
+    Checkpoint, partition_id verilmişse o user_id aralığının, yoksa çalışmanın kendisinin
+    checkpoint'idir. Faturalar, kalemler, hizmet alımlarının is_used güncellemesi ve
+    checkpoint aynı transaction'da yazılır; yarıda kalan chunk bütünüyle geri alınır.
+    """
+    # Aynı checkpoint'i işleyen başka bir process varsa chunk'lar sırayla işlenir
+    if partition_id is None:
+        run = session.exec(select(BillingRun).where(BillingRun.id == run_id).with_for_update()).one()
+        checkpoint, until_user_id = run, None
+    else:
+        run = session.get(BillingRun, run_id)
+        checkpoint = session.exec(
+            select(BillingRunPartition).where(BillingRunPartition.id == partition_id).with_for_update()
+        ).one()
+        until_user_id = checkpoint.user_id_to
+    user_ids = _next_user_ids(session, run, checkpoint.last_user_id, chunk_size, until_user_id)
+    if not user_ids:
+        return 0
+
+    lines, purchase_ids = _collect_invoice_lines(session, run, user_ids)
+    billed = list(lines.items())
+    amounts = _chunk_amounts(billed)
+    # Numaralar process içindeki bloktan gelir; chunk geri alınırsa ya da fatura zaten varsa numara boşta kalır
+    numbers = next_invoice_numbers(run.period_start, len(billed))
+    now = datetime.utcnow()
+    invoices = [
+        {
+            "user_id": user_id,
+            "invoice_number": number,
+            "billing_period_start": run.period_start,
+            "billing_period_end": run.period_end,
+            "total_amount": from_cents(net),
+            "status": "pending",
+            "due_date": run.period_end + timedelta(days=PAYMENT_DUE_DAYS),
+            "created_at": now,
+        }
+        for (user_id, _), net, number in zip(billed, amounts.invoice_net, numbers)
+    ]
+
+    connection = session.connection()
+    created = []
+    items_created = 0
+    if invoices:
+        invoice_table = Invoice.__table__
+        # Kullanıcının bu dönem faturası başka bir process tarafından kesilmişse satır atlanır
+        # (uq_invoice_user_id_billing_period); kalemler ve hizmet alımları yalnızca yeni faturalara yazılır
+        statement = (
+            dialect_insert(connection.dialect.name, invoice_table)
+            .on_conflict_do_nothing(index_elements=["user_id", "billing_period_start", "billing_period_end"])
+            .returning(invoice_table.c.id, invoice_table.c.user_id)
+        )
+        created = connection.execute(statement, invoices).all()
+        item_rows = [
+            {"invoice_id": invoice_id, **item}
+            for invoice_id, user_id in created
+            for item in lines[user_id]
+        ]
+        if item_rows:
+            connection.execute(insert(InvoiceItem.__table__), item_rows)
+            items_created = len(item_rows)
+        billed_user_ids = {user_id for _, user_id in created}
+        billed_purchase_ids = [purchase_id for purchase_id, user_id in purchase_ids if user_id in billed_user_ids]
+        if billed_purchase_ids:
+            connection.execute(
+                update(ServicePurchase.__table__)
+                .where(ServicePurchase.__table__.c.id.in_(billed_purchase_ids))
+                .values(is_used=True)
+            )
+        mark_rows_inserted(session, Invoice, [invoice for invoice in invoices if invoice["user_id"] in billed_user_ids])
+
+    checkpoint.last_user_id = user_ids[-1]
+    checkpoint.users_processed += len(user_ids)
+    checkpoint.invoices_created += len(created)
+    checkpoint.items_created += items_created
+    checkpoint.updated_at = now
+    session.add(checkpoint)
+    session.commit()
+    return len(user_ids)
+
+
+def _plan_partitions(run: BillingRun, count: int) -> int:
+    """Kalan aktif abonelerin user_id aralığını count eşit aralığa böl; oluşturulan aralık sayısı döner
+
+    Çalışma daha önce tek process ile ilerlemişse o kısım tamamlanmış bir aralık olarak
+    kaydedilir; böylece çalışmanın toplamları her zaman aralıkların toplamıdır.
+    """
+    with session_scope() as session:
+        low, high = session.exec(
+            select(func.min(Subscription.user_id), func.max(Subscription.user_id))
+            .where(Subscription.is_active == True, Subscription.user_id > run.last_user_id)
+        ).one()
+        partitions = []
+        if run.last_user_id:
+            partitions.append(BillingRunPartition(
+                run_id=run.id,
+                user_id_from=1,
+                user_id_to=run.last_user_id,
+                status="completed",
+                last_user_id=run.last_user_id,
+                users_processed=run.users_processed,
+                invoices_created=run.invoices_created,
+                items_created=run.items_created,
+                updated_at=datetime.utcnow(),
+            ))
+        if low is not None:
+            step = -(-(high - low + 1) // count)
+            for start in range(low, high + 1, step):
+                partitions.append(BillingRunPartition(
+                    run_id=run.id,
+                    user_id_from=start,
+                    user_id_to=min(start + step - 1, high),
+                    last_user_id=start - 1,
+                ))
+        session.add_all(partitions)
+        session.commit()
+        return len(partitions)
+
+
+def _init_billing_worker() -> None:
+    # Worker process'ler spawn ile başlar: modülleri yeniden import eder ve kendi engine'ini
+    # (bağlantı havuzunu) oluşturur; ana process'in bağlantıları paylaşılmaz
+    setup_logging()
+
+
+def _bill_partition(run_id: int, partition_id: int, chunk_size: int) -> int:
+    """Bir user_id aralığını checkpoint'inden itibaren bitir (worker process'te çalışır); işlenen kullanıcı sayısı döner"""
+    _set_partition_status(partition_id, "running")
+    processed = 0
+    try:
+        while True:
+            with session_scope() as session:
+                count = _bill_chunk(session, run_id, chunk_size, partition_id=partition_id)
+            if not count:
+                break
+            processed += count
+    except Exception as e:
+        log_error(e, f"Billing run {run_id} partition {partition_id} failed")
+        _set_partition_status(partition_id, "failed", error=str(e)[:2000])
+        raise
+    _set_partition_status(partition_id, "completed")
+    return processed
+
+
+def _refresh_run_totals(run_id: int) -> BillingRun:
+    """Çalışmanın sayaçlarını aralıkların toplamına eşitle"""
+    with session_scope() as session:
+        users, invoices, items = session.exec(
+            select(
+                func.coalesce(func.sum(BillingRunPartition.users_processed), 0),
+                func.coalesce(func.sum(BillingRunPartition.invoices_created), 0),
+                func.coalesce(func.sum(BillingRunPartition.items_created), 0),
+            ).where(BillingRunPartition.run_id == run_id)
+        ).one()
+        run = session.get(BillingRun, run_id)
+        run.users_processed, run.invoices_created, run.items_created = users, invoices, items
+        run.updated_at = datetime.utcnow()
+        session.add(run)
+        session.commit()
+        session.refresh(run)
+        return run
+
+
+def _run_partitions(run: BillingRun, workers: int, chunk_size: int) -> None:
+    """Bekleyen aralıkları workers process'e dağıt, başarısız olanları MAX_PARTITION_ATTEMPTS tura kadar tekrar dene
+
+    Her aralık kendi checkpoint'inden devam ettiği için tekrar deneme yalnızca kalan
+    kullanıcıları işler; aynı kullanıcıya ikinci fatura uq_invoice_user_id_billing_period ile engellenir.
+    """
+    pending = [partition.id for partition in get_billing_run_partitions(run.id) if partition.status != "completed"]
+    total, done = len(pending), 0
+    for attempt in range(1, MAX_PARTITION_ATTEMPTS + 1):
+        if not pending:
+            return
+        if attempt > 1:
+            logger.warning(f"Billing run {run.id}: retrying {len(pending)} failed partitions (attempt {attempt})")
+            time.sleep(RETRY_BACKOFF_SECONDS * (attempt - 1))
+        failed = []
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(pending)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_billing_worker,
+        ) as pool:
+            futures = {pool.submit(_bill_partition, run.id, partition_id, chunk_size): partition_id for partition_id in pending}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    done += 1
+                except Exception:
+                    # Worker process çökerse (BrokenProcessPool) aralığın durumu güncellenememiş olabilir
+                    failed.append(futures[future])
+                progress = _refresh_run_totals(run.id)
+                logger.info(f"Billing run {run.id}: {done}/{total} partitions done, "
+                            f"{progress.invoices_created} invoices so far")
+        pending = failed
+    if pending:
+        raise RuntimeError(f"{len(pending)} billing partitions failed after {MAX_PARTITION_ATTEMPTS} attempts")
+
+
+def run_billing(
+    period_start: datetime,
+    period_end: datetime,
+    chunk_size: int = BILLING_CHUNK_SIZE,
+    workers: Optional[int] = None,
+    claimed: bool = False,
+) -> BillingRun:
+    """Dönemin faturalarını tüm aktif aboneler için küme tabanlı sorgularla, parça parça kes
+
+    Her parça kendi transaction'ında işlenir ve checkpoint'ini ilerletir; yarıda kalan bir
+    çalışma aynı dönem için tekrar çağrıldığında kaldığı yerden devam eder. workers > 1 ise
+    (varsayılan BILLING_WORKERS) kullanıcılar user_id aralıklarına bölünüp ayrı process'lerde
+    işlenir; aralıklara bölünmüş bir çalışma hep aralıklarıyla devam eder.
+
+    Çalışma önce sahiplenilir (claim_billing_run); dönem başka bir çalıştırıcıda ilerliyorsa
+    BillingRunActiveError, mükerrer dönem faturaları varsa InvoicePeriodIndexMissingError fırlatılır. claimed=True, çalışmayı önceden sahiplenmiş çağıran içindir.
+    """
+    workers = workers or settings.BILLING_WORKERS
+    require_invoice_period_index()
+    if claimed:
+        run = get_or_create_billing_run(period_start, period_end)
+    else:
+        run, claimed = claim_billing_run(period_start, period_end)
+    if run.status == "completed":
+        return run
+    if not claimed:
+        raise BillingRunActiveError(f"Billing run {run.id} for {period_start:%Y-%m} is already running")
+    partitioned = workers > 1 or bool(get_billing_run_partitions(run.id))
+    logger.info(f"Billing run {run.id} for {period_start:%Y-%m} starting after user {run.last_user_id}"
+                + (f" with {workers} workers" if partitioned else ""))
+    _set_run_status(run.id, "running")
+    try:
+        if partitioned:
+            if not get_billing_run_partitions(run.id):
+                _plan_partitions(run, workers * PARTITIONS_PER_WORKER)
+            _run_partitions(run, workers, chunk_size)
+        else:
+            while True:
+                with session_scope() as session:
+                    if not _bill_chunk(session, run.id, chunk_size):
+                        break
+    except Exception as e:
+        log_error(e, f"Billing run {run.id} failed")
+        _set_run_status(run.id, "failed", error=str(e)[:2000])
+        raise
+    run = _set_run_status(run.id, "completed")
+    logger.info(f"Billing run {run.id} completed: {run.invoices_created} invoices for {run.users_processed} users")
+    return run
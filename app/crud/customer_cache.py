@@ -0,0 +1,99 @@
+import json
+from typing import Any, Iterable, Optional, Set
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.db.config import get_settings
+from app.models.user import User
+from app.utils.cache import get_cache_backend
+
+settings = get_settings()
+
+# Müşteri başına önbelleğe alınan görünümler; hepsi user_id ile anahtarlanır.
+# "version" koşullu GET'lerde (ETag) kullanılan müşteri sürümüdür
+CUSTOMER_VIEWS = ("info", "summary", "package", "version")
+
+
+def customer_key(user_id: int, view: str) -> str:
+    return f"customer:{user_id}:{view}"
+
+
+def phone_key(phone_number: str) -> str:
+    return f"customer:phone:{phone_number}"
+
+
+def get_cached(key: str) -> Optional[Any]:
+    """Paylaşılan önbellekten JSON değeri oku"""
+    raw = get_cache_backend().get(key)
+    return None if raw is None else json.loads(raw)
+
+
+def set_cached(key: str, value: Any, ttl: Optional[float] = None) -> None:
+    """Değeri JSON olarak paylaşılan önbelleğe yaz"""
+    raw = json.dumps(jsonable_encoder(value), separators=(",", ":")).encode()
+    get_cache_backend().set(key, raw, settings.CUSTOMER_CACHE_TTL if ttl is None else ttl)
+
+
+async def get_cached_async(key: str) -> Optional[Any]:
+    """get_cached'in async karşılığı; ağ üzerindeki backend'ler event loop'u bloklamaz"""
+    if get_cache_backend().is_remote:
+        return await run_in_threadpool(get_cached, key)
+    return get_cached(key)
+
+
+async def set_cached_async(key: str, value: Any, ttl: Optional[float] = None) -> None:
+    if get_cache_backend().is_remote:
+        await run_in_threadpool(set_cached, key, value, ttl)
+    else:
+        set_cached(key, value, ttl)
+
+
+def invalidate_customers(user_ids: Iterable[int] = (), phone_numbers: Iterable[str] = ()) -> None:
+    """Müşterilerin önbellekteki tüm görünümlerini ve telefon eşlemelerini sil"""
+    keys = [customer_key(user_id, view) for user_id in set(user_ids) for view in CUSTOMER_VIEWS]
+    keys += [phone_key(phone) for phone in set(phone_numbers)]
+    if keys:
+        get_cache_backend().delete(*keys)
+
+
+def _collect_changes(session: Session, flush_context) -> None:
+    """Flush edilen nesnelerden etkilenen müşterileri topla (commit sonrası geçersiz kılınır)"""
+    user_ids: Set[int] = session.info.setdefault("cache_user_ids", set())
+    phone_numbers: Set[str] = session.info.setdefault("cache_phone_numbers", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            user_ids.add(obj.id)
+            phone_numbers.add(obj.phone_number)
+            phone_numbers.update(inspect(obj).attrs.phone_number.history.deleted or ())
+        elif getattr(obj, "user_id", None) is not None:
+            user_ids.add(obj.user_id)
+            user_ids.update(inspect(obj).attrs.user_id.history.deleted or ())
+
+
+def mark_for_invalidation(session: Session, user_ids: Iterable[int] = (), phone_numbers: Iterable[str] = ()) -> None:
+    """ORM dışından (Core INSERT/UPDATE) yazılan müşterileri commit sonrası geçersiz kılmak için işaretle"""
+    session.info.setdefault("cache_user_ids", set()).update(user_ids)
+    session.info.setdefault("cache_phone_numbers", set()).update(phone_numbers)
+
+
+def _publish_invalidations(session: Session) -> None:
+    user_ids = session.info.pop("cache_user_ids", None)
+    phone_numbers = session.info.pop("cache_phone_numbers", None)
+    if user_ids or phone_numbers:
+        invalidate_customers(
+            [user_id for user_id in user_ids or () if user_id is not None],
+            [phone for phone in phone_numbers or () if phone],
+        )
+
+
+def _discard_changes(session: Session) -> None:
+    session.info.pop("cache_user_ids", None)
+    session.info.pop("cache_phone_numbers", None)
+
+
+# CRUD katmanındaki tüm ORM yazmaları müşteri önbelleğini commit'ten sonra geçersiz kılar;
+# commit'ten önce silmek, başka bir isteğin eski veriyi tekrar önbelleğe yazmasına izin verirdi
+event.listen(Session, "after_flush", _collect_changes)
+event.listen(Session, "after_commit", _publish_invalidations)
+event.listen(Session, "after_rollback", _discard_changes)
@@ -0,0 +1,164 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+from sqlalchemy import literal_column
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.user import User
+from app.models.package import Package
+from app.models.subscription import Subscription
+from app.models.invoice import Invoice
+from app.models.remaininguses import RemainingUses
+from app.models.packagechangerequest import PackageChangeRequest
+from app.db.sql_functions import json_array_agg, json_object, json_value
+
+RECENT_INVOICE_LIMIT = 5
+
+_DATETIME_KEYS = {
+    "created_at", "start_date", "end_date", "due_date", "expires_at", "requested_at",
+}
+
+
+def json_pairs(*columns) -> list:
+    """json_object için (etiket, kolon) çiftlerini düz listeye çevir"""
+    args = []
+    for column in columns:
+        label, value = column if isinstance(column, tuple) else (column.key, column)
+        args.extend([literal_column(f"'{label}'"), value])
+    return args
+
+
+def snapshot_columns(owner_id=None) -> Dict[str, Any]:
+    """Kullanıcıya korelasyonlu JSON alt sorguları: abonelik + paket, son faturalar, kalan
+    kullanımlar ve açık paket değişiklik talepleri
+
+    owner_id alt sorguların bağlandığı kullanıcı id kolonudur (varsayılan User.id; özet
+    tablosunu yerinde güncellerken customer_summary.user_id verilir).
+    """
+    owner_id = User.__table__.c.id if owner_id is None else owner_id
+    owner = owner_id.table
+    subscription = (
+        select(json_object(*json_pairs(
+            Subscription.id,
+            Subscription.package_id,
+            Subscription.start_date,
+            Subscription.end_date,
+            Subscription.contract_months,
+            Subscription.is_active,
+            ("package", json_object(*json_pairs(
+                Package.id,
+                Package.name,
+                Package.type,
+                ("details", json_value(Package.details)),
+                Package.commitment,
+                Package.monthly_fee,
+            ))),
+        )))
+        .select_from(Subscription)
+        .join(Package, Package.id == Subscription.package_id)
+        .where(Subscription.user_id == owner_id, Subscription.is_active == True)
+        .order_by(Subscription.start_date.desc())
+        .limit(1)
+        .correlate(owner)
+        .scalar_subquery()
+    )
+
+    recent = (
+        select(Invoice.id, Invoice.invoice_number, Invoice.total_amount, Invoice.status, Invoice.due_date, Invoice.created_at)
+        .where(Invoice.user_id == owner_id)
+        .order_by(Invoice.created_at.desc(), Invoice.id.desc())
+        .limit(RECENT_INVOICE_LIMIT)
+        .correlate(owner)
+        .subquery()
+    )
+    recent_invoices = (
+        select(json_array_agg(json_object(*json_pairs(*recent.c))))
+        .select_from(recent)
+        .scalar_subquery()
+    )
+
+    remaining_uses = (
+        select(json_array_agg(json_object(*json_pairs(
+            RemainingUses.service_type,
+            RemainingUses.remaining_count,
+            RemainingUses.total_allocated,
+            RemainingUses.expires_at,
+        ))))
+        .where(RemainingUses.user_id == owner_id)
+        .correlate(owner)
+        .scalar_subquery()
+    )
+
+    open_change_requests = (
+        select(json_array_agg(json_object(*json_pairs(
+            PackageChangeRequest.id,
+            PackageChangeRequest.current_package_id,
+            PackageChangeRequest.requested_package_id,
+            PackageChangeRequest.reason,
+            PackageChangeRequest.requested_at,
+        ))))
+        .where(PackageChangeRequest.user_id == owner_id, PackageChangeRequest.status == "pending")
+        .correlate(owner)
+        .scalar_subquery()
+    )
+
+    return {
+        "subscription": subscription.label("subscription"),
+        "recent_invoices": recent_invoices.label("recent_invoices"),
+        "remaining_uses": remaining_uses.label("remaining_uses"),
+        "open_change_requests": open_change_requests.label("open_change_requests"),
+    }
+
+
+def _snapshot_query():
+    """Kullanıcı ve ilişkili kayıtlarını tek satırda seçen sorgu"""
+    return select(User, *snapshot_columns().values())
+
+
+def normalize_json(value: Any) -> Any:
+    """JSON'dan gelen tarih metinlerini datetime'a çevir (veritabanları farklı biçimde yazar)"""
+    if isinstance(value, list):
+        return [normalize_json(item) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: datetime.fromisoformat(item) if key in _DATETIME_KEYS and isinstance(item, str) else normalize_json(item)
+            for key, item in value.items()
+        }
+    return value
+
+
+async def get_customer_snapshot_async(session: AsyncSession, user_id: int) -> Optional[Dict[str, Any]]:
+    """Müşteri, aktif abonelik + paket, son faturalar, kalan kullanımlar ve açık paket
+    değişiklik taleplerini kullanıcı id'siyle tek sorguda getir (async; özet satırı ıskası)"""
+    result = await session.exec(_snapshot_query().where(User.id == user_id))
+    row = result.first()
+    return None if row is None else _to_snapshot(row)
+
+
+async def get_customer_snapshots_by_phone_async(session: AsyncSession, phone_numbers: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Birden fazla müşterinin görünümünü tek sorguda getir (telefon numarası -> görünüm)
+
+    Kullanıcılar phone_number IN (...) ile seçilir; ilişkili kayıtlar her kullanıcı için
+    index üzerinden çalışan korelasyonlu alt sorgularla aynı ifadede toplanır.
+    """
+    result = await session.exec(_snapshot_query().where(User.phone_number.in_(set(phone_numbers))))
+    snapshots = [_to_snapshot(row) for row in result.all()]
+    return {snapshot["user"].phone_number: snapshot for snapshot in snapshots}
+
+
+def _to_snapshot(row) -> Dict[str, Any]:
+    user, subscription, recent_invoices, remaining_uses, open_change_requests = row
+    return {"user": user, **normalize_snapshot(subscription, recent_invoices, remaining_uses, open_change_requests)}
+
+
+def normalize_snapshot(subscription, recent_invoices, remaining_uses, open_change_requests) -> Dict[str, Any]:
+    """snapshot_columns() JSON değerlerini veritabanından bağımsız Python değerlerine çevir"""
+    if subscription is not None:
+        subscription = {**subscription, "is_active": bool(subscription["is_active"])}
+    # json_agg sıralı alt sorgunun sırasını korur ama bu garanti değil
+    recent_invoices = sorted(normalize_json(recent_invoices or []), key=lambda inv: (inv["created_at"], inv["id"]), reverse=True)
+    return {
+        "subscription": normalize_json(subscription),
+        "recent_invoices": recent_invoices,
+        "remaining_uses": normalize_json(remaining_uses or []),
+        "open_change_requests": normalize_json(open_change_requests or []),
+    }
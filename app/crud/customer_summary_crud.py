@@ -0,0 +1,430 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Mapping, Optional, Set
+from sqlalchemy import DateTime, Float, Integer, bindparam, case, delete, event, exists, func, inspect, literal, or_, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.user import User
+from app.models.package import Package
+from app.models.subscription import Subscription
+from app.models.invoice import UNPAID_INVOICE_STATUSES, Invoice
+from app.models.remaininguses import RemainingUses
+from app.models.agentintentlog import AgentIntentLog
+from app.models.packagechangerequest import PackageChangeRequest
+from app.models.customersummary import CustomerSummary
+from app.crud.customer_cache import customer_key, get_cached_async, mark_for_invalidation, set_cached_async
+from app.crud.customer_crud import json_pairs, normalize_json, normalize_snapshot, snapshot_columns
+from app.db.replica import read_session_scope
+from app.db.sql_functions import dialect_insert, json_array_agg, json_object
+
+RECENT_INTERACTION_LIMIT = 5
+# Tek INSERT ... SELECT ile yenilenen en fazla müşteri sayısı
+REFRESH_BATCH_SIZE = 1000
+
+SUMMARY_COLUMNS = [column.name for column in CustomerSummary.__table__.columns]
+
+# Kaynak modeldeki bir değişiklik yalnızca bu özet kolonlarını etkiler; kullanıcının kendisi
+# değişirse (ya da özet satırı yoksa) satır baştan hesaplanır
+SUMMARY_COLUMN_GROUPS = {
+    Subscription: ("subscription", "active_package_id", "active_package_name"),
+    Invoice: ("invoice_count", "unpaid_invoice_count", "unpaid_total", "recent_invoices"),
+    RemainingUses: ("remaining_uses_total", "remaining_uses"),
+    AgentIntentLog: ("last_interaction_at", "recent_interactions"),
+    PackageChangeRequest: ("open_change_requests",),
+}
+SUMMARY_SOURCES = tuple(SUMMARY_COLUMN_GROUPS)
+
+# Yeni fatura ve loglarda sayaçlar ile son etkileşim zamanı delta olarak uygulanır; yalnızca
+# index üzerinden LIMIT ile okunan "son N" listeleri yeniden hesaplanır
+INSERT_REFRESH_COLUMNS = {
+    Invoice: ("recent_invoices",),
+    AgentIntentLog: ("recent_interactions",),
+}
+
+
+def _scalar(query, owner):
+    return query.correlate(owner).scalar_subquery()
+
+
+def _summary_values(owner_id) -> Dict[str, Any]:
+    """Kaynak tablolardan hesaplanan özet kolonları; alt sorgular owner_id kolonuna korelasyonludur"""
+    owner = owner_id.table
+    snapshot = {name: column.element for name, column in snapshot_columns(owner_id).items()}
+
+    active_package = (
+        select(Package.id, Package.name)
+        .join(Subscription, Subscription.package_id == Package.id)
+        .where(Subscription.user_id == owner_id, Subscription.is_active == True)
+        .order_by(Subscription.start_date.desc())
+        .limit(1)
+        .correlate(owner)
+        .subquery()
+    )
+    user_invoices = Invoice.user_id == owner_id
+    unpaid_invoices = (user_invoices, Invoice.status.in_(UNPAID_INVOICE_STATUSES))
+
+    recent_logs = (
+        select(AgentIntentLog.id, AgentIntentLog.intent, AgentIntentLog.message, AgentIntentLog.created_at)
+        .where(AgentIntentLog.user_id == owner_id)
+        .order_by(AgentIntentLog.created_at.desc(), AgentIntentLog.id.desc())
+        .limit(RECENT_INTERACTION_LIMIT)
+        .correlate(owner)
+        .subquery()
+    )
+
+    return {
+        "subscription": snapshot["subscription"],
+        "active_package_id": select(active_package.c.id).scalar_subquery(),
+        "active_package_name": select(active_package.c.name).scalar_subquery(),
+        "invoice_count": _scalar(select(func.count(Invoice.id)).where(user_invoices), owner),
+        "unpaid_invoice_count": _scalar(select(func.count(Invoice.id)).where(*unpaid_invoices), owner),
+        "unpaid_total": _scalar(select(func.coalesce(func.sum(Invoice.total_amount), 0)).where(*unpaid_invoices), owner),
+        "recent_invoices": snapshot["recent_invoices"],
+        "remaining_uses_total": _scalar(
+            select(func.coalesce(func.sum(RemainingUses.remaining_count), 0))
+            .where(RemainingUses.user_id == owner_id, RemainingUses.is_active == True),
+            owner,
+        ),
+        "remaining_uses": snapshot["remaining_uses"],
+        "open_change_requests": snapshot["open_change_requests"],
+        "last_interaction_at": _scalar(select(func.max(AgentIntentLog.created_at)).where(AgentIntentLog.user_id == owner_id), owner),
+        "recent_interactions": (
+            select(json_array_agg(json_object(*json_pairs(*recent_logs.c))))
+            .select_from(recent_logs)
+            .scalar_subquery()
+        ),
+    }
+
+
+def _summary_query(condition):
+    """Özet satırlarını SUMMARY_COLUMNS sırasıyla, user tablosundan hesaplayan sorgu"""
+    values = {
+        "user_id": User.id,
+        "name": User.name,
+        "surname": User.surname,
+        "phone_number": User.phone_number,
+        "email": User.email,
+        "is_active": User.is_active,
+        "user_created_at": User.created_at,
+        **_summary_values(User.__table__.c.id),
+        "updated_at": literal(datetime.utcnow(), CustomerSummary.__table__.c.updated_at.type),
+    }
+    return select(*[values[name] for name in SUMMARY_COLUMNS]).where(condition)
+
+
+def refresh_customer_summaries(connection: Connection, user_ids: Iterable[int]) -> int:
+    """Verilen müşterilerin özet satırlarını kaynak tablolardan yeniden hesapla (upsert)
+
+    Her parti tek bir INSERT ... SELECT ... ON CONFLICT ifadesidir; silinmiş kullanıcıların
+    özet satırları da kaldırılır. Yenilenen müşteri sayısı döner.
+    """
+    ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    table = CustomerSummary.__table__
+    for start in range(0, len(ids), REFRESH_BATCH_SIZE):
+        batch = ids[start:start + REFRESH_BATCH_SIZE]
+        stmt = dialect_insert(connection.dialect.name, table).from_select(
+            SUMMARY_COLUMNS, _summary_query(User.id.in_(batch))
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={name: stmt.excluded[name] for name in SUMMARY_COLUMNS if name != "user_id"},
+        )
+        connection.execute(stmt)
+        connection.execute(
+            delete(table).where(table.c.user_id.in_(batch), ~exists().where(User.id == table.c.user_id))
+        )
+    return len(ids)
+
+
+def refresh_summary_columns(connection: Connection, user_ids: Iterable[int], columns: Iterable[str]) -> None:
+    """Yalnızca verilen özet kolonlarını yerinde yeniden hesapla; özet satırı olmayan müşteriler atlanır"""
+    ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    table = CustomerSummary.__table__
+    expressions = _summary_values(table.c.user_id)
+    values = {name: expressions[name] for name in columns}
+    for start in range(0, len(ids), REFRESH_BATCH_SIZE):
+        connection.execute(
+            update(table)
+            .where(table.c.user_id.in_(ids[start:start + REFRESH_BATCH_SIZE]))
+            .values(**values, updated_at=datetime.utcnow())
+        )
+
+
+def apply_summary_deltas(connection: Connection, deltas: Mapping[int, "SummaryDelta"]) -> None:
+    """Sayaç artışlarını ve son etkileşim zamanını özet satırlarına tek executemany UPDATE ile uygula"""
+    if not deltas:
+        return
+    table = CustomerSummary.__table__
+    last_interaction_at = bindparam("delta_last_interaction_at", type_=DateTime)
+    statement = (
+        update(table)
+        .where(table.c.user_id == bindparam("delta_user_id"))
+        .values(
+            invoice_count=table.c.invoice_count + bindparam("delta_invoice_count", type_=Integer),
+            unpaid_invoice_count=table.c.unpaid_invoice_count + bindparam("delta_unpaid_invoice_count", type_=Integer),
+            unpaid_total=table.c.unpaid_total + bindparam("delta_unpaid_total", type_=Float),
+            last_interaction_at=case(
+                (or_(table.c.last_interaction_at.is_(None), table.c.last_interaction_at < last_interaction_at), last_interaction_at),
+                else_=table.c.last_interaction_at,
+            ),
+            updated_at=bindparam("delta_updated_at", type_=DateTime),
+        )
+    )
+    now = datetime.utcnow()
+    connection.execute(statement, [
+        {
+            "delta_user_id": user_id,
+            "delta_invoice_count": delta.invoice_count,
+            "delta_unpaid_invoice_count": delta.unpaid_invoice_count,
+            "delta_unpaid_total": delta.unpaid_total,
+            "delta_last_interaction_at": delta.last_interaction_at,
+            "delta_updated_at": now,
+        }
+        for user_id, delta in deltas.items()
+    ])
+
+
+def refresh_all_customer_summaries(connection: Connection, batch_size: int = REFRESH_BATCH_SIZE) -> int:
+    """Tüm müşterilerin özetini id aralıkları halinde yeniden hesapla (ilk doldurma / onarım)"""
+    refreshed = 0
+    last_id = 0
+    while True:
+        ids = connection.execute(
+            select(User.id).where(User.id > last_id).order_by(User.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return refreshed
+        refreshed += refresh_customer_summaries(connection, ids)
+        last_id = ids[-1]
+
+
+def get_customer_summary(user_id: int, session: Optional[Session] = None, max_lag: Optional[float] = None) -> Optional[CustomerSummary]:
+    """Müşteri özetini primary key ile oku"""
+    with read_session_scope(session, max_lag) as session:
+        return session.get(CustomerSummary, user_id)
+
+
+async def get_customer_summary_async(session: AsyncSession, user_id: int) -> Optional[CustomerSummary]:
+    """Müşteri özetini primary key ile oku (async)"""
+    return await session.get(CustomerSummary, user_id)
+
+
+async def repair_customer_summary_async(session: AsyncSession, user_id: int) -> None:
+    """Eksik özet satırını kaynak tablolardan oluştur ve commit et
+
+    ORM flush hook'larını atlayan yazma yolları (Core insert, ham SQL, başka bir yazıcı)
+    özet satırı bırakmaz; okuma yolu ıskada satırı bununla onarır.
+    """
+    await session.run_sync(lambda sync_session: refresh_customer_summaries(sync_session.connection(), [user_id]))
+    await session.commit()
+
+
+async def get_customer_version_async(session: AsyncSession, user_id: int) -> Optional[datetime]:
+    """Müşteri verisinin sürümü: özet satırının son güncellenme zamanı
+
+    Paylaşılan önbellekten okunur (müşteri önbelleğiyle aynı anda geçersiz kılınır);
+    ıskada özet satırı primary key ile okunur. Özeti olmayan müşteri için None döner.
+    """
+    cache_key = customer_key(user_id, "version")
+    cached = await get_cached_async(cache_key)
+    if cached is not None:
+        return datetime.fromisoformat(cached)
+    summary = await get_customer_summary_async(session, user_id)
+    if summary is None:
+        return None
+    await set_cached_async(cache_key, summary.updated_at)
+    return summary.updated_at
+
+
+def summary_snapshot(summary: CustomerSummary) -> Dict[str, Any]:
+    """Özet satırının JSON kolonlarını customer_crud görünümüyle aynı biçime çevir"""
+    return normalize_snapshot(
+        summary.subscription, summary.recent_invoices, summary.remaining_uses, summary.open_change_requests
+    )
+
+
+def summary_interactions(summary: CustomerSummary) -> list:
+    """Son etkileşimler, en yeni önce"""
+    interactions = normalize_json(summary.recent_interactions or [])
+    return sorted(interactions, key=lambda log: (log["created_at"], log["id"]), reverse=True)
+
+
+class SummaryDelta:
+    """Bir müşterinin özetine eklenecek sayaç artışları ve en yeni etkileşim zamanı"""
+
+    __slots__ = ("invoice_count", "unpaid_invoice_count", "unpaid_total", "last_interaction_at")
+
+    def __init__(self):
+        self.invoice_count = 0
+        self.unpaid_invoice_count = 0
+        self.unpaid_total = 0.0
+        self.last_interaction_at: Optional[datetime] = None
+
+    def drop_columns(self, columns: Set[str]) -> None:
+        """Aynı commit'te yeniden hesaplanacak kolonların artışını bırak (iki kez sayılmasın)"""
+        if "invoice_count" in columns:
+            self.invoice_count = self.unpaid_invoice_count = 0
+            self.unpaid_total = 0.0
+        if "last_interaction_at" in columns:
+            self.last_interaction_at = None
+
+    def __bool__(self) -> bool:
+        return bool(self.invoice_count or self.unpaid_invoice_count or self.unpaid_total or self.last_interaction_at)
+
+
+class SummaryChanges:
+    """Transaction boyunca biriken özet değişiklikleri; commit öncesi tek seferde uygulanır"""
+
+    def __init__(self):
+        self.full_user_ids: Set[int] = set()
+        self.columns: Dict[int, Set[str]] = defaultdict(set)
+        self.deltas: Dict[int, SummaryDelta] = defaultdict(SummaryDelta)
+        self.package_ids: Set[int] = set()
+
+    def __bool__(self) -> bool:
+        return bool(self.full_user_ids or self.columns or self.deltas or self.package_ids)
+
+    def refresh(self, user_id: Optional[int], columns: Optional[Iterable[str]] = None) -> None:
+        """Müşterinin verilen kolonlarını (verilmezse tüm satırını) yeniden hesaplanacak olarak işaretle"""
+        if user_id is None:
+            return
+        if columns is None:
+            self.full_user_ids.add(user_id)
+        else:
+            self.columns[user_id].update(columns)
+
+    def inserted(self, model, values: Mapping[str, Any]) -> None:
+        """Yeni eklenen kaynak satırını kaydet: sayaçlar delta olarak, kalan kolonlar yeniden hesaplanarak"""
+        user_id = values.get("user_id")
+        if user_id is None:
+            return
+        if model is Invoice:
+            delta = self.deltas[user_id]
+            delta.invoice_count += 1
+            if values.get("status") in UNPAID_INVOICE_STATUSES:
+                delta.unpaid_invoice_count += 1
+                delta.unpaid_total += values.get("total_amount") or 0
+        elif model is AgentIntentLog:
+            delta = self.deltas[user_id]
+            created_at = values.get("created_at")
+            if created_at is not None and (delta.last_interaction_at is None or created_at > delta.last_interaction_at):
+                delta.last_interaction_at = created_at
+        self.refresh(user_id, INSERT_REFRESH_COLUMNS.get(model, SUMMARY_COLUMN_GROUPS[model]))
+
+    def add_package_subscribers(self, connection: Connection) -> Set[int]:
+        """Paket adı/ücreti değiştiyse o paketin aktif abonelerinin abonelik kolonlarını işaretle; aboneleri döndür"""
+        if not self.package_ids:
+            return set()
+        user_ids = set(connection.execute(
+            select(Subscription.user_id).where(Subscription.package_id.in_(self.package_ids), Subscription.is_active == True)
+        ).scalars())
+        for user_id in user_ids:
+            self.refresh(user_id, SUMMARY_COLUMN_GROUPS[Subscription])
+        self.package_ids.clear()
+        return user_ids
+
+    def apply(self, connection: Connection) -> None:
+        self.add_package_subscribers(connection)
+        partial_user_ids = (set(self.columns) | {user_id for user_id, delta in self.deltas.items() if delta}) - self.full_user_ids
+        # Özet satırı henüz olmayan müşterilerde (ör. satır Core ile eklenmiş kullanıcıya ait) güncellenecek satır yok
+        full_user_ids = self.full_user_ids | (partial_user_ids - _existing_summary_ids(connection, partial_user_ids))
+        refresh_customer_summaries(connection, full_user_ids)
+
+        by_columns: Dict[frozenset, Set[int]] = defaultdict(set)
+        deltas: Dict[int, SummaryDelta] = {}
+        for user_id in partial_user_ids - full_user_ids:
+            columns = self.columns.get(user_id, set())
+            if columns:
+                by_columns[frozenset(columns)].add(user_id)
+            delta = self.deltas.get(user_id)
+            if delta is not None:
+                delta.drop_columns(columns)
+                if delta:
+                    deltas[user_id] = delta
+        for columns, user_ids in by_columns.items():
+            refresh_summary_columns(connection, user_ids, sorted(columns))
+        apply_summary_deltas(connection, deltas)
+
+
+def _existing_summary_ids(connection: Connection, user_ids: Set[int]) -> Set[int]:
+    table = CustomerSummary.__table__
+    ids = sorted(user_ids)
+    existing: Set[int] = set()
+    for start in range(0, len(ids), REFRESH_BATCH_SIZE):
+        existing.update(connection.execute(
+            select(table.c.user_id).where(table.c.user_id.in_(ids[start:start + REFRESH_BATCH_SIZE]))
+        ).scalars())
+    return existing
+
+
+def _summary_changes(session: Session) -> SummaryChanges:
+    return session.info.setdefault("summary_changes", SummaryChanges())
+
+
+def mark_customers_changed(session: Session, user_ids: Iterable[int]) -> None:
+    """ORM dışından (Core INSERT/UPDATE) değiştirilen müşterileri işaretle: özetleri commit
+    öncesi baştan hesaplanır, önbellekleri commit sonrası geçersiz kılınır"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    changes = _summary_changes(session)
+    for user_id in user_ids:
+        changes.refresh(user_id)
+    mark_for_invalidation(session, user_ids)
+
+
+def mark_rows_inserted(session: Session, model, rows: Iterable[Mapping[str, Any]]) -> None:
+    """Core INSERT ile eklenen kaynak satırlarını (fatura, log, ...) işaretle: özetlere commit
+    öncesi delta olarak yansır, önbellekler commit sonrası geçersiz kılınır"""
+    changes = _summary_changes(session)
+    user_ids = set()
+    for row in rows:
+        changes.inserted(model, row)
+        user_ids.add(row.get("user_id"))
+    user_ids.discard(None)
+    mark_for_invalidation(session, user_ids)
+
+
+def _collect_summary_changes(session: Session, flush_context) -> None:
+    """Flush edilen nesnelerden özeti etkilenen müşterileri ve kolonları topla (commit öncesi uygulanır)"""
+    changes = _summary_changes(session)
+    for obj in session.new:
+        if isinstance(obj, User):
+            changes.refresh(obj.id)
+        elif isinstance(obj, SUMMARY_SOURCES):
+            changes.inserted(type(obj), vars(obj))
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            changes.refresh(obj.id)
+        elif isinstance(obj, Package):
+            changes.package_ids.add(obj.id)
+        elif isinstance(obj, SUMMARY_SOURCES):
+            columns = SUMMARY_COLUMN_GROUPS[type(obj)]
+            changes.refresh(obj.user_id, columns)
+            for user_id in inspect(obj).attrs.user_id.history.deleted or ():
+                changes.refresh(user_id, columns)
+
+
+def _refresh_before_commit(session: Session) -> None:
+    if not (session.new or session.dirty or session.deleted or session.info.get("summary_changes")):
+        return
+    # Bekleyen değişiklikler de yakalansın diye önce flush
+    session.flush()
+    changes = session.info.pop("summary_changes", None)
+    if changes:
+        connection = session.connection()
+        # Abonelerin önbellekteki görünümleri (sürüm, paket, ...) de commit sonrası geçersiz kılınsın
+        mark_for_invalidation(session, changes.add_package_subscribers(connection))
+        changes.apply(connection)
+
+
+def _discard_summary_changes(session: Session) -> None:
+    session.info.pop("summary_changes", None)
+
+
+# Özet, kaynak kayıtlarla aynı transaction'da yazılır: commit edilen her değişiklik
+# özete de yansımış olur, rollback ikisini birlikte geri alır. Tam hesap yalnızca kullanıcı
+# değişikliklerinde yapılır; diğer yazmalar ilgili kolonları ya da sayaç deltalarını günceller
+event.listen(Session, "after_flush", _collect_summary_changes)
+event.listen(Session, "before_commit", _refresh_before_commit)
+event.listen(Session, "after_rollback", _discard_summary_changes)
@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Any, Iterator, Mapping, Optional
+from sqlalchemy import Table, select
+from app.db.replica import read_session_scope
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def date_range_query(table: Table, date_column, start_date: Optional[datetime] = None,
+                     end_date: Optional[datetime] = None):
+    """Tablonun tüm kolonlarını opsiyonel tarih aralığıyla seçen sorguyu oluştur"""
+    query = select(*table.columns)
+    if start_date is not None:
+        query = query.where(date_column >= start_date)
+    if end_date is not None:
+        query = query.where(date_column <= end_date)
+    return query
+
+
+def stream_rows(query, batch_size: int = EXPORT_BATCH_SIZE, max_lag: Optional[float] = None) -> Iterator[Mapping[str, Any]]:
+    """Sorgu sonucunu sunucu tarafı cursor ile parça parça akıt
+
+    ORM nesnesi oluşturulmaz; satırlar batch_size'lık parçalar halinde çekildiği için
+    bellek kullanımı sonuç kümesinin boyutundan bağımsız kalır.
+    """
+    with read_session_scope(max_lag=max_lag) as session:
+        result = session.exec(query.execution_options(yield_per=batch_size))
+        for row in result:
+            yield row._mapping
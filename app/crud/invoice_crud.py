@@ -1,77 +1,253 @@
-from sqlmodel import Session, select
-from typing import List, Optional
-from datetime import datetime, timedelta
-from app.models.invoice import Invoice
+from sqlalchemy import bindparam, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+from datetime import datetime, timedelta, timezone
+from app.models.invoice import UNPAID_INVOICE_STATUSES, Invoice
 from app.models.invoiceitem import InvoiceItem
 from app.models.servicepurchase import ServicePurchase
 from app.models.subscription import Subscription
 from app.models.package import Package
 from app.models.user import User
-from app.db.database import engine
+from app.db.database import session_scope, commit_session
+from app.db.replica import read_session_scope
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Page, paginate, page_query
+from app.crud.export import date_range_query, stream_rows
+from app.crud.user_crud import get_user_profile_by_phone, get_user_profile_by_phone_async
+from app.crud.invoice_number import next_invoice_number
+from app.utils.billing_calculator import DEFAULT_TAX_RATE, from_cents, line_amounts, to_cents
 
 
-def get_invoices() -> List[Invoice]:
+class DuplicateInvoiceError(ValueError):
+    """Kullanıcının bu dönem için faturası ya da aynı numaralı bir fatura zaten var"""
+
+
+class InvalidInvoiceError(ValueError):
+    """Faturanın bir alanı geçersiz (ör. ISO formatında olmayan tarih)"""
+
+
+# İstek gövdesindeki tablo modelleri doğrulanmaz; bu alanlar ISO metni olarak gelebilir
+_INVOICE_DATETIME_FIELDS = ("billing_period_start", "billing_period_end", "due_date", "created_at", "paid_at")
+
+
+def _parse_datetimes(invoice: Invoice) -> None:
+    """Metin olarak gelen tarih alanlarını datetime'a (saat dilimi verilmişse UTC'ye) çevir"""
+    for field in _INVOICE_DATETIME_FIELDS:
+        value = getattr(invoice, field)
+        if not isinstance(value, str):
+            continue
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError as e:
+            raise InvalidInvoiceError(f"Invalid {field}: {value!r}") from e
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        setattr(invoice, field, parsed)
+
+
+def get_invoices(session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Invoice]:
     """Tüm faturaları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         return session.exec(select(Invoice)).all()
 
 
-def get_invoice_by_id(invoice_id: int) -> Optional[Invoice]:
+def get_invoices_page(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, as_rows: bool = False, session: Optional[Session] = None, max_lag: Optional[float] = None) -> Page:
+    """Faturaları en yeniden eskiye sayfalı getir (as_rows: ORM nesnesi yerine kolon satırları)"""
+    with read_session_scope(session, max_lag) as session:
+        return paginate(session, page_query(Invoice, as_rows), [Invoice.created_at, Invoice.id], limit, cursor, descending=True)
+
+
+def get_invoice_by_id(invoice_id: int, session: Optional[Session] = None) -> Optional[Invoice]:
     """ID'ye göre fatura getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         return session.get(Invoice, invoice_id)
 
 
-def get_invoices_by_user(user_id: int) -> List[Invoice]:
+def get_invoices_by_user(user_id: int, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Invoice]:
     """Kullanıcıya göre faturaları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(Invoice).where(Invoice.user_id == user_id)
         return session.exec(query).all()
 
 
-def get_invoices_by_user(user_id: int) -> List[Invoice]:
+def get_invoices_by_user(user_id: int, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Invoice]:
     """Kullanıcıya göre faturaları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(Invoice).where(Invoice.user_id == user_id)
         return session.exec(query).all()
 
-def get_invoices_by_status(status: str) -> List[Invoice]:
+def _user_invoices_query(user_id: int, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    # uq_invoice_user_id_billing_period (user_id, billing_period_start, ...) üzerinden yalnızca kullanıcının satırları okunur
+    query = select(Invoice).where(Invoice.user_id == user_id)
+    if start_date is not None:
+        query = query.where(Invoice.billing_period_start >= start_date)
+    if end_date is not None:
+        query = query.where(Invoice.billing_period_end <= end_date)
+    return query.order_by(Invoice.billing_period_start, Invoice.id)
+
+
+def get_invoices_by_user_and_period(user_id: int, start_date: datetime, end_date: datetime,
+                                    session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Invoice]:
+    """Kullanıcının belirli bir dönemdeki faturalarını getir"""
+    with read_session_scope(session, max_lag) as session:
+        return session.exec(_user_invoices_query(user_id, start_date, end_date)).all()
+
+
+def get_invoices_with_items_by_user(user_id: int, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                                    session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Invoice]:
+    """Kullanıcının (verilirse dönemdeki) faturalarını kalemleriyle getir; fatura sayısından bağımsız iki sorgu (selectinload)"""
+    with read_session_scope(session, max_lag) as session:
+        query = _user_invoices_query(user_id, start_date, end_date).options(selectinload(Invoice.items))
+        return session.exec(query).all()
+
+def get_invoices_by_status(status: str, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Invoice]:
     """Duruma göre faturaları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(Invoice).where(Invoice.status == status)
         return session.exec(query).all()
 
-def get_unpaid_invoice(phone_number: str) -> List[Invoice]:
+def get_unpaid_invoice(phone_number: str, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Invoice]:
     """Telefon numarasına göre ödenmemiş faturaları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(Invoice).join(User).where(
             User.phone_number == phone_number,
-            Invoice.is_paid == False
+            Invoice.status.in_(UNPAID_INVOICE_STATUSES)
         )
         return session.exec(query).all()
 
-def get_unpaid_invoices() -> List[Invoice]:
+def get_unpaid_invoices(session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Invoice]:
     """Ödenmemiş faturaları getir"""
-    with Session(engine) as session:
-        query = select(Invoice).where(Invoice.is_paid == False)
+    with read_session_scope(session, max_lag) as session:
+        query = select(Invoice).where(Invoice.status.in_(UNPAID_INVOICE_STATUSES))
         return session.exec(query).all()
 
 
-def get_active_invoice_by_phone(phone_number: str) -> Optional[Invoice]:
+# Vadeden bu yana geçen gün sayısına göre yaşlandırma aralıkları: (etiket, aralığın en fazla gün sayısı)
+AGING_BUCKETS = (("0-30", 30), ("31-60", 60), ("61-90", 90), ("90+", None))
+
+
+def _unpaid_aging_rows(as_of: datetime, user_id: Optional[int] = None):
+    """Ödenmemiş faturaların user_id, tutar ve yaşlandırma aralığı (ix_invoice_unpaid üzerinden)"""
+    # Vadesi henüz gelmemiş faturalar 0-30 aralığına girer; vadesi olmayanlarda oluşturulma tarihi esas alınır
+    reference = func.coalesce(Invoice.due_date, Invoice.created_at)
+    bucket = case(
+        *[(reference > as_of - timedelta(days=days + 1), label) for label, days in AGING_BUCKETS if days is not None],
+        else_=AGING_BUCKETS[-1][0],
+    )
+    # Durumlar SQL'e sabit olarak yazılır; parametreyle planlayıcı sorgunun kısmi index'in
+    # koşulunu (status IN ('pending', 'overdue')) kapsadığını göremez ve tabloyu tarar
+    unpaid = bindparam("unpaid_statuses", list(UNPAID_INVOICE_STATUSES), expanding=True, literal_execute=True)
+    query = select(Invoice.user_id, Invoice.total_amount, bucket.label("bucket")).where(Invoice.status.in_(unpaid))
+    if user_id is not None:
+        query = query.where(Invoice.user_id == user_id)
+    return query.subquery()
+
+
+def _aging_summary(counts: List[int], totals: List[float]) -> Dict[str, Any]:
+    return {
+        "buckets": {
+            label: {"count": int(count or 0), "total": round(float(total or 0), 2)}
+            for (label, _), count, total in zip(AGING_BUCKETS, counts, totals)
+        },
+        "count": int(sum(count or 0 for count in counts)),
+        "total": round(float(sum(total or 0 for total in totals)), 2),
+    }
+
+
+def get_invoice_aging(as_of: Optional[datetime] = None, session: Optional[Session] = None, max_lag: Optional[float] = None) -> Dict[str, Any]:
+    """Ödenmemiş faturaların yaşlandırma aralıklarına göre adet ve tutar toplamları (tek GROUP BY)"""
+    as_of = as_of or datetime.utcnow()
+    rows = _unpaid_aging_rows(as_of)
+    query = select(rows.c.bucket, func.count(), func.sum(rows.c.total_amount)).group_by(rows.c.bucket)
+    with read_session_scope(session, max_lag) as session:
+        by_bucket = {bucket: (count, total) for bucket, count, total in session.exec(query).all()}
+    counts, totals = zip(*[by_bucket.get(label, (0, 0)) for label, _ in AGING_BUCKETS])
+    return {"as_of": as_of, **_aging_summary(counts, totals)}
+
+
+def get_invoice_aging_by_user(as_of: Optional[datetime] = None, user_id: Optional[int] = None, limit: int = 100,
+                              session: Optional[Session] = None, max_lag: Optional[float] = None) -> Dict[str, Any]:
+    """Kullanıcı başına yaşlandırma aralıkları; en yüksek ödenmemiş tutardan başlayarak (tek GROUP BY)"""
+    as_of = as_of or datetime.utcnow()
+    rows = _unpaid_aging_rows(as_of, user_id)
+    columns = []
+    for label, _ in AGING_BUCKETS:
+        columns.append(func.sum(case((rows.c.bucket == label, 1), else_=0)))
+        columns.append(func.sum(case((rows.c.bucket == label, rows.c.total_amount), else_=0)))
+    total = func.sum(rows.c.total_amount)
+    query = (
+        select(rows.c.user_id, *columns)
+        .group_by(rows.c.user_id)
+        .order_by(total.desc(), rows.c.user_id)
+        .limit(limit)
+    )
+    with read_session_scope(session, max_lag) as session:
+        users = [
+            {"user_id": row[0], **_aging_summary(row[1::2], row[2::2])}
+            for row in session.exec(query).all()
+        ]
+    return {"as_of": as_of, "users": users}
+
+
+def get_active_invoice_by_phone(phone_number: str, session: Optional[Session] = None) -> Optional[Invoice]:
     """Telefon numarasına göre aktif faturayı getir (pending veya overdue durumundaki)"""
-    with Session(engine) as session:
-        query = select(Invoice).join(User).where(
-            User.phone_number == phone_number,
-        ).order_by(Invoice.created_at.desc())
+    with session_scope(session) as session:
+        user = get_user_profile_by_phone(phone_number, session=session)
+        if user is None:
+            return None
+        query = select(Invoice).where(Invoice.user_id == user.id).order_by(Invoice.created_at.desc())
         return session.exec(query).first()
 
 
-def create_invoice(invoice: Invoice) -> Invoice:
+async def get_invoices_by_user_async(session: AsyncSession, user_id: int) -> List[Invoice]:
+    """Kullanıcıya göre faturaları getir (async)"""
+    query = select(Invoice).where(Invoice.user_id == user_id)
+    result = await session.exec(query)
+    return result.all()
+
+
+async def get_active_invoice_by_user_async(session: AsyncSession, user_id: int) -> Optional[Invoice]:
+    """Kullanıcının en son faturasını getir (async)"""
+    query = select(Invoice).where(Invoice.user_id == user_id).order_by(Invoice.created_at.desc())
+    result = await session.exec(query)
+    return result.first()
+
+
+async def get_active_invoice_by_phone_async(session: AsyncSession, phone_number: str) -> Optional[Invoice]:
+    """Telefon numarasına göre aktif faturayı getir (async)"""
+    user = await get_user_profile_by_phone_async(session, phone_number)
+    if user is None:
+        return None
+    return await get_active_invoice_by_user_async(session, user.id)
+
+
+def create_invoice(invoice: Invoice, session: Optional[Session] = None) -> Invoice:
     """Yeni fatura oluştur - Son 1 ay içindeki hizmet satın alımlarını ve aktif paket ücretini otomatik ekler"""
-    with Session(engine) as session:
+    _parse_datetimes(invoice)
+    if not invoice.invoice_number:
+        invoice.invoice_number = next_invoice_number(invoice.billing_period_start)
+    with session_scope(session) as session:
         # Önce faturayı kaydet
         session.add(invoice)
-        session.commit()
+        try:
+            commit_session(session)
+        except IntegrityError as e:
+            session.rollback()
+            # Yabancı anahtar vb. diğer ihlaller olduğu gibi yükselir
+            conflict = session.exec(select(Invoice.id).where(
+                (Invoice.invoice_number == invoice.invoice_number)
+                | ((Invoice.user_id == invoice.user_id)
+                   & (Invoice.billing_period_start == invoice.billing_period_start)
+                   & (Invoice.billing_period_end == invoice.billing_period_end))
+            )).first()
+            if conflict is None:
+                raise
+            raise DuplicateInvoiceError(
+                f"User {invoice.user_id} already has an invoice for this billing period "
+                f"or invoice number {invoice.invoice_number} is taken"
+            ) from e
         session.refresh(invoice)
         
         # Kullanıcının aktif aboneliğini ve paketini getir
@@ -82,24 +258,26 @@ def create_invoice(invoice: Invoice) -> Invoice:
             )
         ).first()
         
-        total_amount = invoice.total_amount or 0
+        # Tutarlar kuruş cinsinden toplanır (toplu fatura kesimiyle aynı yuvarlama)
+        total_cents = to_cents(invoice.total_amount or 0)
         
         # Aktif paket ücretini faturaya ekle
         if active_subscription:
             package = session.get(Package, active_subscription.package_id)
             if package and package.monthly_fee and package.monthly_fee > 0:
+                net = line_amounts(1, package.monthly_fee, DEFAULT_TAX_RATE).net
                 package_item = InvoiceItem(
                     invoice_id=invoice.id,
                     service_type="Package",
                     description=f"Aylık Paket Ücreti - {package.name}",
                     quantity=1,
                     unit_price=package.monthly_fee,
-                    total_price=package.monthly_fee,
-                    tax_rate=0.18  # %18 KDV
+                    total_price=from_cents(net),
+                    tax_rate=DEFAULT_TAX_RATE
                 )
                 
                 session.add(package_item)
-                total_amount += package.monthly_fee
+                total_cents += net
         
         # Son 1 ay içindeki hizmet satın alımlarını getir
         one_month_ago = invoice.created_at - timedelta(days=30)
@@ -115,77 +293,84 @@ def create_invoice(invoice: Invoice) -> Invoice:
         
         # Her hizmet satın alımını fatura kalemi olarak ekle
         for purchase in service_purchases:
+            net = line_amounts(purchase.count, purchase.unit_price, DEFAULT_TAX_RATE, net_price=purchase.purchase_price).net
             invoice_item = InvoiceItem(
                 invoice_id=invoice.id,
                 service_type=purchase.service_type,
                 description=f"{purchase.service_type} - {purchase.count} adet",
                 quantity=purchase.count,
                 unit_price=purchase.unit_price,
-                total_price=purchase.purchase_price,
-                tax_rate=0.18  # %18 KDV
+                total_price=from_cents(net),
+                tax_rate=DEFAULT_TAX_RATE
             )
             
             session.add(invoice_item)
-            total_amount += purchase.purchase_price
+            total_cents += net
             
             # Hizmet satın alımını kullanılmış olarak işaretle
             purchase.is_used = True
             session.add(purchase)
         
         # Faturanın toplam tutarını güncelle
-        invoice.total_amount = total_amount
+        invoice.total_amount = from_cents(total_cents)
         session.add(invoice)
         
-        session.commit()
+        commit_session(session)
         session.refresh(invoice)
         return invoice
 
 
-def update_invoice(invoice_id: int, invoice_data: dict) -> Optional[Invoice]:
+def update_invoice(invoice_id: int, invoice_data: dict, session: Optional[Session] = None) -> Optional[Invoice]:
     """Fatura bilgilerini güncelle"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         invoice = session.get(Invoice, invoice_id)
         if invoice:
             for key, value in invoice_data.items():
                 setattr(invoice, key, value)
             session.add(invoice)
-            session.commit()
+            commit_session(session)
             session.refresh(invoice)
             return invoice
         return None
 
 
-def delete_invoice(invoice_id: int) -> bool:
+def delete_invoice(invoice_id: int, session: Optional[Session] = None) -> bool:
     """Fatura sil"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         invoice = session.get(Invoice, invoice_id)
         if invoice:
             session.delete(invoice)
-            session.commit()
+            commit_session(session)
             return True
         return False
 
 
-def mark_invoice_as_paid(invoice_id: int) -> Optional[Invoice]:
+def mark_invoice_as_paid(invoice_id: int, session: Optional[Session] = None) -> Optional[Invoice]:
     """Faturayı ödenmiş olarak işaretle"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         invoice = session.get(Invoice, invoice_id)
         if invoice:
-            invoice.is_paid = True
             invoice.status = "paid"
             invoice.paid_at = datetime.utcnow()
             session.add(invoice)
-            session.commit()
+            commit_session(session)
             session.refresh(invoice)
             return invoice
         return None
 
 
-def get_invoices_by_period(start_date: datetime, end_date: datetime) -> List[Invoice]:
+def get_invoices_by_period(start_date: datetime, end_date: datetime, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Invoice]:
     """Belirli bir dönemdeki faturaları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(Invoice).where(
             Invoice.billing_period_start >= start_date,
             Invoice.billing_period_end <= end_date
         )
         return session.exec(query).all()
+
+
+def iter_invoices_for_export(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                             max_lag: Optional[float] = None) -> Iterator[Mapping[str, Any]]:
+    """Faturaları oluşturulma tarihi aralığına göre export için akıt"""
+    query = date_range_query(Invoice.__table__, Invoice.created_at, start_date, end_date)
+    return stream_rows(query.order_by(Invoice.created_at, Invoice.id), max_lag=max_lag)
@@ -1,83 +1,103 @@
 from sqlmodel import Session, select
-from typing import List, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, Iterator, List, Mapping, Optional
+from datetime import datetime
+from app.models.invoice import Invoice
 from app.models.invoiceitem import InvoiceItem
-from app.db.database import engine
+from app.db.database import session_scope, commit_session
+from app.db.replica import read_session_scope
+from app.crud.export import date_range_query, stream_rows
+from app.utils.billing_calculator import from_cents, to_cents
 
 
-def get_invoice_items() -> List[InvoiceItem]:
+def get_invoice_items(session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[InvoiceItem]:
     """Tüm fatura kalemlerini getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         return session.exec(select(InvoiceItem)).all()
 
 
-def get_invoice_item_by_id(item_id: int) -> Optional[InvoiceItem]:
+def get_invoice_item_by_id(item_id: int, session: Optional[Session] = None) -> Optional[InvoiceItem]:
     """ID'ye göre fatura kalemi getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         return session.get(InvoiceItem, item_id)
 
 
-def get_invoice_items_by_invoice(invoice_id: int) -> List[InvoiceItem]:
+def get_invoice_items_by_invoice(invoice_id: int, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[InvoiceItem]:
     """Faturaya göre fatura kalemlerini getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(InvoiceItem).where(InvoiceItem.invoice_id == invoice_id)
         return session.exec(query).all()
 
 
-def get_invoice_items_by_service_type(service_type: str) -> List[InvoiceItem]:
+async def get_invoice_items_by_invoice_async(session: AsyncSession, invoice_id: int) -> List[InvoiceItem]:
+    """Faturaya göre fatura kalemlerini getir (async)"""
+    query = select(InvoiceItem).where(InvoiceItem.invoice_id == invoice_id)
+    result = await session.exec(query)
+    return result.all()
+
+
+def get_invoice_items_by_service_type(service_type: str, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[InvoiceItem]:
     """Hizmet tipine göre fatura kalemlerini getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(InvoiceItem).where(InvoiceItem.service_type == service_type)
         return session.exec(query).all()
 
 
-def create_invoice_item(invoice_item: InvoiceItem) -> InvoiceItem:
+def create_invoice_item(invoice_item: InvoiceItem, session: Optional[Session] = None) -> InvoiceItem:
     """Yeni fatura kalemi oluştur"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         session.add(invoice_item)
-        session.commit()
+        commit_session(session)
         session.refresh(invoice_item)
         return invoice_item
 
 
-def update_invoice_item(item_id: int, item_data: dict) -> Optional[InvoiceItem]:
+def update_invoice_item(item_id: int, item_data: dict, session: Optional[Session] = None) -> Optional[InvoiceItem]:
     """Fatura kalemi bilgilerini güncelle"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         invoice_item = session.get(InvoiceItem, item_id)
         if invoice_item:
             for key, value in item_data.items():
                 setattr(invoice_item, key, value)
             session.add(invoice_item)
-            session.commit()
+            commit_session(session)
             session.refresh(invoice_item)
             return invoice_item
         return None
 
 
-def delete_invoice_item(item_id: int) -> bool:
+def delete_invoice_item(item_id: int, session: Optional[Session] = None) -> bool:
     """Fatura kalemi sil"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         invoice_item = session.get(InvoiceItem, item_id)
         if invoice_item:
             session.delete(invoice_item)
-            session.commit()
+            commit_session(session)
             return True
         return False
 
 
-def calculate_total_for_invoice(invoice_id: int) -> float:
-    """Bir faturanın toplam tutarını hesapla"""
-    with Session(engine) as session:
-        query = select(InvoiceItem).where(InvoiceItem.invoice_id == invoice_id)
-        items = session.exec(query).all()
-        return sum(item.total_price for item in items)
+def calculate_total_for_invoice(invoice_id: int, session: Optional[Session] = None) -> float:
+    """Bir faturanın toplam tutarını hesapla (kalem tutarları kuruş cinsinden toplanır)"""
+    with session_scope(session) as session:
+        query = select(InvoiceItem.total_price).where(InvoiceItem.invoice_id == invoice_id)
+        return from_cents(sum(to_cents(total_price) for total_price in session.exec(query).all()))
 
 
-def create_multiple_invoice_items(invoice_items: List[InvoiceItem]) -> List[InvoiceItem]:
+def create_multiple_invoice_items(invoice_items: List[InvoiceItem], session: Optional[Session] = None) -> List[InvoiceItem]:
     """Birden fazla fatura kalemi oluştur"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         for item in invoice_items:
             session.add(item)
-        session.commit()
+        commit_session(session)
         for item in invoice_items:
             session.refresh(item)
         return invoice_items
+
+
+def iter_invoice_items_for_export(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                                  max_lag: Optional[float] = None) -> Iterator[Mapping[str, Any]]:
+    """Fatura kalemlerini, bağlı oldukları faturanın tarih aralığına göre export için akıt"""
+    query = date_range_query(InvoiceItem.__table__, Invoice.created_at, start_date, end_date)
+    query = query.join(Invoice, InvoiceItem.invoice_id == Invoice.id)
+    return stream_rows(query.order_by(InvoiceItem.invoice_id, InvoiceItem.id), max_lag=max_lag)
@@ -0,0 +1,82 @@
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Deque, List
+from sqlalchemy import text, update
+from app.db.config import get_settings
+from app.db.database import engine
+from app.models.invoicenumbercounter import InvoiceNumberCounter
+
+settings = get_settings()
+
+# PostgreSQL'de numaralar sequence'ten, diğer veritabanlarında sayaç satırından ayrılır
+INVOICE_NUMBER_SEQUENCE = "invoice_number_seq"
+INVOICE_NUMBER_COUNTER = "invoice_number"
+
+
+def format_invoice_number(period_start: datetime, number: int) -> str:
+    """Dönem önekli fatura numarası, ör. INV-202509-000012345"""
+    return f"{settings.INVOICE_NUMBER_PREFIX}-{period_start:%Y%m}-{number:09d}"
+
+
+def reserve_invoice_numbers(count: int) -> List[int]:
+    """Veritabanından count adet kullanılmamış numarayı tek sorguyla, kendi transaction'ında ayır
+
+    Sequence değerleri transaction dışıdır, eş zamanlı ayırmalar birbirini beklemez; sayaç
+    satırı yalnızca tek bir UPDATE süresince kilitlenir.
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            query = text(f"SELECT nextval('{INVOICE_NUMBER_SEQUENCE}') FROM generate_series(1, :count)")
+            return list(connection.execute(query, {"count": count}).scalars())
+        counter = InvoiceNumberCounter.__table__
+        end = connection.execute(
+            update(counter)
+            .where(counter.c.name == INVOICE_NUMBER_COUNTER)
+            .values(next_value=counter.c.next_value + count)
+            .returning(counter.c.next_value)
+        ).scalar_one()
+        return list(range(end - count, end))
+
+
+class InvoiceNumberAllocator:
+    """Fatura numaralarını veritabanından blok blok ayırıp process içinde dağıtan ayırıcı
+
+    Her blok tek round trip'tir; blok bitene kadar numaralar veritabanına gitmeden verilir.
+    Numaralar benzersizdir ama boşluksuz ve process'ler arasında sıralı değildir:
+    - process kapanınca bloğun kullanılmayan numaraları kaybolur,
+    - geri alınan transaction'larda ve aynı dönem faturası zaten olduğu için eklenmeyen
+      faturalarda kullanılan numaralar tekrar verilmez,
+    - paralel worker'lar farklı bloklardan numara verdiği için numara sırası oluşturulma
+      sırasıyla aynı olmayabilir.
+    """
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self._numbers: Deque[int] = deque()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def allocate(self, count: int) -> List[int]:
+        with self._lock:
+            # Fork edilen process ebeveynin ayırdığı bloğu tekrar dağıtmasın
+            if self._pid != os.getpid():
+                self._numbers.clear()
+                self._pid = os.getpid()
+            missing = count - len(self._numbers)
+            if missing > 0:
+                self._numbers.extend(reserve_invoice_numbers(max(self.block_size, missing)))
+            return [self._numbers.popleft() for _ in range(count)]
+
+
+invoice_number_allocator = InvoiceNumberAllocator(settings.INVOICE_NUMBER_BLOCK_SIZE)
+
+
+def next_invoice_numbers(period_start: datetime, count: int) -> List[str]:
+    """Dönem için count adet yeni fatura numarası"""
+    return [format_invoice_number(period_start, number) for number in invoice_number_allocator.allocate(count)]
+
+
+def next_invoice_number(period_start: datetime) -> str:
+    return next_invoice_numbers(period_start, 1)[0]
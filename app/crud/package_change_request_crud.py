@@ -2,97 +2,105 @@ from sqlmodel import Session, select
 from typing import List, Optional
 from datetime import datetime
 from app.models.packagechangerequest import PackageChangeRequest
-from app.db.database import engine
+from app.db.database import session_scope, commit_session
+from app.db.replica import read_session_scope
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Page, paginate
 
 
-def get_package_change_requests() -> List[PackageChangeRequest]:
+def get_package_change_requests(session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[PackageChangeRequest]:
     """Tüm paket değişiklik taleplerini getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         return session.exec(select(PackageChangeRequest)).all()
 
 
-def get_package_change_request_by_id(request_id: int) -> Optional[PackageChangeRequest]:
+def get_package_change_requests_page(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, session: Optional[Session] = None, max_lag: Optional[float] = None) -> Page:
+    """Paket değişiklik taleplerini en yeniden eskiye sayfalı getir"""
+    with read_session_scope(session, max_lag) as session:
+        return paginate(session, select(PackageChangeRequest), [PackageChangeRequest.requested_at, PackageChangeRequest.id], limit, cursor, descending=True)
+
+
+def get_package_change_request_by_id(request_id: int, session: Optional[Session] = None) -> Optional[PackageChangeRequest]:
     """ID'ye göre paket değişiklik talebi getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         return session.get(PackageChangeRequest, request_id)
 
 
-def get_package_change_requests_by_user(user_id: int) -> List[PackageChangeRequest]:
+def get_package_change_requests_by_user(user_id: int, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[PackageChangeRequest]:
     """Kullanıcıya göre paket değişiklik taleplerini getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(PackageChangeRequest).where(PackageChangeRequest.user_id == user_id)
         return session.exec(query).all()
 
 
-def get_package_change_requests_by_status(status: str) -> List[PackageChangeRequest]:
+def get_package_change_requests_by_status(status: str, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[PackageChangeRequest]:
     """Duruma göre paket değişiklik taleplerini getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(PackageChangeRequest).where(PackageChangeRequest.status == status)
         return session.exec(query).all()
 
 
-def get_pending_package_change_requests() -> List[PackageChangeRequest]:
+def get_pending_package_change_requests(session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[PackageChangeRequest]:
     """Bekleyen paket değişiklik taleplerini getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(PackageChangeRequest).where(PackageChangeRequest.status == "pending")
         return session.exec(query).all()
 
 
-def create_package_change_request(package_change_request: PackageChangeRequest) -> PackageChangeRequest:
+def create_package_change_request(package_change_request: PackageChangeRequest, session: Optional[Session] = None) -> PackageChangeRequest:
     """Yeni paket değişiklik talebi oluştur"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         session.add(package_change_request)
-        session.commit()
+        commit_session(session)
         session.refresh(package_change_request)
         return package_change_request
 
 
-def update_package_change_request(request_id: int, request_data: dict) -> Optional[PackageChangeRequest]:
+def update_package_change_request(request_id: int, request_data: dict, session: Optional[Session] = None) -> Optional[PackageChangeRequest]:
     """Paket değişiklik talebi bilgilerini güncelle"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         package_change_request = session.get(PackageChangeRequest, request_id)
         if package_change_request:
             for key, value in request_data.items():
                 setattr(package_change_request, key, value)
             session.add(package_change_request)
-            session.commit()
+            commit_session(session)
             session.refresh(package_change_request)
             return package_change_request
         return None
 
 
-def delete_package_change_request(request_id: int) -> bool:
+def delete_package_change_request(request_id: int, session: Optional[Session] = None) -> bool:
     """Paket değişiklik talebi sil"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         package_change_request = session.get(PackageChangeRequest, request_id)
         if package_change_request:
             session.delete(package_change_request)
-            session.commit()
+            commit_session(session)
             return True
         return False
 
 
-def approve_package_change_request(request_id: int) -> Optional[PackageChangeRequest]:
+def approve_package_change_request(request_id: int, session: Optional[Session] = None) -> Optional[PackageChangeRequest]:
     """Paket değişiklik talebini onayla"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         package_change_request = session.get(PackageChangeRequest, request_id)
         if package_change_request:
             package_change_request.status = "approved"
             session.add(package_change_request)
-            session.commit()
+            commit_session(session)
             session.refresh(package_change_request)
             return package_change_request
         return None
 
 
-def reject_package_change_request(request_id: int) -> Optional[PackageChangeRequest]:
+def reject_package_change_request(request_id: int, session: Optional[Session] = None) -> Optional[PackageChangeRequest]:
     """Paket değişiklik talebini reddet"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         package_change_request = session.get(PackageChangeRequest, request_id)
         if package_change_request:
             package_change_request.status = "rejected"
             session.add(package_change_request)
-            session.commit()
+            commit_session(session)
             session.refresh(package_change_request)
             return package_change_request
         return None
@@ -1,65 +1,65 @@
 from sqlmodel import Session, select
 from typing import List, Optional
 from app.models.package import Package
-from app.db.database import engine
+from app.db.database import session_scope, commit_session
 
 
-def get_packages() -> List[Package]:
+def get_packages(session: Optional[Session] = None) -> List[Package]:
     """Tüm paketleri getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         return session.exec(select(Package)).all()
 
 
-def get_package_by_id(package_id: int) -> Optional[Package]:
+def get_package_by_id(package_id: int, session: Optional[Session] = None) -> Optional[Package]:
     """ID'ye göre paket getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         return session.get(Package, package_id)
 
 
-def get_packages_by_type(package_type: str) -> List[Package]:
+def get_packages_by_type(package_type: str, session: Optional[Session] = None) -> List[Package]:
     """Tipe göre paketleri getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         query = select(Package).where(Package.type == package_type)
         return session.exec(query).all()
 
 
-def create_package(package: Package) -> Package:
+def create_package(package: Package, session: Optional[Session] = None) -> Package:
     """Yeni paket oluştur"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         session.add(package)
-        session.commit()
+        commit_session(session)
         session.refresh(package)
         return package
 
 
-def update_package(package_id: int, package_data: dict) -> Optional[Package]:
+def update_package(package_id: int, package_data: dict, session: Optional[Session] = None) -> Optional[Package]:
     """Paket bilgilerini güncelle"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         package = session.get(Package, package_id)
         if package:
             for key, value in package_data.items():
                 setattr(package, key, value)
             session.add(package)
-            session.commit()
+            commit_session(session)
             session.refresh(package)
             return package
         return None
 
 
-def delete_package(package_id: int) -> bool:
+def delete_package(package_id: int, session: Optional[Session] = None) -> bool:
     """Paket sil"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         package = session.get(Package, package_id)
         if package:
             session.delete(package)
-            session.commit()
+            commit_session(session)
             return True
         return False
 
 
-def get_package_by_user_phone(phone_number: str) -> Optional[Package]:
+def get_package_by_user_phone(phone_number: str, session: Optional[Session] = None) -> Optional[Package]:
     """Kullanıcının telefon numarasına göre paket getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         from app.models.user import User
         query = select(User).where(User.phone_number == phone_number)
         user = session.exec(query).first()
@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence
+from sqlalchemy import tuple_
+from sqlmodel import Session, select
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursorError(ValueError):
+    """Cursor çözülemediğinde veya sıralama anahtarıyla uyuşmadığında fırlatılır"""
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Sıralama anahtarı değerlerini opak bir cursor string'ine çevir"""
+    payload = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_length: int) -> List[Any]:
+    """Cursor'ı sıralama anahtarı değerlerine geri çevir"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = [
+            datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value
+            for value in payload
+        ]
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+    if len(values) != key_length:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    return values
+
+
+def page_query(model, as_rows: bool = False):
+    """Modelin ORM nesnelerini ya da tablo kolonlarını (ORM'siz, hızlı JSON yolu için) seçen sorgu"""
+    return select(*model.__table__.columns) if as_rows else select(model)
+
+
+def paginate(session: Session, query, key_columns: Sequence[Any], limit: int = DEFAULT_PAGE_SIZE,
+             cursor: Optional[str] = None, descending: bool = False) -> Page:
+    """Sorguyu (created_at, id) gibi benzersiz bir anahtar üzerinden keyset yöntemiyle sayfala
+
+    OFFSET kullanılmadığı için sayfa ne kadar derinde olursa olsun sorgu, anahtar index'i
+    üzerinden son görülen değerden itibaren limit+1 satır okur.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    key = tuple_(*key_columns)
+    if cursor:
+        last_values = tuple_(*decode_cursor(cursor, len(key_columns)))
+        query = query.where(key < last_values if descending else key > last_values)
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in key_columns])
+    rows = session.exec(query.limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in key_columns])
+    return Page(items=rows, next_cursor=next_cursor)
@@ -2,87 +2,95 @@ from sqlmodel import Session, select
 from typing import List, Optional
 from datetime import datetime
 from app.models.problems import Problem
-from app.db.database import engine
+from app.db.database import session_scope, commit_session
+from app.db.replica import read_session_scope
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Page, paginate
 
 
-def get_problems() -> List[Problem]:
+def get_problems(session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Problem]:
     """Tüm problemleri getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         return session.exec(select(Problem)).all()
 
 
-def get_problem_by_id(problem_id: int) -> Optional[Problem]:
+def get_problems_page(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, session: Optional[Session] = None, max_lag: Optional[float] = None) -> Page:
+    """Problemleri en yeniden eskiye sayfalı getir"""
+    with read_session_scope(session, max_lag) as session:
+        return paginate(session, select(Problem), [Problem.created_at, Problem.id], limit, cursor, descending=True)
+
+
+def get_problem_by_id(problem_id: int, session: Optional[Session] = None) -> Optional[Problem]:
     """ID'ye göre problem getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         return session.get(Problem, problem_id)
 
 
-def get_problems_by_location(location: str) -> List[Problem]:
+def get_problems_by_location(location: str, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Problem]:
     """Lokasyona göre problemleri getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(Problem).where(Problem.location == location).where(Problem.status == "pending")
         return session.exec(query).all()
 
 
-def get_problems_by_completion_time(completion_time: datetime) -> List[Problem]:
+def get_problems_by_completion_time(completion_time: datetime, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Problem]:
     """Tahmini tamamlanma zamanına göre problemleri getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(Problem).where(Problem.estimated_completion_time <= completion_time)
         return session.exec(query).all()
 
 
-def get_overdue_problems() -> List[Problem]:
+def get_overdue_problems(session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Problem]:
     """Süresi geçmiş problemleri getir"""
     current_time = datetime.now()
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(Problem).where(Problem.estimated_completion_time < current_time)
         return session.exec(query).all()
 
 
-def create_problem(problem: Problem) -> Problem:
+def create_problem(problem: Problem, session: Optional[Session] = None) -> Problem:
     """Yeni problem oluştur"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         session.add(problem)
-        session.commit()
+        commit_session(session)
         session.refresh(problem)
         return problem
 
 
-def update_problem(problem_id: int, problem_data: dict) -> Optional[Problem]:
+def update_problem(problem_id: int, problem_data: dict, session: Optional[Session] = None) -> Optional[Problem]:
     """Problem bilgilerini güncelle"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         problem = session.get(Problem, problem_id)
         if problem:
             for key, value in problem_data.items():
                 setattr(problem, key, value)
             session.add(problem)
-            session.commit()
+            commit_session(session)
             session.refresh(problem)
             return problem
         return None
 
 
-def delete_problem(problem_id: int) -> bool:
+def delete_problem(problem_id: int, session: Optional[Session] = None) -> bool:
     """Problem sil"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         problem = session.get(Problem, problem_id)
         if problem:
             session.delete(problem)
-            session.commit()
+            commit_session(session)
             return True
         return False
 
 
-def search_problems_by_description(search_term: str) -> List[Problem]:
+def search_problems_by_description(search_term: str, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Problem]:
     """Problem açıklamasında arama yap"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(Problem).where(Problem.problem.contains(search_term))
         return session.exec(query).all()
 
 
-def get_problems_by_date_range(start_date: datetime, end_date: datetime) -> List[Problem]:
+def get_problems_by_date_range(start_date: datetime, end_date: datetime, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[Problem]:
     """Belirli bir tarih aralığındaki problemleri getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(Problem).where(
             Problem.estimated_completion_time >= start_date,
             Problem.estimated_completion_time <= end_date
@@ -1,31 +1,40 @@
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from app.models.remaininguses import RemainingUses
-from app.db.database import engine
+from app.db.database import session_scope, commit_session
+from app.db.replica import read_session_scope
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Page, paginate
 
 
-def get_remaining_uses() -> List[RemainingUses]:
+def get_remaining_uses(session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[RemainingUses]:
     """Tüm kalan kullanımları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         return session.exec(select(RemainingUses)).all()
 
 
-def get_remaining_uses_by_id(remaining_uses_id: int) -> Optional[RemainingUses]:
+def get_remaining_uses_page(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, session: Optional[Session] = None, max_lag: Optional[float] = None) -> Page:
+    """Kalan kullanımları id sırasıyla sayfalı getir"""
+    with read_session_scope(session, max_lag) as session:
+        return paginate(session, select(RemainingUses), [RemainingUses.id], limit, cursor)
+
+
+def get_remaining_uses_by_id(remaining_uses_id: int, session: Optional[Session] = None) -> Optional[RemainingUses]:
     """ID'ye göre kalan kullanım getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         return session.get(RemainingUses, remaining_uses_id)
 
 
-def get_remaining_uses_by_user(user_id: int) -> List[RemainingUses]:
+def get_remaining_uses_by_user(user_id: int, session: Optional[Session] = None) -> List[RemainingUses]:
     """Kullanıcıya göre kalan kullanımları getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         query = select(RemainingUses).where(RemainingUses.user_id == user_id)
         return session.exec(query).all()
 
 
-def get_remaining_uses_by_service(user_id: int, service_type: str) -> Optional[RemainingUses]:
+def get_remaining_uses_by_service(user_id: int, service_type: str, session: Optional[Session] = None) -> Optional[RemainingUses]:
     """Kullanıcı ve hizmet tipine göre kalan kullanım getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         query = select(RemainingUses).where(
             RemainingUses.user_id == user_id,
             RemainingUses.service_type == service_type
@@ -33,43 +42,60 @@ def get_remaining_uses_by_service(user_id: int, service_type: str) -> Optional[R
         return session.exec(query).first()
 
 
-def create_remaining_uses(remaining_uses: RemainingUses) -> RemainingUses:
+async def get_remaining_uses_by_user_async(session: AsyncSession, user_id: int) -> List[RemainingUses]:
+    """Kullanıcıya göre kalan kullanımları getir (async)"""
+    query = select(RemainingUses).where(RemainingUses.user_id == user_id)
+    result = await session.exec(query)
+    return result.all()
+
+
+async def get_remaining_uses_by_service_async(session: AsyncSession, user_id: int, service_type: str) -> Optional[RemainingUses]:
+    """Kullanıcı ve hizmet tipine göre kalan kullanım getir (async)"""
+    query = select(RemainingUses).where(
+        RemainingUses.user_id == user_id,
+        RemainingUses.service_type == service_type
+    )
+    result = await session.exec(query)
+    return result.first()
+
+
+def create_remaining_uses(remaining_uses: RemainingUses, session: Optional[Session] = None) -> RemainingUses:
     """Yeni kalan kullanım oluştur"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         session.add(remaining_uses)
-        session.commit()
+        commit_session(session)
         session.refresh(remaining_uses)
         return remaining_uses
 
 
-def update_remaining_uses(remaining_uses_id: int, remaining_uses_data: dict) -> Optional[RemainingUses]:
+def update_remaining_uses(remaining_uses_id: int, remaining_uses_data: dict, session: Optional[Session] = None) -> Optional[RemainingUses]:
     """Kalan kullanım bilgilerini güncelle"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         remaining_uses = session.get(RemainingUses, remaining_uses_id)
         if remaining_uses:
             for key, value in remaining_uses_data.items():
                 setattr(remaining_uses, key, value)
             session.add(remaining_uses)
-            session.commit()
+            commit_session(session)
             session.refresh(remaining_uses)
             return remaining_uses
         return None
 
 
-def delete_remaining_uses(remaining_uses_id: int) -> bool:
+def delete_remaining_uses(remaining_uses_id: int, session: Optional[Session] = None) -> bool:
     """Kalan kullanım sil"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         remaining_uses = session.get(RemainingUses, remaining_uses_id)
         if remaining_uses:
             session.delete(remaining_uses)
-            session.commit()
+            commit_session(session)
             return True
         return False
 
 
-def decrease_remaining_count(user_id: int, service_type: str, count: int = 1) -> Optional[RemainingUses]:
+def decrease_remaining_count(user_id: int, service_type: str, count: int = 1, session: Optional[Session] = None) -> Optional[RemainingUses]:
     """Kalan kullanım sayısını azalt"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         query = select(RemainingUses).where(
             RemainingUses.user_id == user_id,
             RemainingUses.service_type == service_type
@@ -78,15 +104,15 @@ def decrease_remaining_count(user_id: int, service_type: str, count: int = 1) ->
         if remaining_uses and remaining_uses.remaining_count >= count:
             remaining_uses.remaining_count -= count
             session.add(remaining_uses)
-            session.commit()
+            commit_session(session)
             session.refresh(remaining_uses)
             return remaining_uses
         return None
 
 
-def increase_remaining_count(user_id: int, service_type: str, count: int) -> Optional[RemainingUses]:
+def increase_remaining_count(user_id: int, service_type: str, count: int, session: Optional[Session] = None) -> Optional[RemainingUses]:
     """Kalan kullanım sayısını artır"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         query = select(RemainingUses).where(
             RemainingUses.user_id == user_id,
             RemainingUses.service_type == service_type
@@ -96,7 +122,7 @@ def increase_remaining_count(user_id: int, service_type: str, count: int) -> Opt
             remaining_uses.remaining_count += count
             remaining_uses.total_allocated += count
             session.add(remaining_uses)
-            session.commit()
+            commit_session(session)
             session.refresh(remaining_uses)
             return remaining_uses
         return None
@@ -1,39 +1,49 @@
 from sqlmodel import Session, select
-from typing import List, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, Iterator, List, Mapping, Optional
 from datetime import datetime
 from app.models.servicepurchase import ServicePurchase
-from app.db.database import engine
+from app.db.database import session_scope, commit_session
+from app.db.replica import read_session_scope
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Page, paginate, page_query
+from app.crud.export import date_range_query, stream_rows
 
 
-def get_service_purchases() -> List[ServicePurchase]:
+def get_service_purchases(session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[ServicePurchase]:
     """Tüm hizmet satın alımlarını getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         return session.exec(select(ServicePurchase)).all()
 
 
-def get_service_purchase_by_id(purchase_id: int) -> Optional[ServicePurchase]:
+def get_service_purchases_page(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, as_rows: bool = False, session: Optional[Session] = None, max_lag: Optional[float] = None) -> Page:
+    """Hizmet satın alımlarını en yeniden eskiye sayfalı getir (as_rows: ORM nesnesi yerine kolon satırları)"""
+    with read_session_scope(session, max_lag) as session:
+        return paginate(session, page_query(ServicePurchase, as_rows), [ServicePurchase.purchase_date, ServicePurchase.id], limit, cursor, descending=True)
+
+
+def get_service_purchase_by_id(purchase_id: int, session: Optional[Session] = None) -> Optional[ServicePurchase]:
     """ID'ye göre hizmet satın alımı getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         return session.get(ServicePurchase, purchase_id)
 
 
-def get_service_purchases_by_user(user_id: int) -> List[ServicePurchase]:
+def get_service_purchases_by_user(user_id: int, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[ServicePurchase]:
     """Kullanıcıya göre hizmet satın alımlarını getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(ServicePurchase).where(ServicePurchase.user_id == user_id)
         return session.exec(query).all()
 
 
-def get_service_purchases_by_type(service_type: str) -> List[ServicePurchase]:
+def get_service_purchases_by_type(service_type: str, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[ServicePurchase]:
     """Hizmet tipine göre satın alımları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(ServicePurchase).where(ServicePurchase.service_type == service_type)
         return session.exec(query).all()
 
 
-def get_service_purchases_by_user_and_type(user_id: int, service_type: str) -> List[ServicePurchase]:
+def get_service_purchases_by_user_and_type(user_id: int, service_type: str, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[ServicePurchase]:
     """Kullanıcı ve hizmet tipine göre satın alımları getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(ServicePurchase).where(
             ServicePurchase.user_id == user_id,
             ServicePurchase.service_type == service_type
@@ -41,44 +51,61 @@ def get_service_purchases_by_user_and_type(user_id: int, service_type: str) -> L
         return session.exec(query).all()
 
 
-def create_service_purchase(service_purchase: ServicePurchase) -> ServicePurchase:
+async def get_service_purchases_by_user_async(session: AsyncSession, user_id: int) -> List[ServicePurchase]:
+    """Kullanıcıya göre hizmet satın alımlarını getir (async)"""
+    query = select(ServicePurchase).where(ServicePurchase.user_id == user_id)
+    result = await session.exec(query)
+    return result.all()
+
+
+async def get_service_purchases_by_user_and_type_async(session: AsyncSession, user_id: int, service_type: str) -> List[ServicePurchase]:
+    """Kullanıcı ve hizmet tipine göre satın alımları getir (async)"""
+    query = select(ServicePurchase).where(
+        ServicePurchase.user_id == user_id,
+        ServicePurchase.service_type == service_type
+    )
+    result = await session.exec(query)
+    return result.all()
+
+
+def create_service_purchase(service_purchase: ServicePurchase, session: Optional[Session] = None) -> ServicePurchase:
     """Yeni hizmet satın alımı oluştur"""
     service_purchase.purchase_price = service_purchase.unit_price*service_purchase.count
-    with Session(engine) as session:
+    with session_scope(session) as session:
         session.add(service_purchase)
-        session.commit()
+        commit_session(session)
         session.refresh(service_purchase)
         return service_purchase
 
 
-def update_service_purchase(purchase_id: int, purchase_data: dict) -> Optional[ServicePurchase]:
+def update_service_purchase(purchase_id: int, purchase_data: dict, session: Optional[Session] = None) -> Optional[ServicePurchase]:
     """Hizmet satın alımı bilgilerini güncelle"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         service_purchase = session.get(ServicePurchase, purchase_id)
         if service_purchase:
             for key, value in purchase_data.items():
                 setattr(service_purchase, key, value)
             session.add(service_purchase)
-            session.commit()
+            commit_session(session)
             session.refresh(service_purchase)
             return service_purchase
         return None
 
 
-def delete_service_purchase(purchase_id: int) -> bool:
+def delete_service_purchase(purchase_id: int, session: Optional[Session] = None) -> bool:
     """Hizmet satın alımı sil"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         service_purchase = session.get(ServicePurchase, purchase_id)
         if service_purchase:
             session.delete(service_purchase)
-            session.commit()
+            commit_session(session)
             return True
         return False
 
 
-def get_service_purchases_by_date_range(start_date: datetime, end_date: datetime) -> List[ServicePurchase]:
+def get_service_purchases_by_date_range(start_date: datetime, end_date: datetime, session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[ServicePurchase]:
     """Belirli bir tarih aralığındaki hizmet satın alımlarını getir"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(ServicePurchase).where(
             ServicePurchase.purchase_date >= start_date,
             ServicePurchase.purchase_date <= end_date
@@ -86,9 +113,29 @@ def get_service_purchases_by_date_range(start_date: datetime, end_date: datetime
         return session.exec(query).all()
 
 
-def get_total_spent_by_user(user_id: int) -> float:
+def get_service_purchases_by_user_and_date_range(user_id: int, start_date: datetime, end_date: datetime,
+                                                 session: Optional[Session] = None, max_lag: Optional[float] = None) -> List[ServicePurchase]:
+    """Kullanıcının belirli bir tarih aralığındaki hizmet satın alımlarını getir"""
+    with read_session_scope(session, max_lag) as session:
+        # ix_service_purchase_user_id_purchase_date_is_used üzerinden yalnızca kullanıcının satırları okunur
+        query = select(ServicePurchase).where(
+            ServicePurchase.user_id == user_id,
+            ServicePurchase.purchase_date >= start_date,
+            ServicePurchase.purchase_date <= end_date
+        ).order_by(ServicePurchase.purchase_date, ServicePurchase.id)
+        return session.exec(query).all()
+
+
+def get_total_spent_by_user(user_id: int, session: Optional[Session] = None, max_lag: Optional[float] = None) -> float:
     """Kullanıcının toplam harcamasını hesapla"""
-    with Session(engine) as session:
+    with read_session_scope(session, max_lag) as session:
         query = select(ServicePurchase).where(ServicePurchase.user_id == user_id)
         purchases = session.exec(query).all()
         return sum(purchase.purchase_price for purchase in purchases)
+
+
+def iter_service_purchases_for_export(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                                      max_lag: Optional[float] = None) -> Iterator[Mapping[str, Any]]:
+    """Hizmet satın alımlarını satın alma tarihi aralığına göre export için akıt"""
+    query = date_range_query(ServicePurchase.__table__, ServicePurchase.purchase_date, start_date, end_date)
+    return stream_rows(query.order_by(ServicePurchase.purchase_date, ServicePurchase.id), max_lag=max_lag)
@@ -1,13 +1,15 @@
 from sqlmodel import Session, select
 from sqlalchemy.orm import selectinload
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List, Optional
 from datetime import datetime, timezone, timedelta
 import re
 from app.models.subscription import Subscription
-from app.db.database import engine
+from app.db.database import session_scope, commit_session
 
 from app.models.packagechangerequest import PackageChangeRequest
 from app.crud.package_crud import get_package_by_id
+from app.crud.user_crud import get_user_profile_by_phone, get_user_profile_by_phone_async
 
 
 def parse_commitment_duration(commitment: str) -> int:
@@ -23,40 +25,40 @@ def parse_commitment_duration(commitment: str) -> int:
     return 0
 
 
-def get_subscriptions() -> List[Subscription]:
+def get_subscriptions(session: Optional[Session] = None) -> List[Subscription]:
     """Tüm abonelikleri getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         return session.exec(select(Subscription)).all()
 
 
-def get_subscription_by_id(subscription_id: int) -> Optional[Subscription]:
+def get_subscription_by_id(subscription_id: int, session: Optional[Session] = None) -> Optional[Subscription]:
     """ID'ye göre abonelik getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         return session.get(Subscription, subscription_id)
 
 
-def get_subscriptions_by_user(user_id: int) -> List[Subscription]:
+def get_subscriptions_by_user(user_id: int, session: Optional[Session] = None) -> List[Subscription]:
     """Kullanıcıya göre abonelikleri getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         query = select(Subscription).where(Subscription.user_id == user_id)
         return session.exec(query).all()
 
 
-def get_active_subscriptions() -> List[Subscription]:
+def get_active_subscriptions(session: Optional[Session] = None) -> List[Subscription]:
     """Aktif abonelikleri getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         query = select(Subscription).where(Subscription.is_active == True)
         return session.exec(query).all()
 
 
-def get_subscriptions_by_package(package_id: int) -> List[Subscription]:
+def get_subscriptions_by_package(package_id: int, session: Optional[Session] = None) -> List[Subscription]:
     """Pakete göre abonelikleri getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         query = select(Subscription).where(Subscription.package_id == package_id)
         return session.exec(query).all()
 
 
-def create_subscription(packagechangereq: PackageChangeRequest) -> Subscription:
+def create_subscription(packagechangereq: PackageChangeRequest, session: Optional[Session] = None) -> Subscription:
     """Yeni abonelik oluştur"""
     try:
         subscription = Subscription()
@@ -64,7 +66,7 @@ def create_subscription(packagechangereq: PackageChangeRequest) -> Subscription:
         subscription.package_id = packagechangereq.requested_package_id
 
         # Paket bilgilerini al
-        package = get_package_by_id(packagechangereq.requested_package_id)
+        package = get_package_by_id(packagechangereq.requested_package_id, session=session)
         
         subscription.is_active = True
         subscription.start_date = datetime.now(timezone.utc)
@@ -87,9 +89,9 @@ def create_subscription(packagechangereq: PackageChangeRequest) -> Subscription:
         subscription.created_at = datetime.now(timezone.utc)
         subscription.updated_at = datetime.now(timezone.utc)
         
-        with Session(engine) as session:
+        with session_scope(session) as session:
             session.add(subscription)
-            session.commit()
+            commit_session(session)
             session.refresh(subscription)
             print(f"Subscription created successfully: ID={subscription.id}")
             return subscription
@@ -98,51 +100,51 @@ def create_subscription(packagechangereq: PackageChangeRequest) -> Subscription:
         raise e
 
 
-def update_subscription(subscription_id: int, subscription_data: dict) -> Optional[Subscription]:
+def update_subscription(subscription_id: int, subscription_data: dict, session: Optional[Session] = None) -> Optional[Subscription]:
     """Abonelik bilgilerini güncelle"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         subscription = session.get(Subscription, subscription_id)
         if subscription:
             for key, value in subscription_data.items():
                 setattr(subscription, key, value)
             subscription.updated_at = datetime.utcnow()
             session.add(subscription)
-            session.commit()
+            commit_session(session)
             session.refresh(subscription)
             return subscription
         return None
 
 
-def delete_subscription(subscription_id: int) -> bool:
+def delete_subscription(subscription_id: int, session: Optional[Session] = None) -> bool:
     """Abonelik sil"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         subscription = session.get(Subscription, subscription_id)
         if subscription:
             session.delete(subscription)
-            session.commit()
+            commit_session(session)
             return True
         return False
 
 
-def deactivate_subscription(subscription_id: int) -> Optional[Subscription]:
+def deactivate_subscription(subscription_id: int, session: Optional[Session] = None) -> Optional[Subscription]:
     """Aboneliği deaktive et"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         subscription = session.get(Subscription, subscription_id)
         if subscription:
             subscription.is_active = False
             subscription.end_date = datetime.utcnow()
             subscription.updated_at = datetime.utcnow()
             session.add(subscription)
-            session.commit()
+            commit_session(session)
             session.refresh(subscription)
             return subscription
         return None
 
 
-def get_expiring_subscriptions(days: int = 30) -> List[Subscription]:
+def get_expiring_subscriptions(days: int = 30, session: Optional[Session] = None) -> List[Subscription]:
     """Belirli gün içinde süresi dolacak abonelikleri getir"""
     target_date = datetime.utcnow() + datetime.timedelta(days=days)
-    with Session(engine) as session:
+    with session_scope(session) as session:
         query = select(Subscription).where(
             Subscription.end_date <= target_date,
             Subscription.is_active == True
@@ -150,23 +152,30 @@ def get_expiring_subscriptions(days: int = 30) -> List[Subscription]:
         return session.exec(query).all()
 
 
-def get_user_active_subscription(user_id: int) -> Optional[Subscription]:
+def get_user_active_subscription(user_id: int, session: Optional[Session] = None) -> Optional[Subscription]:
     """Kullanıcının aktif aboneliğini getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         query = select(Subscription).options(selectinload(Subscription.package)).where(
             Subscription.user_id == user_id,
             Subscription.is_active == True
         )
         return session.exec(query).first()
 
-def get_user_active_subscription_by_phone(phone_number: str) -> Optional[Subscription]:
+
+async def get_user_active_subscription_async(session: AsyncSession, user_id: int) -> Optional[Subscription]:
+    """Kullanıcının aktif aboneliğini paketiyle birlikte getir (async)"""
+    query = select(Subscription).options(selectinload(Subscription.package)).where(
+        Subscription.user_id == user_id,
+        Subscription.is_active == True
+    )
+    result = await session.exec(query)
+    return result.first()
+
+def get_user_active_subscription_by_phone(phone_number: str, session: Optional[Session] = None) -> Optional[Subscription]:
     """Telefon numarasına göre kullanıcının aktif aboneliğini getir"""
-    with Session(engine) as session:
-        from app.models.user import User
-        
-        # Önce telefon numarasından kullanıcıyı bul
-        user_query = select(User).where(User.phone_number == phone_number)
-        user = session.exec(user_query).first()
+    with session_scope(session) as session:
+        # Önce telefon numarasından kullanıcıyı bul (önbellekten)
+        user = get_user_profile_by_phone(phone_number, session=session)
         
         if not user:
             return None
@@ -178,14 +187,19 @@ def get_user_active_subscription_by_phone(phone_number: str) -> Optional[Subscri
         )
         return session.exec(subscription_query).first()
 
-def get_commitment_time(phone_number: str) -> Optional[datetime]:
+
+async def get_user_active_subscription_by_phone_async(session: AsyncSession, phone_number: str) -> Optional[Subscription]:
+    """Telefon numarasına göre kullanıcının aktif aboneliğini getir (async, kullanıcı id'si önbellekten)"""
+    user = await get_user_profile_by_phone_async(session, phone_number)
+    if user is None:
+        return None
+    return await get_user_active_subscription_async(session, user.id)
+
+def get_commitment_time(phone_number: str, session: Optional[Session] = None) -> Optional[datetime]:
     """Kullanıcının taahhütünün ne zaman biteceğinin zamanını getirir"""
-    with Session(engine) as session:
-        from app.models.user import User
-        
-        # Önce telefon numarasından kullanıcıyı bul
-        user_query = select(User).where(User.phone_number == phone_number)
-        user = session.exec(user_query).first()
+    with session_scope(session) as session:
+        # Önce telefon numarasından kullanıcıyı bul (önbellekten)
+        user = get_user_profile_by_phone(phone_number, session=session)
         
         if not user:
             return None
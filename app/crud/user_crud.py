@@ -1,63 +1,208 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
 from sqlmodel import Session, select
-from typing import List, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Dict, Iterable, List, NamedTuple, Optional
 from app.models.user import User
-from app.db.database import engine
+from app.db.config import get_settings
+from app.db.database import session_scope, commit_session
+from app.db.replica import read_session_scope
+from app.crud.pagination import DEFAULT_PAGE_SIZE, Page, paginate
+from app.crud.user_search import user_search_index
+from app.crud.customer_cache import get_cached, get_cached_async, phone_key, set_cached, set_cached_async
+from app.utils.cache import MISSING, TTLCache
 
+settings = get_settings()
 
-def get_users() -> List[User]:
+
+class UserProfile(NamedTuple):
+    """Telefon numarası önbelleğinde tutulan temel kullanıcı bilgisi"""
+    id: int
+    name: str
+    surname: str
+    phone_number: str
+    email: Optional[str]
+    is_active: bool
+
+
+phone_cache = TTLCache(
+    maxsize=settings.PHONE_CACHE_SIZE,
+    ttl=settings.PHONE_CACHE_TTL,
+    negative_ttl=settings.PHONE_CACHE_NEGATIVE_TTL,
+)
+
+
+def _to_profile(user: Optional[User]) -> Optional[UserProfile]:
+    if user is None:
+        return None
+    return UserProfile(user.id, user.name, user.surname, user.phone_number, user.email, user.is_active)
+
+
+def _shared_profile(cached: Optional[dict]) -> Optional[UserProfile]:
+    return UserProfile(**cached) if cached else None
+
+
+def _invalidate_user_caches(session: Session, *phone_numbers: Optional[str]) -> None:
+    """Telefon önbelleğini ve arama index'ini session commit edildiğinde geçersiz kılmak için işaretle
+
+    İstek kapsamındaki session yalnızca flush eder; commit'ten önce silinen kaydı eş zamanlı
+    bir okuma eski haliyle TTL boyunca tekrar önbelleğe yazabilirdi. Rollback işareti atar.
+    """
+    session.info.setdefault("user_cache_phone_numbers", set()).update(phone for phone in phone_numbers if phone)
+
+
+def _evict_user_caches(session: OrmSession) -> None:
+    phone_numbers = session.info.pop("user_cache_phone_numbers", None)
+    if phone_numbers is not None:
+        phone_cache.invalidate(*phone_numbers)
+        user_search_index.invalidate()
+
+
+def _discard_user_cache_evictions(session: OrmSession) -> None:
+    session.info.pop("user_cache_phone_numbers", None)
+
+
+event.listen(OrmSession, "after_commit", _evict_user_caches)
+event.listen(OrmSession, "after_rollback", _discard_user_cache_evictions)
+
+
+def get_users(session: Optional[Session] = None) -> List[User]:
     """Tüm kullanıcıları getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         return session.exec(select(User)).all()
 
 
-def get_user_by_id(user_id: int) -> Optional[User]:
+def get_users_page(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, session: Optional[Session] = None, max_lag: Optional[float] = None) -> Page:
+    """Kullanıcıları id sırasıyla sayfalı getir"""
+    with read_session_scope(session, max_lag) as session:
+        return paginate(session, select(User), [User.id], limit, cursor)
+
+
+def get_user_by_id(user_id: int, session: Optional[Session] = None) -> Optional[User]:
     """ID'ye göre kullanıcı getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         return session.get(User, user_id)
 
 
-def get_user_by_phone(phone_number: str) -> Optional[User]:
+def get_user_by_phone(phone_number: str, session: Optional[Session] = None) -> Optional[User]:
     """Telefon numarasına göre kullanıcı getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         query = select(User).where(User.phone_number == phone_number)
         return session.exec(query).first()
 
-def create_user(user: User) -> User:
+
+async def get_user_by_id_async(session: AsyncSession, user_id: int) -> Optional[User]:
+    """ID'ye göre kullanıcı getir (async)"""
+    return await session.get(User, user_id)
+
+
+async def get_user_by_phone_async(session: AsyncSession, phone_number: str) -> Optional[User]:
+    """Telefon numarasına göre kullanıcı getir (async)"""
+    query = select(User).where(User.phone_number == phone_number)
+    result = await session.exec(query)
+    return result.first()
+
+
+def get_user_profile_by_phone(phone_number: str, session: Optional[Session] = None) -> Optional[UserProfile]:
+    """Telefon numarasını önbellek üzerinden kullanıcı id ve temel bilgilerine çözümle
+
+    Önce process içi önbelleğe, sonra worker'lar arası paylaşılan önbelleğe bakılır.
+    """
+    profile = phone_cache.get(phone_number)
+    if profile is MISSING:
+        profile = _shared_profile(get_cached(phone_key(phone_number)))
+        if profile is None:
+            profile = _to_profile(get_user_by_phone(phone_number, session=session))
+            if profile is not None:
+                set_cached(phone_key(phone_number), profile._asdict())
+        phone_cache.set(phone_number, profile)
+    return profile
+
+
+def get_user_profiles_by_phones(phone_numbers: Iterable[str], session: Optional[Session] = None) -> Dict[str, UserProfile]:
+    """Birden fazla telefon numarasını çözümle (telefon -> profil); bulunamayanlar sonuçta yer almaz
+
+    Process içi önbellekte olmayan numaralar tek bir phone_number IN (...) sorgusuyla okunur.
+    """
+    profiles: Dict[str, UserProfile] = {}
+    misses = []
+    for phone_number in set(phone_numbers):
+        profile = phone_cache.get(phone_number)
+        if profile is MISSING:
+            misses.append(phone_number)
+        elif profile is not None:
+            profiles[phone_number] = profile
+    if misses:
+        with session_scope(session) as session:
+            users = session.exec(select(User).where(User.phone_number.in_(misses))).all()
+        found = {user.phone_number: _to_profile(user) for user in users}
+        for phone_number in misses:
+            phone_cache.set(phone_number, found.get(phone_number))
+        profiles.update(found)
+    return profiles
+
+
+def remember_user_profile(user: User) -> UserProfile:
+    """Başka bir sorguyla zaten yüklenmiş kullanıcıyı telefon önbelleklerine yaz"""
+    profile = _to_profile(user)
+    phone_cache.set(user.phone_number, profile)
+    set_cached(phone_key(user.phone_number), profile._asdict())
+    return profile
+
+
+async def get_user_profile_by_phone_async(session: AsyncSession, phone_number: str) -> Optional[UserProfile]:
+    """Telefon numarasını önbellek üzerinden kullanıcı id ve temel bilgilerine çözümle (async)"""
+    profile = phone_cache.get(phone_number)
+    if profile is MISSING:
+        profile = _shared_profile(await get_cached_async(phone_key(phone_number)))
+        if profile is None:
+            profile = _to_profile(await get_user_by_phone_async(session, phone_number))
+            if profile is not None:
+                await set_cached_async(phone_key(phone_number), profile._asdict())
+        phone_cache.set(phone_number, profile)
+    return profile
+
+def create_user(user: User, session: Optional[Session] = None) -> User:
     """Yeni kullanıcı oluştur"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         session.add(user)
-        session.commit()
+        _invalidate_user_caches(session, user.phone_number)
+        commit_session(session)
         session.refresh(user)
         return user
 
 
-def update_user(user_id: int, user_data: dict) -> Optional[User]:
+def update_user(user_id: int, user_data: dict, session: Optional[Session] = None) -> Optional[User]:
     """Kullanıcı bilgilerini güncelle"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         user = session.get(User, user_id)
         if user:
+            old_phone_number = user.phone_number
             for key, value in user_data.items():
                 setattr(user, key, value)
             session.add(user)
-            session.commit()
+            _invalidate_user_caches(session, old_phone_number, user.phone_number)
+            commit_session(session)
             session.refresh(user)
             return user
         return None
 
 
-def delete_user(user_id: int) -> bool:
+def delete_user(user_id: int, session: Optional[Session] = None) -> bool:
     """Kullanıcı sil"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         user = session.get(User, user_id)
         if user:
+            phone_number = user.phone_number
             session.delete(user)
-            session.commit()
+            _invalidate_user_caches(session, phone_number)
+            commit_session(session)
             return True
         return False
 
 
-def get_users_by_package(package_id: int) -> List[User]:
+def get_users_by_package(package_id: int, session: Optional[Session] = None) -> List[User]:
     """Belirli bir pakete sahip kullanıcıları getir"""
-    with Session(engine) as session:
+    with session_scope(session) as session:
         query = select(User).where(User.package_id == package_id)
         return session.exec(query).all()
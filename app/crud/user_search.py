@@ -0,0 +1,196 @@
+import threading
+from typing import Dict, List, NamedTuple, Optional, Set
+from sqlalchemy import func, literal_column, or_
+from sqlmodel import Session, select
+from app.models.user import User
+from app.db.replica import read_session_scope
+
+SEARCH_RESULT_LIMIT = 10
+# total_found en fazla bu kadar eşleşmeye kadar sayılır (total_capped); sıralama tüm eşleşmeler üzerindendir
+SEARCH_CANDIDATE_CAP = 1000
+# Bundan kısa terimlerin iç trigram'ı yoktur; içerme yerine başlangıç (prefix) eşleşmesi aranır
+MIN_CONTAINS_TERM_LENGTH = 3
+
+# pg_trgm GIN index'i bu ifadenin birebir aynısı üzerine kurulu (bkz. migration 3)
+FULL_NAME = User.name + literal_column("' '") + User.surname
+
+
+class SearchHit(NamedTuple):
+    id: int
+    name: str
+    surname: str
+    phone_number: str
+    email: Optional[str]
+    is_active: bool
+    score: float
+
+
+class SearchResult(NamedTuple):
+    hits: List[SearchHit]
+    total_found: int
+    # Eşleşme sayısı SEARCH_CANDIDATE_CAP'i aştı; total_found alt sınırdır
+    total_capped: bool = False
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def trigrams(value: Optional[str]) -> Set[str]:
+    """pg_trgm ile aynı kuralla trigram kümesi çıkar (kelime başına iki, sonuna bir boşluk)"""
+    result = set()
+    for word in (value or "").lower().split():
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(left: Set[str], right: Set[str]) -> float:
+    """İki trigram kümesinin pg_trgm similarity() karşılığı"""
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def _search_postgres(session: Session, term: str, limit: int) -> SearchResult:
+    """pg_trgm GIN index'leri üzerinden ILIKE ile eşleşen, similarity ile SQL'de sıralanmış arama
+
+    Kısa terimler (MIN_CONTAINS_TERM_LENGTH altı) içerme yerine başlangıç eşleşmesiyle aranır;
+    '%ab%' deseninden trigram çıkmadığı için index tümüyle taranırdı, 'ab%' ise kelime başı
+    trigram'larıyla ("  a", " ab") aynı GIN index'lerinden okunur.
+    """
+    escaped = _escape_like(term)
+    pattern = f"{escaped}%" if len(term) < MIN_CONTAINS_TERM_LENGTH else f"%{escaped}%"
+    conditions = [
+        User.phone_number.ilike(pattern, escape="\\"),
+        FULL_NAME.ilike(pattern, escape="\\"),
+    ]
+    if "@" in term:
+        conditions.append(User.email.ilike(pattern, escape="\\"))
+    matched = or_(*conditions)
+    score = func.greatest(
+        func.similarity(User.phone_number, term),
+        func.similarity(FULL_NAME, term),
+        func.similarity(func.coalesce(User.email, ""), term),
+    )
+    # En iyi limit eşleşme tüm eşleşmeler arasından seçilir; sıralama ve LIMIT SQL'de
+    hits = session.exec(
+        select(User.id, User.name, User.surname, User.phone_number, User.email, User.is_active, score.label("score"))
+        .where(matched)
+        .order_by(score.desc(), User.id)
+        .limit(limit)
+    ).all()
+    # Sayım ayrı ve sınırlıdır: çok genel bir terim tüm tabloyu saydırmaz
+    matches = session.exec(
+        select(func.count()).select_from(select(User.id).where(matched).limit(SEARCH_CANDIDATE_CAP + 1).subquery())
+    ).one()
+    return SearchResult(
+        hits=[SearchHit(*row) for row in hits],
+        total_found=min(matches, SEARCH_CANDIDATE_CAP),
+        total_capped=matches > SEARCH_CANDIDATE_CAP,
+    )
+
+
+class _IndexedUser(NamedTuple):
+    hit: SearchHit
+    phone: str
+    full_name: str
+    email: str
+    grams: Dict[str, Set[str]]
+
+
+class TrigramIndex:
+    """pg_trgm olmayan ortamlar (SQLite testleri) için process içi trigram index'i
+
+    İlk aramada kullanıcı tablosundan yüklenir; kullanıcı yazma işlemleri invalidate()
+    çağırarak bir sonraki aramada yeniden yüklenmesini sağlar.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users: Dict[int, _IndexedUser] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._loaded = False
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded = False
+
+    def _load(self, session: Session) -> None:
+        users: Dict[int, _IndexedUser] = {}
+        postings: Dict[str, Set[int]] = {}
+        for user in session.exec(select(User)).all():
+            full_name = f"{user.name} {user.surname}"
+            grams = {
+                "phone": trigrams(user.phone_number),
+                "full_name": trigrams(full_name),
+                "email": trigrams(user.email),
+            }
+            users[user.id] = _IndexedUser(
+                hit=SearchHit(user.id, user.name, user.surname, user.phone_number, user.email, user.is_active, 0.0),
+                phone=user.phone_number.lower(),
+                full_name=full_name.lower(),
+                email=(user.email or "").lower(),
+                grams=grams,
+            )
+            for gram in set().union(*grams.values()):
+                postings.setdefault(gram, set()).add(user.id)
+        self._users, self._postings, self._loaded = users, postings, True
+
+    def search(self, session: Session, term: str, limit: int) -> SearchResult:
+        with self._lock:
+            if not self._loaded:
+                self._load(session)
+            users, postings = self._users, self._postings
+
+        needle = term.lower()
+        prefix_only = len(needle) < MIN_CONTAINS_TERM_LENGTH
+        if prefix_only:
+            # Kısa terim: Postgres yolu gibi başlangıç eşleşmesi; kelime başı trigram'ları aday süzer
+            required = {gram for gram in trigrams(needle) if not gram.endswith(" ")}
+        else:
+            # Terimin iç trigram'ları (boşluk dolgusu olmayanlar) her eşleşmede bulunmak zorunda
+            required = {needle[i:i + 3] for i in range(len(needle) - 2) if " " not in needle[i:i + 3]}
+        if required:
+            candidate_ids = set.intersection(*(postings.get(gram, set()) for gram in required))
+        else:
+            candidate_ids = set(users)
+
+        def matches_field(value: str) -> bool:
+            return value.startswith(needle) if prefix_only else needle in value
+
+        term_grams = trigrams(term)
+        search_email = "@" in term
+        matches = []
+        for user_id in candidate_ids:
+            entry = users[user_id]
+            if not (matches_field(entry.phone) or matches_field(entry.full_name)
+                    or (search_email and matches_field(entry.email))):
+                continue
+            score = max(similarity(grams, term_grams) for grams in entry.grams.values())
+            matches.append(entry.hit._replace(score=score))
+        matches.sort(key=lambda hit: (-hit.score, hit.id))
+        return SearchResult(
+            hits=matches[:limit],
+            total_found=min(len(matches), SEARCH_CANDIDATE_CAP),
+            total_capped=len(matches) > SEARCH_CANDIDATE_CAP,
+        )
+
+
+user_search_index = TrigramIndex()
+
+
+def search_users(term: str, limit: int = SEARCH_RESULT_LIMIT, session: Optional[Session] = None,
+                 max_lag: Optional[float] = None) -> SearchResult:
+    """Telefon, ad soyad veya email ile sıralı müşteri arama (en iyi limit sonuç)
+
+    Postgres'te pg_trgm index'leri kullanılır ve LIMIT SQL'de uygulanır; diğer
+    veritabanlarında process içi trigram index'ine düşülür.
+    """
+    term = term.strip()
+    if not term:
+        return SearchResult(hits=[], total_found=0)
+    with read_session_scope(session, max_lag) as session:
+        if session.get_bind().dialect.name == "postgresql":
+            return _search_postgres(session, term, limit)
+        return user_search_index.search(session, term, limit)
@@ -0,0 +1,23 @@
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.config import get_settings
+from app.db.pool import InstrumentedAsyncAdaptedQueuePool, pool_options
+
+settings = get_settings()
+async_engine = create_async_engine(
+    settings.async_database_url, poolclass=InstrumentedAsyncAdaptedQueuePool, **pool_options()
+)
+
+# Commit sonrası nesneler response serialize edilirken tekrar yüklenmesin diye expire_on_commit kapalı
+async_session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def get_async_session():
+    """Her istek için tek bir AsyncSession sağlar (FastAPI dependency)"""
+    async with async_session_factory() as session:
+        yield session
+
+
+async def dispose_async_engine():
+    """Uygulama kapanırken async bağlantı havuzunu kapat"""
+    await async_engine.dispose()
@@ -0,0 +1,143 @@
+"""Versiyonlamadan önceki (create_all ile kurulan) şemanın dondurulmuş kopyası
+
+Baseline migration'ı canlı modellerden değil bu tanımlardan tablo oluşturur; böylece modellere
+sonradan eklenen kolon ve index'ler boş veritabanında da kendi migration'larıyla gelir.
+Bu dosya değiştirilmez, şema değişiklikleri yeni migration olarak yazılır.
+"""
+from sqlalchemy import JSON, Boolean, Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table
+
+baseline_metadata = MetaData()
+
+Table(
+    "user",
+    baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("surname", String(100), nullable=False),
+    Column("phone_number", String(20), nullable=False, unique=True, index=True),
+    Column("email", String(100)),
+    Column("is_active", Boolean, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "package",
+    baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(200), nullable=False),
+    Column("type", String(50), nullable=False),
+    Column("details", JSON),
+    Column("commitment", String(50), nullable=False),
+    Column("monthly_fee", Float),
+    Column("is_active", Boolean, nullable=False),
+)
+
+Table(
+    "subscription",
+    baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False, index=True),
+    Column("package_id", Integer, ForeignKey("package.id"), nullable=False, index=True),
+    Column("start_date", DateTime, nullable=False),
+    Column("end_date", DateTime),
+    Column("contract_months", Integer),
+    Column("is_active", Boolean, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "invoice",
+    baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False, index=True),
+    Column("invoice_number", String(50), nullable=False, unique=True, index=True),
+    Column("billing_period_start", DateTime, nullable=False),
+    Column("billing_period_end", DateTime, nullable=False),
+    Column("total_amount", Float, nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("due_date", DateTime),
+    Column("created_at", DateTime, nullable=False),
+    Column("paid_at", DateTime),
+)
+
+Table(
+    "invoice_item",
+    baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("invoice_id", Integer, ForeignKey("invoice.id"), nullable=False, index=True),
+    Column("service_type", String(50), nullable=False),
+    Column("description", String(500), nullable=False),
+    Column("quantity", Integer, nullable=False),
+    Column("unit_price", Float, nullable=False),
+    Column("total_price", Float, nullable=False),
+    Column("tax_rate", Float),
+)
+
+Table(
+    "remaining_uses",
+    baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False, index=True),
+    Column("service_type", String(100), nullable=False),
+    Column("remaining_count", Integer, nullable=False),
+    Column("total_allocated", Integer, nullable=False),
+    Column("last_reset_date", DateTime),
+    Column("expires_at", DateTime),
+    Column("is_active", Boolean, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "agent_intent_log",
+    baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), index=True),
+    Column("intent", String(100), nullable=False),
+    Column("message", String(2000), nullable=False),
+    Column("confidence", Float),
+    Column("created_at", DateTime, nullable=False),
+)
+
+Table(
+    "package_change_request",
+    baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False, index=True),
+    Column("current_package_id", Integer, ForeignKey("package.id")),
+    Column("requested_package_id", Integer, ForeignKey("package.id"), nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("reason", String(500)),
+    Column("admin_notes", String(1000)),
+    Column("requested_at", DateTime, nullable=False),
+    Column("processed_at", DateTime),
+)
+
+Table(
+    "problem",
+    baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("location", String(200), nullable=False),
+    Column("problem", String(1000), nullable=False),
+    Column("estimated_completion_time", DateTime, nullable=False),
+    Column("status", String(50), nullable=False),
+    Column("priority", String(20), nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "service_purchase",
+    baseline_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("user.id"), nullable=False, index=True),
+    Column("service_type", String(50), nullable=False),
+    Column("count", Integer, nullable=False),
+    Column("unit_price", Float, nullable=False),
+    Column("purchase_price", Float, nullable=False),
+    Column("purchase_date", DateTime, nullable=False),
+    Column("expires_at", DateTime),
+    Column("is_used", Boolean, nullable=False),
+)
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import List, Optional
 
 class Settings(BaseSettings):
     POSTGRES_USER: str
@@ -8,17 +9,97 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str
     POSTGRES_DB: str
 
+    # Tam bağlantı adresi verilirse POSTGRES_* alanları yerine kullanılır (örn. testler için SQLite)
+    DATABASE_URL: Optional[str] = None
+    ASYNC_DATABASE_URL: Optional[str] = None
+
+    # Bağlantı havuzu ayarları
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # SQL sorgu logları logging pipeline'ına bu seviyede yazılır (INFO: sorgular, DEBUG: sonuç satırları)
+    SQL_LOG_LEVEL: str = "WARNING"
+    # Aynı sorgu şekli bir istekte bu sayıdan fazla çalışırsa N+1 uyarısı verilir;
+    # SQL_REPEAT_STRICT açıkken (test/CI) istek hata ile kesilir
+    SQL_REPEAT_THRESHOLD: int = 10
+    SQL_REPEAT_STRICT: bool = False
+
+    # Okuma replikaları: virgülle ayrılmış bağlantı adresleri (boşsa tüm okumalar primary'ye gider)
+    REPLICA_DATABASE_URLS: Optional[str] = None
+    # Varsayılan kabul edilebilir replika gecikmesi (saniye) ve gecikme kontrol aralığı
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_INTERVAL: float = 2.0
+
+    # Telefon numarası -> kullanıcı önbelleği (process içi): kapasite, süre ve bulunamayan numaralar için süre
+    PHONE_CACHE_SIZE: int = 100_000
+    PHONE_CACHE_TTL: float = 300.0
+    PHONE_CACHE_NEGATIVE_TTL: float = 10.0
+
+    # Worker'lar arası paylaşılan önbellek: "memory" (process içi) veya "redis"
+    CACHE_BACKEND: str = "memory"
+    CACHE_REDIS_URL: Optional[str] = None
+    CACHE_SOCKET_TIMEOUT: float = 0.1
+    CACHE_MEMORY_SIZE: int = 10_000
+    # Müşteri görünümlerinin (bilgi ekranı, özet, paket) önbellekte kalma süresi
+    CUSTOMER_CACHE_TTL: float = 60.0
+
+    # orjson kuruluysa cevaplar orjson ile, liste endpoint'leri model doğrulaması olmadan
+    # doğrudan kolon satırlarından serileştirilir
+    FAST_JSON: bool = True
+    # Bu boyutun (byte) üstündeki cevaplar istemci kabul ediyorsa gzip ile sıkıştırılır (0: kapalı)
+    GZIP_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESS_LEVEL: int = 6
+
+    # Agent intent logları: "sync" her kaydı hemen yazar, "write_behind" kuyruğa alıp toplu yazar
+    AGENT_LOG_INGEST_MODE: str = "sync"
+    AGENT_LOG_QUEUE_SIZE: int = 50_000
+    AGENT_LOG_BATCH_SIZE: int = 1000
+    AGENT_LOG_FLUSH_INTERVAL: float = 0.2
+    # Kuyruk doluysa kaydın bekleyebileceği süre; aşılırsa istek 503 ile reddedilir
+    AGENT_LOG_ENQUEUE_TIMEOUT: float = 1.0
+    # write_behind modunda da istek, kaydın batch'i commit edilene kadar bekler
+    AGENT_LOG_DURABLE: bool = False
+    # Dayanıklı modda commit için beklenecek en uzun süre; aşılırsa istek 503 ile reddedilir
+    AGENT_LOG_DURABLE_TIMEOUT: float = 5.0
+
+    # Fatura kesiminde paralel worker process sayısı (1: tek process, sıralı)
+    BILLING_WORKERS: int = 1
+    # Bu süre boyunca ilerleme yazmayan "running" çalışma ölü sayılır ve tekrar başlatılabilir
+    BILLING_RUN_STALE_SECONDS: int = 900
+    # Fatura numaraları veritabanından bu büyüklükte bloklar halinde ayrılıp process içinde dağıtılır
+    INVOICE_NUMBER_BLOCK_SIZE: int = 1000
+    INVOICE_NUMBER_PREFIX: str = "INV"
+
     @property
     def database_url(self):
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return (
             f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
             f"@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
+    @property
+    def async_database_url(self):
+        if self.ASYNC_DATABASE_URL:
+            return self.ASYNC_DATABASE_URL
+        return (
+            f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
+            f"@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+        )
+
+    @property
+    def replica_database_urls(self) -> List[str]:
+        if not self.REPLICA_DATABASE_URLS:
+            return []
+        return [url.strip() for url in self.REPLICA_DATABASE_URLS.split(",") if url.strip()]
+
     class Config:
         env_file = ".env"
 settings = Settings()
 
 @lru_cache()
 def get_settings():
-     return Settings()
\ No newline at end of file
+     return Settings()
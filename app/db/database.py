@@ -1,5 +1,10 @@
-from sqlmodel import create_engine, SQLModel
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from sqlmodel import create_engine, Session
 from app.db.config import get_settings
+from app.db.pool import InstrumentedQueuePool, pool_options
+from app.db.migrations import run_migrations
+from app.db import instrumentation  # noqa: F401  SQL sayaç event hook'larını kaydeder
 
 from app.models.user import User
 from app.models.package import Package
@@ -11,9 +16,48 @@ from app.models.agentintentlog import AgentIntentLog
 from app.models.packagechangerequest import PackageChangeRequest
 from app.models.problems import Problem
 from app.models.servicepurchase import ServicePurchase
+from app.models.customersummary import CustomerSummary
+from app.models.billingrun import BillingRun, BillingRunPartition
+from app.models.invoicenumbercounter import InvoiceNumberCounter
 
 settings = get_settings()
-engine = create_engine(settings.database_url, echo=True)
+# SQL logları echo yerine 'sqlalchemy.engine' logger'ı üzerinden logging pipeline'ına gider (SQL_LOG_LEVEL)
+engine = create_engine(settings.database_url, poolclass=InstrumentedQueuePool, **pool_options())
 
 def init_db():
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    """Şemayı versiyonlu migration'lar ile güncel hale getir"""
+    run_migrations(engine)
+
+
+def get_session() -> Iterator[Session]:
+    """Her istek için tek bir Session ve tek bir transaction sağlar (FastAPI dependency)
+
+    İstek başarıyla biterse commit, hata olursa rollback yapılır. Bu session'ı alan
+    CRUD fonksiyonları commit yerine sadece flush yapar.
+    """
+    with Session(engine) as session:
+        session.info["unit_of_work"] = True
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+
+@contextmanager
+def session_scope(session: Optional[Session] = None) -> Iterator[Session]:
+    """Verilen session'ı kullan, verilmemişse yeni bir session açıp kapat"""
+    if session is not None:
+        yield session
+    else:
+        with Session(engine) as new_session:
+            yield new_session
+
+
+def commit_session(session: Session) -> None:
+    """İstek kapsamındaki session'da flush, kendi açılan session'da commit yap"""
+    if session.info.get("unit_of_work"):
+        session.flush()
+    else:
+        session.commit()
@@ -0,0 +1,131 @@
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.db.config import get_settings
+from app.utils.logging_config import get_logger
+
+logger = get_logger('app.db.instrumentation')
+settings = get_settings()
+
+# IN (?, ?, ?) gibi genişletilmiş parametre listelerini tek bir şekle indirger
+_PARAM_LIST_RE = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+|:\w+))+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class RepeatedQueryError(RuntimeError):
+    """SQL_REPEAT_STRICT açıkken aynı sorgu şekli bir istekte eşik değerinden fazla çalıştırıldığında fırlatılır"""
+
+
+def statement_shape(statement: str) -> str:
+    """Parametre değerlerinden bağımsız sorgu şekli"""
+    shape = _PARAM_LIST_RE.sub("(?)", statement)
+    return _WHITESPACE_RE.sub(" ", shape).strip()
+
+
+class QueryStats:
+    """Bir istek boyunca çalışan sorguların sayısı, toplam süresi ve şekil dağılımı"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, elapsed: float) -> int:
+        self.count += 1
+        self.total_time += elapsed
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+        return self.shapes[shape]
+
+    def repeated_shapes(self, threshold: int) -> Dict[str, int]:
+        return {shape: count for shape, count in self.shapes.items() if count > threshold}
+
+
+class QueryMetrics:
+    """Uygulama genelinde toplanan istek ve sorgu sayaçları"""
+
+    def __init__(self, max_offenders: int = 50):
+        self._lock = threading.Lock()
+        self._max_offenders = max_offenders
+        self.requests = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.repeated_query_warnings = 0
+        self.offenders: Counter = Counter()
+
+    def record_request(self, path: str, stats: QueryStats, repeated: Dict[str, int]) -> None:
+        with self._lock:
+            self.requests += 1
+            self.queries += stats.count
+            self.db_time += stats.total_time
+            if repeated:
+                self.repeated_query_warnings += 1
+                self.offenders[path] += 1
+                # Sayaç sınırsız büyümesin; en az görülenleri at
+                if len(self.offenders) > self._max_offenders:
+                    self.offenders = Counter(dict(self.offenders.most_common(self._max_offenders)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "queries": self.queries,
+                "avg_queries_per_request": round(self.queries / self.requests, 2) if self.requests else 0,
+                "db_time_ms": round(self.db_time * 1000, 3),
+                "repeated_query_warnings": self.repeated_query_warnings,
+                "top_offenders": [
+                    {"path": path, "count": count} for path, count in self.offenders.most_common(10)
+                ],
+            }
+
+
+query_metrics = QueryMetrics()
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def start_request_stats() -> QueryStats:
+    """Mevcut istek için yeni bir sayaç başlat"""
+    stats = QueryStats()
+    _current_stats.set(stats)
+    return stats
+
+
+def get_request_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.setdefault("query_start_time", [])
+    starts.append(time.perf_counter())
+    if context is not None:
+        # Hata durumunda yalnızca bu sorgunun başlattığı süre ölçümü geri alınsın
+        context._query_timer_depth = len(starts)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # Hata veren sorgu after_cursor_execute'a ulaşmaz; başlangıç zamanı havuzdaki bağlantıda kalmasın
+    connection = exception_context.connection
+    depth = getattr(exception_context.execution_context, "_query_timer_depth", None)
+    if connection is not None and depth:
+        del connection.info.get("query_start_time", [])[depth - 1:]
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    repeats = stats.record(statement, elapsed)
+    if settings.SQL_REPEAT_STRICT and repeats > settings.SQL_REPEAT_THRESHOLD:
+        raise RepeatedQueryError(
+            f"Statement executed {repeats} times in one request (threshold {settings.SQL_REPEAT_THRESHOLD}): "
+            f"{statement_shape(statement)[:200]}"
+        )
@@ -0,0 +1,235 @@
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine, Row
+from sqlmodel import SQLModel
+from app.db.baseline_schema import baseline_metadata
+from app.utils.logging_config import get_logger
+
+logger = get_logger('app.db.migrations')
+
+# Aynı anda açılan birden fazla worker'ın migration'ları paralel çalıştırmasını engeller
+MIGRATION_LOCK_KEY = 7346119
+# Kullanıcı başına dönem faturası tekilliği; toplu fatura kesiminin ON CONFLICT hedefi
+INVOICE_PERIOD_INDEX = "uq_invoice_user_id_billing_period"
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+def _find_index(name: str):
+    """Model metadata'sında adı verilen index'i bul"""
+    for table in SQLModel.metadata.tables.values():
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise KeyError(f"Index not declared on any model: {name}")
+
+
+def create_indexes(connection: Connection, *names: str) -> None:
+    """Modellerde tanımlı index'leri (yoksa) oluştur"""
+    for name in names:
+        _find_index(name).create(connection, checkfirst=True)
+
+
+def drop_indexes(connection: Connection, *names: str) -> None:
+    """Artık kullanılmayan index'leri (varsa) kaldır"""
+    for name in names:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def _baseline(connection: Connection) -> None:
+    # Canlı modeller değil, versiyonlamadan önceki şemanın dondurulmuş kopyası; sonraki
+    # index ve tablolar boş veritabanında da kendi migration'larıyla oluşur
+    baseline_metadata.create_all(connection, checkfirst=True)
+
+
+def _hot_query_indexes(connection: Connection) -> None:
+    create_indexes(
+        connection,
+        "ix_subscription_user_id_is_active",
+        "ix_invoice_user_id_created_at",
+        "ix_service_purchase_user_id_purchase_date_is_used",
+        "ix_service_purchase_unbilled",
+        "ix_agent_intent_log_user_id_created_at",
+        "ix_problem_status_priority",
+        "ix_remaining_uses_user_id_service_type",
+    )
+    # Tek kolonlu user_id index'leri artık bileşik index'lerin ön eki, yazma maliyetinden kurtulalım
+    drop_indexes(
+        connection,
+        "ix_subscription_user_id",
+        "ix_invoice_user_id",
+        "ix_service_purchase_user_id",
+        "ix_agent_intent_log_user_id",
+        "ix_remaining_uses_user_id",
+    )
+
+
+def _user_search_trigram_indexes(connection: Connection) -> None:
+    # pg_trgm yalnızca Postgres'te var; diğer veritabanlarında arama process içi index'e düşer
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_user_phone_number_trgm ON "user" USING gin (phone_number gin_trgm_ops)'
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_user_full_name_trgm ON \"user\" USING gin ((name || ' ' || surname) gin_trgm_ops)"
+    ))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_user_email_trgm ON "user" USING gin (email gin_trgm_ops)'
+    ))
+
+
+def _customer_summary(connection: Connection) -> None:
+    # Hook'ları kaydeden crud paketi veritabanı modülüne bağlı, döngüsel import olmasın
+    from app.crud.customer_summary_crud import refresh_all_customer_summaries
+
+    SQLModel.metadata.tables["customer_summary"].create(connection, checkfirst=True)
+    refreshed = refresh_all_customer_summaries(connection)
+    logger.info(f"Backfilled {refreshed} customer summaries")
+
+
+def _billing_run(connection: Connection) -> None:
+    SQLModel.metadata.tables["billing_run"].create(connection, checkfirst=True)
+
+
+def find_duplicate_invoice_periods(connection: Connection) -> List[Row]:
+    """Aynı dönem için birden fazla faturası olan (user_id, billing_period_start, billing_period_end, invoice_count) grupları"""
+    invoice = SQLModel.metadata.tables["invoice"]
+    period = (invoice.c.user_id, invoice.c.billing_period_start, invoice.c.billing_period_end)
+    return connection.execute(
+        select(*period, func.count().label("invoice_count"))
+        .group_by(*period)
+        .having(func.count() > 1)
+        .order_by(*period)
+    ).all()
+
+
+def ensure_invoice_period_index(connection: Connection) -> bool:
+    """Dönem tekilliği index'ini mükerrer fatura yoksa oluştur; index'in var olup olmadığını döner
+
+    Mükerrer faturalar varken index atlanır ve uyarı loglanır, açılış durdurulmaz. Kayıtlar
+    temizlendikten sonra her açılışta ve her fatura kesiminden önce tekrar denenir
+    (mükerrerler: python -m app.jobs.invoice_period_duplicates).
+    """
+    if any(index["name"] == INVOICE_PERIOD_INDEX for index in inspect(connection).get_indexes("invoice")):
+        return True
+    duplicates = find_duplicate_invoice_periods(connection)
+    if duplicates:
+        logger.warning(f"{len(duplicates)} users have more than one invoice for the same billing period; "
+                       f"{INVOICE_PERIOD_INDEX} is not created and bulk billing is disabled until they are resolved "
+                       "(list them with: python -m app.jobs.invoice_period_duplicates)")
+        return False
+    create_indexes(connection, INVOICE_PERIOD_INDEX)
+    return True
+
+
+def _billing_partitions(connection: Connection) -> None:
+    SQLModel.metadata.tables["billing_run_partition"].create(connection, checkfirst=True)
+    ensure_invoice_period_index(connection)
+
+
+def _invoice_number_allocator(connection: Connection) -> None:
+    from app.crud.invoice_number import INVOICE_NUMBER_COUNTER, INVOICE_NUMBER_SEQUENCE
+
+    # Eski fatura kesimi numaraları kullanıcı id'sinden türetiliyordu (INV-YYYYMM-<user_id>);
+    # yeni numaralar en büyük kullanıcı id'sinden sonra başlar ki çakışmasın
+    start = connection.execute(text('SELECT COALESCE(MAX(id), 0) + 1 FROM "user"')).scalar()
+    if connection.dialect.name == "postgresql":
+        connection.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {INVOICE_NUMBER_SEQUENCE} START WITH {start}"))
+        return
+    counter = SQLModel.metadata.tables["invoice_number_counter"]
+    counter.create(connection, checkfirst=True)
+    connection.execute(counter.insert().values(name=INVOICE_NUMBER_COUNTER, next_value=start))
+
+
+def _invoice_unpaid_index(connection: Connection) -> None:
+    create_indexes(connection, "ix_invoice_unpaid")
+
+
+def _keyset_pagination_indexes(connection: Connection) -> None:
+    # Liste endpoint'leri (zaman, id) azalan sırayla sayfalanır; index olmadan her sayfa tabloyu sıralar
+    create_indexes(
+        connection,
+        "ix_invoice_created_at_id",
+        "ix_agent_intent_log_created_at_id",
+        "ix_service_purchase_purchase_date_id",
+        "ix_problem_created_at_id",
+        "ix_package_change_request_requested_at_id",
+    )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", _baseline),
+    Migration(2, "hot_query_indexes", _hot_query_indexes),
+    Migration(3, "user_search_trigram_indexes", _user_search_trigram_indexes),
+    Migration(4, "customer_summary", _customer_summary),
+    Migration(5, "billing_run", _billing_run),
+    Migration(6, "billing_partitions", _billing_partitions),
+    Migration(7, "invoice_number_allocator", _invoice_number_allocator),
+    Migration(8, "invoice_unpaid_index", _invoice_unpaid_index),
+    Migration(9, "keyset_pagination_indexes", _keyset_pagination_indexes),
+]
+
+
+def _acquire_lock(connection: Connection) -> None:
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        connection.commit()
+
+
+def _release_lock(connection: Connection) -> None:
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        connection.commit()
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Uygulanmamış migration'ları sırayla, her biri kendi transaction'ında çalıştır
+
+    Uygulanan versiyonlar schema_migrations tablosuna yazılır; uygulanan versiyonların
+    listesi döner.
+    """
+    applied_now = []
+    with engine.connect() as connection:
+        _acquire_lock(connection)
+        try:
+            with connection.begin():
+                schema_migrations.create(connection, checkfirst=True)
+                applied = set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+            for migration in MIGRATIONS:
+                if migration.version in applied:
+                    continue
+                logger.info(f"Applying migration {migration.version}: {migration.name}")
+                with connection.begin():
+                    migration.upgrade(connection)
+                    connection.execute(schema_migrations.insert().values(
+                        version=migration.version,
+                        name=migration.name,
+                        applied_at=datetime.utcnow(),
+                    ))
+                applied_now.append(migration.version)
+
+            if 6 in applied:
+                # Migration 6'da mükerrer faturalar yüzünden atlanan index, kayıtlar temizlendiyse şimdi oluşur
+                with connection.begin():
+                    ensure_invoice_period_index(connection)
+        finally:
+            _release_lock(connection)
+    return applied_now
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from app.db.config import get_settings
+
+settings = get_settings()
+
+
+class PoolMetrics:
+    """Bağlantı havuzu checkout sayaçları ve son checkout sürelerinin penceresi"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+
+    def record_checkout(self, latency: float, waited: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+            self._latencies.append(latency)
+
+    def record_timeout(self, waited: bool) -> None:
+        with self._lock:
+            self.timeouts += 1
+            if waited:
+                self.waits += 1
+
+    def latency_percentiles(self) -> Dict[str, Optional[float]]:
+        """Son checkout sürelerinin yüzdeliklerini milisaniye cinsinden döndür"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+
+        def percentile(p: float) -> float:
+            index = min(len(samples) - 1, int(round(p * (len(samples) - 1))))
+            return round(samples[index] * 1000, 3)
+
+        return {
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1] * 1000, 3),
+        }
+
+
+class _InstrumentedPoolMixin:
+    """QueuePool checkout'unu ölçen mixin; havuz dolu olduğu için beklenen checkout'lar 'wait' sayılır"""
+
+    metrics: PoolMetrics
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        waited = (
+            self._max_overflow > -1
+            and self._overflow >= self._max_overflow
+            and self.checkedin() == 0
+        )
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout(waited)
+            raise
+        self.metrics.record_checkout(time.perf_counter() - start, waited)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() havuzu yeniden oluşturur; sayaçlar kaybolmasın
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options() -> Dict[str, Any]:
+    """Settings'teki havuz ayarlarını create_engine argümanlarına çevir"""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def pool_status(pool) -> Dict[str, Any]:
+    """Havuzun anlık durumu ve checkout metrikleri"""
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+        })
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        status.update({
+            "checkouts": metrics.checkouts,
+            "waits": metrics.waits,
+            "timeouts": metrics.timeouts,
+            "checkout_latency": metrics.latency_percentiles(),
+        })
+    return status
@@ -0,0 +1,93 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlmodel import create_engine, Session
+from app.db.config import get_settings
+from app.db.database import engine
+from app.db.pool import InstrumentedQueuePool, pool_options
+from app.utils.logging_config import get_logger
+
+logger = get_logger('app.db.replica')
+
+settings = get_settings()
+replica_engines: List[Engine] = [
+    create_engine(url, poolclass=InstrumentedQueuePool, **pool_options())
+    for url in settings.replica_database_urls
+]
+
+_replica_cycle = itertools.cycle(replica_engines) if replica_engines else None
+# engine -> (kontrol zamanı, gecikme saniyesi; erişilemiyorsa None)
+_lag_cache: Dict[Engine, Tuple[float, Optional[float]]] = {}
+# Sync endpoint'ler threadpool'da çalışır; önbellek ve replika sırası paylaşılır
+_lag_lock = threading.Lock()
+
+# Replika WAL'ı tamamen uygulamışsa gecikme 0 kabul edilir; aksi halde son uygulanan
+# transaction'dan bu yana geçen süre kullanılır
+_POSTGRES_LAG_QUERY = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "END"
+)
+
+
+def _measure_lag(replica: Engine) -> Optional[float]:
+    """Replikanın primary'ye göre gecikmesini saniye cinsinden ölç"""
+    if replica.dialect.name != "postgresql":
+        # SQLite gibi test yedekleri replikasyon yapmaz, her zaman güncel kabul edilir
+        return 0.0
+    try:
+        with replica.connect() as connection:
+            return float(connection.execute(_POSTGRES_LAG_QUERY).scalar() or 0)
+    except Exception as e:
+        logger.warning(f"Replica lag check failed for {replica.url.host}: {str(e)}")
+        return None
+
+
+def get_replica_lag(replica: Engine) -> Optional[float]:
+    """Replika gecikmesini REPLICA_LAG_CHECK_INTERVAL süresince önbellekten döndür"""
+    now = time.monotonic()
+    with _lag_lock:
+        cached = _lag_cache.get(replica)
+    if cached and now - cached[0] < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return cached[1]
+    # Ölçüm kilit dışında yapılır; yavaş bir replika diğer okumaları bekletmez
+    lag = _measure_lag(replica)
+    with _lag_lock:
+        _lag_cache[replica] = (now, lag)
+    return lag
+
+
+def get_read_engine(max_lag: Optional[float] = None) -> Engine:
+    """Gecikmesi tolerans içinde olan bir replika seç, yoksa primary engine'i döndür"""
+    if not replica_engines:
+        return engine
+    tolerance = settings.REPLICA_MAX_LAG_SECONDS if max_lag is None else max_lag
+    for _ in range(len(replica_engines)):
+        with _lag_lock:
+            replica = next(_replica_cycle)
+        lag = get_replica_lag(replica)
+        if lag is not None and lag <= tolerance:
+            return replica
+    logger.info(f"No replica within {tolerance}s lag, reading from primary")
+    return engine
+
+
+@contextmanager
+def read_session_scope(session: Optional[Session] = None, max_lag: Optional[float] = None) -> Iterator[Session]:
+    """Salt okunur sorgular için session sağla
+
+    Çağıran bir session verdiyse (ör. istek kapsamındaki primary session) kendi
+    yazdıklarını görebilmesi için o kullanılır; aksi halde replikaya yönlendirilir.
+    max_lag=0 verilerek okuma primary'ye ya da tamamen güncel bir replikaya zorlanabilir.
+    """
+    if session is not None:
+        yield session
+    else:
+        with Session(get_read_engine(max_lag)) as new_session:
+            yield new_session
@@ -0,0 +1,56 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
+from sqlalchemy.types import JSON
+
+
+class json_object(GenericFunction):
+    """Anahtar/değer çiftlerinden JSON nesnesi (Postgres: json_build_object, SQLite: json_object)"""
+    type = JSON()
+    inherit_cache = True
+
+
+class json_array_agg(GenericFunction):
+    """Satırları JSON dizisine toplayan aggregate (Postgres: json_agg, SQLite: json_group_array)"""
+    type = JSON()
+    inherit_cache = True
+
+
+class json_value(GenericFunction):
+    """JSON kolonunu metin olarak değil, iç içe JSON olarak gömmek için (SQLite: json())"""
+    type = JSON()
+    inherit_cache = True
+
+
+@compiles(json_object, "postgresql")
+def _json_object_postgresql(element, compiler, **kw):
+    return f"json_build_object({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_array_agg, "postgresql")
+def _json_array_agg_postgresql(element, compiler, **kw):
+    return f"json_agg({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_array_agg, "sqlite")
+def _json_array_agg_sqlite(element, compiler, **kw):
+    return f"json_group_array({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_value, "postgresql")
+def _json_value_postgresql(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+
+@compiles(json_value, "sqlite")
+def _json_value_sqlite(element, compiler, **kw):
+    return f"json({compiler.process(element.clauses, **kw)})"
+
+
+def dialect_insert(dialect_name: str, table):
+    """ON CONFLICT (upsert / do nothing) destekleyen, veritabanına özgü INSERT ifadesi"""
+    if dialect_name == "postgresql":
+        return postgresql.insert(table)
+    if dialect_name == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"ON CONFLICT is not supported for dialect: {dialect_name}")
@@ -0,0 +1,45 @@
+"""Aynı dönem için birden fazla faturası olan kullanıcıları listele: python -m app.jobs.invoice_period_duplicates
+
+Bu kayıtlar varken uq_invoice_user_id_billing_period oluşturulamaz ve toplu fatura kesimi
+başlatılmaz. Fazla faturalar (ör. DELETE /api/v1/invoices/{id} ile) temizlendikten sonra
+--create-index index'i hemen oluşturur; aksi halde bir sonraki açılışta ya da kesimde oluşur.
+"""
+import argparse
+import sys
+from sqlmodel import SQLModel, select
+from app.db.database import engine
+from app.db.migrations import INVOICE_PERIOD_INDEX, ensure_invoice_period_index, find_duplicate_invoice_periods
+from app.utils.logging_config import setup_logging
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mükerrer dönem faturalarını listele")
+    parser.add_argument("--create-index", action="store_true", help=f"Mükerrer yoksa {INVOICE_PERIOD_INDEX} index'ini oluştur")
+    args = parser.parse_args()
+
+    setup_logging()
+    invoice = SQLModel.metadata.tables["invoice"]
+    with engine.begin() as connection:
+        duplicates = find_duplicate_invoice_periods(connection)
+        for user_id, period_start, period_end, invoice_count in duplicates:
+            print(f"user {user_id} {period_start:%Y-%m-%d} - {period_end:%Y-%m-%d}: {invoice_count} invoices")
+            rows = connection.execute(
+                select(invoice.c.id, invoice.c.invoice_number, invoice.c.status, invoice.c.total_amount, invoice.c.created_at)
+                .where(
+                    invoice.c.user_id == user_id,
+                    invoice.c.billing_period_start == period_start,
+                    invoice.c.billing_period_end == period_end,
+                )
+                .order_by(invoice.c.id)
+            )
+            for invoice_id, number, status, total, created_at in rows:
+                print(f"  id={invoice_id} number={number} status={status} total={total} created_at={created_at}")
+        print(f"{len(duplicates)} users with duplicate invoices")
+        if args.create_index:
+            if not ensure_invoice_period_index(connection):
+                sys.exit(f"{INVOICE_PERIOD_INDEX} not created, resolve the duplicates first")
+            print(f"{INVOICE_PERIOD_INDEX} is in place")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Aylık fatura kesim işi (ör. gece cron'u): python -m app.jobs.monthly_billing --year 2025 --month 7 --workers 4"""
+import argparse
+import subprocess
+import sys
+import threading
+from datetime import datetime
+from app.crud.billing_crud import (
+    BILLING_CHUNK_SIZE,
+    BillingRunActiveError,
+    InvoicePeriodIndexMissingError,
+    month_period,
+    run_billing,
+)
+from app.utils.logging_config import get_logger, setup_logging
+
+logger = get_logger('app.jobs.monthly_billing')
+
+
+def launch(year: int, month: int) -> subprocess.Popen:
+    """İşi web process'inden bağımsız bir Python process'inde başlat (çalışma önceden sahiplenilmiş olmalı)
+
+    Yeni oturumda başlatıldığı için API worker'ı yeniden başlasa da iş devam eder; çalışma
+    dizini ve ortam değişkenleri API'den devralınır. Biten process'i arka plandaki bir
+    thread bekler; aksi halde API process'i yaşadıkça zombi olarak kalır.
+    """
+    command = [sys.executable, "-m", "app.jobs.monthly_billing", "--year", str(year), "--month", str(month), "--claimed"]
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, start_new_session=True)
+    threading.Thread(target=_reap, args=(process, year, month), name=f"billing-reaper-{process.pid}", daemon=True).start()
+    return process
+
+
+def _reap(process: subprocess.Popen, year: int, month: int) -> None:
+    """Başlatılan işin bitmesini bekle ve çıkış kodunu logla"""
+    returncode = process.wait()
+    if returncode == 0:
+        logger.info(f"Billing job {year}-{month:02d} (pid {process.pid}) finished")
+    else:
+        logger.warning(f"Billing job {year}-{month:02d} (pid {process.pid}) exited with code {returncode}")
+
+
+def main() -> None:
+    # Varsayılan dönem: bir önceki ay
+    today = datetime.utcnow()
+    default_year, default_month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+
+    parser = argparse.ArgumentParser(description="Tüm aktif aboneler için dönem faturalarını kes")
+    parser.add_argument("--year", type=int, default=default_year)
+    parser.add_argument("--month", type=int, default=default_month)
+    parser.add_argument("--chunk-size", type=int, default=BILLING_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="Paralel worker process sayısı (varsayılan BILLING_WORKERS)")
+    parser.add_argument("--claimed", action="store_true", help="Çalışma API tarafından sahiplenildi (launch ile başlatılan iş)")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        run = run_billing(*month_period(args.year, args.month), chunk_size=args.chunk_size,
+                          workers=args.workers, claimed=args.claimed)
+    except (BillingRunActiveError, InvoicePeriodIndexMissingError) as e:
+        sys.exit(str(e))
+    print(f"Billing run {run.id} {run.status}: {run.invoices_created} invoices, "
+          f"{run.items_created} items, {run.users_processed} users processed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+from fastapi import Request
+from app.db.config import get_settings
+from app.db.instrumentation import start_request_stats, query_metrics
+from app.utils.logging_config import get_logger
+
+logger = get_logger('app.middleware.query_stats')
+settings = get_settings()
+
+async def query_stats_middleware(request: Request, call_next):
+    """İstek başına sorgu sayısını ve DB süresini ölçer, N+1 şüphesi olan istekleri loglar"""
+    stats = start_request_stats()
+    response = await call_next(request)
+
+    repeated = stats.repeated_shapes(settings.SQL_REPEAT_THRESHOLD)
+    query_metrics.record_request(request.url.path, stats, repeated)
+
+    response.headers["X-DB-Query-Count"] = str(stats.count)
+    response.headers["X-DB-Time"] = f"{stats.total_time:.6f}"
+
+    for shape, count in repeated.items():
+        logger.warning(
+            f"Possible N+1: statement repeated {count} times in "
+            f"{request.method} {request.url.path} - {shape[:200]}"
+        )
+    return response
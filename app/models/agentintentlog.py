@@ -1,3 +1,4 @@
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime
@@ -7,13 +8,28 @@ if TYPE_CHECKING:
 
 class AgentIntentLog(SQLModel, table=True):
     __tablename__ = "agent_intent_log"
+    __table_args__ = (
+        Index("ix_agent_intent_log_user_id_created_at", "user_id", text("created_at DESC")),
+        # Log listesinin keyset sayfalaması (created_at, id)
+        Index("ix_agent_intent_log_created_at_id", "created_at", "id"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
+    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
     intent: str = Field(max_length=100)  # örn: "ek_hizmet_talebi", "paket_degistirme"
     message: str = Field(max_length=2000)
     confidence: Optional[float] = Field(default=None, ge=0, le=1)  # AI confidence score
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     # İlişkiler
-    user: Optional["User"] = Relationship()
\ No newline at end of file
+    user: Optional["User"] = Relationship()
+
+
+# Toplu loglama isteğindeki tek etkileşim: müşteri user_id ya da telefon numarasıyla verilir
+class InteractionLogItem(SQLModel):
+    user_id: Optional[int] = None
+    phone_number: Optional[str] = Field(default=None, max_length=20)
+    intent: str = Field(max_length=100)
+    message: str = Field(max_length=2000)
+    confidence: Optional[float] = Field(default=None, ge=0, le=1)
+    created_at: Optional[datetime] = None
@@ -0,0 +1,44 @@
+from sqlalchemy import UniqueConstraint
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+
+# Aylık fatura kesim çalışması; her dönem için tek satır, kaldığı yerden devam etmek için checkpoint tutar
+class BillingRun(SQLModel, table=True):
+    __tablename__ = "billing_run"
+    __table_args__ = (
+        UniqueConstraint("period_start", "period_end", name="uq_billing_run_period"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    period_start: datetime
+    period_end: datetime
+    status: str = Field(default="running", max_length=20)  # running, completed, failed
+    # İşlenen son kullanıcı; kullanıcılar user_id sırasıyla işlenir
+    last_user_id: int = Field(default=0)
+    users_processed: int = Field(default=0)
+    invoices_created: int = Field(default=0)
+    items_created: int = Field(default=0)
+    error: Optional[str] = Field(default=None, max_length=2000)
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+
+
+# Paralel çalışmada bir worker'ın işlediği user_id aralığı; kendi checkpoint'i ve deneme sayısı vardır
+class BillingRunPartition(SQLModel, table=True):
+    __tablename__ = "billing_run_partition"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: int = Field(foreign_key="billing_run.id", index=True)
+    # Aralık sınırları (ikisi de dahil)
+    user_id_from: int
+    user_id_to: int
+    status: str = Field(default="pending", max_length=20)  # pending, running, completed, failed
+    last_user_id: int = Field(default=0)
+    attempts: int = Field(default=0)
+    users_processed: int = Field(default=0)
+    invoices_created: int = Field(default=0)
+    items_created: int = Field(default=0)
+    error: Optional[str] = Field(default=None, max_length=2000)
+    updated_at: Optional[datetime] = Field(default=None)
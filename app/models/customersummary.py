@@ -0,0 +1,36 @@
+from sqlmodel import Column, SQLModel, Field, JSON
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+# Müşteri başına önceden hesaplanmış özet: yazma yollarında güncellenir, user_id ile okunur
+class CustomerSummary(SQLModel, table=True):
+    __tablename__ = "customer_summary"
+
+    # user tablosuna FK yok: kullanıcı silinirken özet satırı aynı transaction'da temizlenir
+    user_id: int = Field(primary_key=True)
+    name: str = Field(max_length=100)
+    surname: str = Field(max_length=100)
+    phone_number: str = Field(max_length=20)
+    email: Optional[str] = Field(default=None, max_length=100)
+    is_active: bool = Field(default=True)
+    user_created_at: datetime
+
+    # Aktif abonelik (paketiyle birlikte) ve hızlı filtreler için paket bilgisi
+    subscription: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    active_package_id: Optional[int] = Field(default=None)
+    active_package_name: Optional[str] = Field(default=None, max_length=200)
+
+    invoice_count: int = Field(default=0)
+    unpaid_invoice_count: int = Field(default=0)
+    unpaid_total: float = Field(default=0)
+    recent_invoices: Optional[List[Dict[str, Any]]] = Field(default=None, sa_column=Column(JSON))
+
+    remaining_uses_total: int = Field(default=0)
+    remaining_uses: Optional[List[Dict[str, Any]]] = Field(default=None, sa_column=Column(JSON))
+
+    open_change_requests: Optional[List[Dict[str, Any]]] = Field(default=None, sa_column=Column(JSON))
+
+    last_interaction_at: Optional[datetime] = Field(default=None)
+    recent_interactions: Optional[List[Dict[str, Any]]] = Field(default=None, sa_column=Column(JSON))
+
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,3 +1,4 @@
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field, Relationship
 from typing import List, Optional, TYPE_CHECKING
 from datetime import datetime
@@ -6,12 +7,33 @@ if TYPE_CHECKING:
     from app.models.invoiceitem import InvoiceItem
     from app.models.user import User
 
+# Ödenmemiş sayılan fatura durumları (gecikmiş faturalar da tahsil edilmedi)
+UNPAID_INVOICE_STATUSES = ("pending", "overdue")
+
 class Invoice(SQLModel, table=True):
     __tablename__ = "invoice"
+    __table_args__ = (
+        # Kullanıcının en yeni faturaları önce okunur
+        Index("ix_invoice_user_id_created_at", "user_id", text("created_at DESC")),
+        # Fatura listesi (created_at, id) üzerinden keyset ile sayfalanır; index geriye doğru taranır
+        Index("ix_invoice_created_at_id", "created_at", "id"),
+        # Bir kullanıcıya aynı dönem için ikinci fatura kesilemez (paralel fatura kesimi bunu kullanır)
+        Index("uq_invoice_user_id_billing_period", "user_id", "billing_period_start", "billing_period_end", unique=True),
+        # Yalnızca ödenmemiş faturalar; yaşlandırma raporu tabloya gitmeden bu index'ten okunur
+        Index(
+            "ix_invoice_unpaid",
+            "user_id",
+            "due_date",
+            postgresql_include=["created_at", "total_amount"],
+            postgresql_where=text("status IN ('pending', 'overdue')"),
+            sqlite_where=text("status IN ('pending', 'overdue')"),
+        ),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.id", index=True)
-    invoice_number: str = Field(max_length=50, unique=True, index=True)
+    user_id: int = Field(foreign_key="user.id")
+    # Boş bırakılırsa oluşturulurken dönem önekli numara atanır (app.crud.invoice_number)
+    invoice_number: Optional[str] = Field(default=None, max_length=50, unique=True, index=True, nullable=False)
     
     billing_period_start: datetime
     billing_period_end: datetime
@@ -0,0 +1,9 @@
+from sqlmodel import SQLModel, Field
+
+# Sequence desteği olmayan veritabanlarında (SQLite) fatura numarası sayacı; numaralar blok blok ayrılır
+class InvoiceNumberCounter(SQLModel, table=True):
+    __tablename__ = "invoice_number_counter"
+
+    name: str = Field(primary_key=True, max_length=50)
+    # Henüz ayrılmamış ilk numara
+    next_value: int = Field(default=1)
@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime
@@ -8,6 +9,10 @@ if TYPE_CHECKING:
 
 class PackageChangeRequest(SQLModel, table=True):
     __tablename__ = "package_change_request"
+    __table_args__ = (
+        # Talep listesinin keyset sayfalaması (requested_at, id)
+        Index("ix_package_change_request_requested_at_id", "requested_at", "id"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", index=True)
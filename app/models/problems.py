@@ -1,9 +1,15 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from typing import Optional
 from datetime import datetime
 
 class Problem(SQLModel, table=True):
     __tablename__ = "problem"
+    __table_args__ = (
+        Index("ix_problem_status_priority", "status", "priority"),
+        # Problem listesinin keyset sayfalaması (created_at, id)
+        Index("ix_problem_created_at_id", "created_at", "id"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     location: str = Field(max_length=200)
@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime
@@ -7,9 +8,12 @@ if TYPE_CHECKING:
 
 class RemainingUses(SQLModel, table=True):
     __tablename__ = "remaining_uses"
+    __table_args__ = (
+        Index("ix_remaining_uses_user_id_service_type", "user_id", "service_type"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.id", index=True)
+    user_id: int = Field(foreign_key="user.id")
     service_type: str = Field(max_length=100)  # SMS, Email, Call
     remaining_count: int = Field(default=0, ge=0)
     total_allocated: int = Field(default=0, ge=0)    
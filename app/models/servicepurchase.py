@@ -1,3 +1,4 @@
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime
@@ -7,9 +8,22 @@ if TYPE_CHECKING:
 
 class ServicePurchase(SQLModel, table=True):
     __tablename__ = "service_purchase"
+    __table_args__ = (
+        Index("ix_service_purchase_user_id_purchase_date_is_used", "user_id", "purchase_date", "is_used"),
+        # Satın alma listesinin keyset sayfalaması (purchase_date, id)
+        Index("ix_service_purchase_purchase_date_id", "purchase_date", "id"),
+        # Henüz faturalanmamış satın alımlar (fatura oluşturma bunları tarar)
+        Index(
+            "ix_service_purchase_unbilled",
+            "user_id",
+            "purchase_date",
+            postgresql_where=text("is_used = false"),
+            sqlite_where=text("is_used = 0"),
+        ),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.id", index=True)
+    user_id: int = Field(foreign_key="user.id")
     service_type: str = Field(max_length=50)  # SMS, Email, Call
     count: int = Field(default=0, ge=0)
     unit_price: float = Field(ge=0)
@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime
@@ -8,9 +9,13 @@ if TYPE_CHECKING:
 
 class Subscription(SQLModel, table=True):
     __tablename__ = "subscription"
+    __table_args__ = (
+        # Aktif abonelik sorguları (user_id, is_active) üzerinden gelir
+        Index("ix_subscription_user_id_is_active", "user_id", "is_active"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.id", index=True)
+    user_id: int = Field(foreign_key="user.id")
     package_id: int = Field(foreign_key="package.id", index=True)
     
     start_date: datetime = Field(default_factory=datetime.utcnow)
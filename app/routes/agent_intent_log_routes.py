@@ -1,19 +1,27 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from typing import List, Optional
 from datetime import datetime
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.async_database import get_async_session
 from app.crud.agent_intent_log_crud import (
+    iter_agent_intent_logs_for_export,
+    get_agent_intent_logs_page,
     get_agent_intent_logs,
     get_agent_intent_log_by_id,
     get_agent_intent_logs_by_user,
     get_agent_intent_logs_by_intent,
     get_agent_intent_logs_by_date_range,
-    create_agent_intent_log,
     update_agent_intent_log,
     delete_agent_intent_log,
     get_recent_agent_intent_logs,
-    get_agent_intent_logs_by_user_and_intent
+    get_agent_intent_logs_by_user_and_intent,
+    get_agent_intent_logs_by_user_async
 )
+from app.crud.agent_log_writer import AgentLogQueueFullError, ingest_agent_intent_log
+from app.crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
 from app.models.agentintentlog import AgentIntentLog
+from app.utils.export import ExportFormat, export_response
+from app.utils.json_response import fast_json_enabled, rows_response
 
 router = APIRouter(
     prefix="/agent-logs",
@@ -22,9 +30,31 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[AgentIntentLog])
-def get_all_agent_intent_logs():
-    """Tüm agent intent loglarını getir"""
-    return get_agent_intent_logs()
+def get_all_agent_intent_logs(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Agent intent loglarını sayfalı getir (sonraki sayfa cursor'ı X-Next-Cursor header'ında döner)"""
+    try:
+        page = get_agent_intent_logs_page(limit, cursor, as_rows=fast_json_enabled())
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if fast_json_enabled():
+        return rows_response(page.items, response)
+    return page.items
+
+@router.get("/export")
+def export_agent_intent_logs(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    format: ExportFormat = "ndjson",
+):
+    """Agent intent loglarını tarih aralığına göre NDJSON veya CSV olarak akıtarak dışa aktar"""
+    rows = iter_agent_intent_logs_for_export(start_date, end_date)
+    return export_response(rows, AgentIntentLog.__table__.columns.keys(), format, "agent_intent_logs")
 
 @router.get("/{log_id}", response_model=AgentIntentLog)
 def get_agent_intent_log(log_id: int):
@@ -35,9 +65,9 @@ def get_agent_intent_log(log_id: int):
     return log
 
 @router.get("/user/{user_id}", response_model=List[AgentIntentLog])
-def get_user_agent_intent_logs(user_id: int):
+async def get_user_agent_intent_logs(user_id: int, session: AsyncSession = Depends(get_async_session)):
     """Kullanıcının agent intent loglarını getir"""
-    return get_agent_intent_logs_by_user(user_id)
+    return await get_agent_intent_logs_by_user_async(session, user_id)
 
 @router.get("/intent/{intent}", response_model=List[AgentIntentLog])
 def get_logs_by_intent(intent: str):
@@ -50,9 +80,15 @@ def get_recent_logs(limit: int = 50):
     return get_recent_agent_intent_logs(limit)
 
 @router.post("/", response_model=AgentIntentLog)
-def create_new_agent_intent_log(agent_intent_log: AgentIntentLog):
-    """Yeni agent intent log oluştur"""
-    return create_agent_intent_log(agent_intent_log)
+def create_new_agent_intent_log(agent_intent_log: AgentIntentLog, response: Response):
+    """Yeni agent intent log oluştur (toplu yazma kuyruğuna alındıysa 202 döner)"""
+    try:
+        agent_intent_log = ingest_agent_intent_log(agent_intent_log)
+    except AgentLogQueueFullError:
+        raise HTTPException(status_code=503, detail="Agent log queue is full", headers={"Retry-After": "1"})
+    if agent_intent_log.id is None:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return agent_intent_log
 
 @router.put("/{log_id}", response_model=AgentIntentLog)
 def update_agent_intent_log_info(log_id: int, log_data: dict):
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from typing import List
+from app.crud.billing_crud import (
+    InvoicePeriodIndexMissingError,
+    claim_billing_run,
+    get_billing_run,
+    get_billing_run_partitions,
+    get_billing_runs,
+    month_period,
+    release_billing_run,
+    require_invoice_period_index,
+)
+from app.jobs import monthly_billing
+from app.models.billingrun import BillingRun, BillingRunPartition
+from app.utils.logging_config import log_error
+
+router = APIRouter(
+    prefix="/billing",
+    tags=["billing"],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.post("/runs", response_model=BillingRun, status_code=status.HTTP_202_ACCEPTED)
+def start_billing_run(
+    response: Response,
+    year: int = Query(..., ge=2000, le=2100),
+    month: int = Query(..., ge=1, le=12),
+):
+    """Ayın faturalarını tüm aktif aboneler için ayrı bir process'te kes (yarıda kalan çalışmaya devam eder)
+
+    Dönem tamamlanmışsa ya da çalışması hâlâ ilerliyorsa yeni iş başlatılmaz, mevcut çalışma 200 ile döner.
+    Aynı dönem için birden fazla faturası olan kullanıcılar varken kesim başlatılmaz (409).
+    """
+    try:
+        require_invoice_period_index()
+    except InvoicePeriodIndexMissingError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    period_start, period_end = month_period(year, month)
+    run, claimed = claim_billing_run(period_start, period_end)
+    if not claimed:
+        response.status_code = status.HTTP_200_OK
+        return run
+    try:
+        monthly_billing.launch(year, month)
+    except Exception as e:
+        log_error(e, f"Billing job for {period_start:%Y-%m} could not be started")
+        release_billing_run(run.id, f"Job could not be started: {e}")
+        raise HTTPException(status_code=500, detail="Billing job could not be started")
+    return run
+
+@router.get("/runs", response_model=List[BillingRun])
+def list_billing_runs(limit: int = Query(20, ge=1, le=100)):
+    """Son fatura kesim çalışmaları ve ilerlemeleri"""
+    return get_billing_runs(limit)
+
+@router.get("/runs/{run_id}", response_model=BillingRun)
+def get_billing_run_status(run_id: int):
+    """Fatura kesim çalışmasının durumu ve checkpoint'i"""
+    run = get_billing_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Billing run not found")
+    return run
+
+@router.get("/runs/{run_id}/partitions", response_model=List[BillingRunPartition])
+def get_billing_run_partition_status(run_id: int):
+    """Paralel çalışmanın user_id aralıkları, checkpoint'leri ve deneme sayıları"""
+    if not get_billing_run(run_id):
+        raise HTTPException(status_code=404, detail="Billing run not found")
+    return get_billing_run_partitions(run_id)
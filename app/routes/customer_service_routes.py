@@ -1,18 +1,28 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Query, Body, Response, status
 from typing import List, Optional
 from datetime import datetime, timedelta
 from sqlmodel import Session, select
-from app.db.database import engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.db.database import get_session
+from app.db.async_database import get_async_session
 from app.models.user import User
 from app.models.subscription import Subscription
 from app.models.invoice import Invoice
 from app.models.problems import Problem
-from app.models.agentintentlog import AgentIntentLog
-from app.crud.user_crud import get_user_by_phone
-from app.crud.subscription_crud import get_user_active_subscription
-from app.crud.invoice_crud import get_invoices_by_user
-from app.crud.remaining_uses_crud import get_remaining_uses_by_user
-from app.crud.agent_intent_log_crud import create_agent_intent_log
+from app.models.agentintentlog import AgentIntentLog, InteractionLogItem
+from app.crud.user_crud import get_user_profile_by_phone, get_user_profile_by_phone_async, get_user_profiles_by_phones, remember_user_profile
+from app.crud.customer_crud import get_customer_snapshot_async, get_customer_snapshots_by_phone_async
+from app.crud.customer_summary_crud import get_customer_summary_async, repair_customer_summary_async, summary_snapshot
+from app.crud.customer_cache import customer_key, get_cached_async, set_cached, set_cached_async
+from app.crud.user_search import SEARCH_RESULT_LIMIT, search_users
+from app.crud.agent_intent_log_crud import create_agent_intent_logs, get_recent_agent_intent_logs_by_user_async
+from app.crud.agent_log_writer import AgentLogQueueFullError, ingest_agent_intent_log
+
+# Tek istekte sorgulanabilecek en fazla telefon numarası
+BATCH_LOOKUP_LIMIT = 200
+# Tek istekte loglanabilecek en fazla etkileşim
+BULK_LOG_LIMIT = 1000
 
 router = APIRouter(
     prefix="/customer-service",
@@ -21,65 +31,89 @@ router = APIRouter(
 )
 
 @router.get("/customer/{phone_number}")
-def get_customer_info(phone_number: str):
+async def get_customer_info(phone_number: str, session: AsyncSession = Depends(get_async_session)):
     """Telefon numarasına göre müşteri bilgilerini getir (çağrı merkezi için)"""
-    user = get_user_by_phone(phone_number)
-    if not user:
+    profile = await get_user_profile_by_phone_async(session, phone_number)
+    if not profile:
         raise HTTPException(status_code=404, detail="Customer not found")
-    
-    # Aktif abonelik
-    active_subscription = get_user_active_subscription(user.id)
-    
-    # Son 5 fatura
-    recent_invoices = get_invoices_by_user(user.id)[:5]
-    
-    # Kalan kullanımlar
-    remaining_uses = get_remaining_uses_by_user(user.id)
-    
-    return {
-        "customer": {
-            "id": user.id,
-            "name": f"{user.name} {user.surname}",
-            "phone": user.phone_number,
-            "email": user.email,
-            "is_active": user.is_active,
-            "created_at": user.created_at
-        },
-        "subscription": {
-            "id": active_subscription.id if active_subscription else None,
-            "package_id": active_subscription.package_id if active_subscription else None,
-            "start_date": active_subscription.start_date if active_subscription else None,
-            "end_date": active_subscription.end_date if active_subscription else None,
-            "contract_months": active_subscription.contract_months if active_subscription else None,
-            "is_active": active_subscription.is_active if active_subscription else False
-        } if active_subscription else None,
-        "recent_invoices": [
-            {
-                "id": inv.id,
-                "invoice_number": inv.invoice_number,
-                "total_amount": inv.total_amount,
-                "status": inv.status,
-                "due_date": inv.due_date,
-                "created_at": inv.created_at
-            }
-            for inv in recent_invoices
-        ],
-        "remaining_uses": [
+    cache_key = customer_key(profile.id, "info")
+    cached = await get_cached_async(cache_key)
+    if cached is not None:
+        return cached
+
+    # Yazma yollarında güncellenen özet satırı: tek primary key okuması
+    summary = await get_customer_summary_async(session, profile.id)
+    if summary:
+        customer_info = _customer_info(
             {
-                "service_type": ru.service_type,
-                "remaining_count": ru.remaining_count,
-                "total_allocated": ru.total_allocated,
-                "expires_at": ru.expires_at
-            }
-            for ru in remaining_uses
-        ]
+                "id": summary.user_id,
+                "name": f"{summary.name} {summary.surname}",
+                "phone": summary.phone_number,
+                "email": summary.email,
+                "is_active": summary.is_active,
+                "created_at": summary.user_created_at
+            },
+            summary_snapshot(summary),
+        )
+    else:
+        # Özet satırı yok (ORM dışından yazılmış kullanıcı): canlı tablolardan oku, satırı onar
+        snapshot = await get_customer_snapshot_async(session, profile.id)
+        if not snapshot:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        await repair_customer_summary_async(session, profile.id)
+        customer_info = _customer_info(_user_fields(snapshot["user"]), snapshot)
+    await set_cached_async(cache_key, customer_info)
+    return customer_info
+
+def _customer_info(customer: dict, snapshot: dict) -> dict:
+    """Müşteri görünümünü çağrı merkezi ekranının beklediği biçime çevir"""
+    return {
+        "customer": customer,
+        "subscription": snapshot["subscription"],
+        "recent_invoices": snapshot["recent_invoices"],
+        "remaining_uses": snapshot["remaining_uses"],
+        "open_change_requests": snapshot["open_change_requests"]
+    }
+
+def _user_fields(user: User) -> dict:
+    return {
+        "id": user.id,
+        "name": f"{user.name} {user.surname}",
+        "phone": user.phone_number,
+        "email": user.email,
+        "is_active": user.is_active,
+        "created_at": user.created_at
+    }
+
+def _warm_customer_caches(snapshots: dict, customers: dict) -> None:
+    for phone_number, snapshot in snapshots.items():
+        remember_user_profile(snapshot["user"])
+        set_cached(customer_key(snapshot["user"].id, "info"), customers[phone_number])
+
+@router.post("/customers/batch")
+async def get_customers_batch(
+    phone_numbers: List[str] = Body(..., embed=True, min_length=1, max_length=BATCH_LOOKUP_LIMIT),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Sıradaki arayanların müşteri bilgilerini tek seferde getir (IVR ön yükleme)
+
+    Telefon sayısından bağımsız olarak tek sorgu çalışır; sonuçlar paylaşılan önbelleğe
+    yazılır, böylece arama ekrana düştüğünde tekil endpoint önbellekten döner.
+    """
+    snapshots = await get_customer_snapshots_by_phone_async(session, phone_numbers)
+    customers = {phone_number: _customer_info(_user_fields(snapshot["user"]), snapshot) for phone_number, snapshot in snapshots.items()}
+    # Önbellek yazmaları (Redis'te müşteri başına iki komut) event loop'u bloklamasın
+    await run_in_threadpool(_warm_customer_caches, snapshots, customers)
+    return {
+        "customers": customers,
+        "not_found": [phone for phone in dict.fromkeys(phone_numbers) if phone not in customers]
     }
 
 @router.post("/log-interaction")
-def log_customer_interaction(user_id: Optional[int], phone_number: Optional[str], intent: str, message: str, confidence: Optional[float] = None):
-    """Müşteri etkileşimini logla"""
+def log_customer_interaction(user_id: Optional[int], phone_number: Optional[str], intent: str, message: str, response: Response, confidence: Optional[float] = None, session: Session = Depends(get_session)):
+    """Müşteri etkileşimini logla (toplu yazma kuyruğuna alındıysa 202 döner)"""
     if not user_id and phone_number:
-        user = get_user_by_phone(phone_number)
+        user = get_user_profile_by_phone(phone_number, session=session)
         user_id = user.id if user else None
     
     log = AgentIntentLog(
@@ -89,136 +123,156 @@ def log_customer_interaction(user_id: Optional[int], phone_number: Optional[str]
         confidence=confidence,
         created_at=datetime.utcnow()
     )
-    
-    return create_agent_intent_log(log)
+
+    try:
+        log = ingest_agent_intent_log(log, session=session)
+    except AgentLogQueueFullError:
+        raise HTTPException(status_code=503, detail="Interaction log queue is full", headers={"Retry-After": "1"})
+    if log.id is None:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return log
+
+@router.post("/log-interactions/bulk")
+def log_customer_interactions_bulk(
+    interactions: List[InteractionLogItem] = Body(..., embed=True, min_length=1, max_length=BULK_LOG_LIMIT),
+    session: Session = Depends(get_session),
+):
+    """Bir görüşmenin tüm etkileşimlerini tek istekte logla
+
+    user_id verilmeyen kayıtların telefon numaraları tek sorguda çözülür, tüm kayıtlar tek
+    INSERT ile eklenir. Sonuçlar istekteki sırayla döner; çözülemeyen numaralar da
+    (tekil endpoint'teki gibi) kullanıcısız loglanır.
+    """
+    phone_numbers = [item.phone_number for item in interactions if not item.user_id and item.phone_number]
+    profiles = get_user_profiles_by_phones(phone_numbers, session=session) if phone_numbers else {}
+    now = datetime.utcnow()
+
+    logs = []
+    for item in interactions:
+        user_id = item.user_id
+        if not user_id and item.phone_number in profiles:
+            user_id = profiles[item.phone_number].id
+        logs.append(AgentIntentLog(
+            user_id=user_id,
+            intent=item.intent,
+            message=item.message,
+            confidence=item.confidence,
+            created_at=item.created_at or now
+        ))
+
+    ids = create_agent_intent_logs(logs, session=session)
+    return {
+        "created": len(ids),
+        "results": [
+            {
+                "id": log_id,
+                "user_id": log.user_id,
+                "phone_number": item.phone_number,
+                "user_resolved": log.user_id is not None
+            }
+            for item, log, log_id in zip(interactions, logs, ids)
+        ]
+    }
 
 @router.get("/quick-search/{search_term}")
-def quick_customer_search(search_term: str):
-    """Hızlı müşteri arama (telefon, isim veya email ile)"""
-    with Session(engine) as session:
-        # Telefon numarası ile arama
-        phone_results = session.exec(
-            select(User).where(User.phone_number.contains(search_term))
-        ).all()
-        
-        # İsim ile arama
-        name_results = session.exec(
-            select(User).where(
-                User.name.contains(search_term) | 
-                User.surname.contains(search_term)
-            )
-        ).all()
-        
-        # Email ile arama
-        email_results = session.exec(
-            select(User).where(User.email.contains(search_term))
-        ).all() if search_term and "@" in search_term else []
-        
-        # Sonuçları birleştir ve tekrarları kaldır
-        all_results = list({user.id: user for user in phone_results + name_results + email_results}.values())
-        
-        return {
-            "results": [
-                {
-                    "id": user.id,
-                    "name": f"{user.name} {user.surname}",
-                    "phone": user.phone_number,
-                    "email": user.email,
-                    "is_active": user.is_active
-                }
-                for user in all_results[:10]  # İlk 10 sonuç
-            ],
-            "total_found": len(all_results)
-        }
+def quick_customer_search(search_term: str, limit: int = Query(SEARCH_RESULT_LIMIT, ge=1, le=50)):
+    """Hızlı müşteri arama (telefon, isim veya email ile), benzerliğe göre sıralı"""
+    result = search_users(search_term, limit)
+    return {
+        "results": [
+            {
+                "id": hit.id,
+                "name": f"{hit.name} {hit.surname}",
+                "phone": hit.phone_number,
+                "email": hit.email,
+                "is_active": hit.is_active
+            }
+            for hit in result.hits
+        ],
+        "total_found": result.total_found,
+        # total_found SEARCH_CANDIDATE_CAP'te kesildi
+        "total_capped": result.total_capped
+    }
 
 @router.get("/customer/{user_id}/problems")
-def get_customer_problems(user_id: int):
+def get_customer_problems(user_id: int, session: Session = Depends(get_session)):
     """Müşterinin bildirdiği problemleri getir"""
-    with Session(engine) as session:
-        # Müşterinin bulunduğu lokasyondaki problemler (basit implementasyon)
-        user = session.get(User, user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="Customer not found")
-        
-        # Tüm aktif problemleri getir (gerçek uygulamada lokasyon bazlı filtreleme yapılabilir)
-        problems = session.exec(
-            select(Problem).where(Problem.status != "completed")
-        ).all()
-        
-        return {
-            "customer_id": user_id,
-            "problems": [
-                {
-                    "id": p.id,
-                    "location": p.location,
-                    "problem": p.problem,
-                    "status": p.status,
-                    "priority": p.priority,
-                    "estimated_completion_time": p.estimated_completion_time,
-                    "created_at": p.created_at
-                }
-                for p in problems
-            ]
-        }
+    # Müşterinin bulunduğu lokasyondaki problemler (basit implementasyon)
+    user = session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    # Tüm aktif problemleri getir (gerçek uygulamada lokasyon bazlı filtreleme yapılabilir)
+    problems = session.exec(
+        select(Problem).where(Problem.status != "completed")
+    ).all()
+    
+    return {
+        "customer_id": user_id,
+        "problems": [
+            {
+                "id": p.id,
+                "location": p.location,
+                "problem": p.problem,
+                "status": p.status,
+                "priority": p.priority,
+                "estimated_completion_time": p.estimated_completion_time,
+                "created_at": p.created_at
+            }
+            for p in problems
+        ]
+    }
 
 @router.post("/customer/{user_id}/complaint")
-def create_customer_complaint(user_id: int, complaint: str, priority: str = "medium"):
+def create_customer_complaint(user_id: int, complaint: str, priority: str = "medium", session: Session = Depends(get_session)):
     """Müşteri şikayeti oluştur"""
-    with Session(engine) as session:
-        user = session.get(User, user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="Customer not found")
-        
-        problem = Problem(
-            location=f"Customer Complaint - {user.phone_number}",
-            problem=complaint,
-            status="pending",
-            priority=priority,
-            estimated_completion_time=datetime.utcnow() + timedelta(days=3),  # 3 gün içinde çözülmesi hedefi
-            created_at=datetime.utcnow()
-        )
-        
-        session.add(problem)
-        session.commit()
-        session.refresh(problem)
-        
-        # Şikayeti logla
-        log = AgentIntentLog(
-            user_id=user_id,
-            intent="complaint",
-            message=f"Customer complaint created: {complaint[:100]}...",
-            created_at=datetime.utcnow()
-        )
-        session.add(log)
-        session.commit()
-        
-        return {
-            "message": "Complaint created successfully",
-            "complaint_id": problem.id,
-            "estimated_resolution": problem.estimated_completion_time
-        }
+    user = session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    problem = Problem(
+        location=f"Customer Complaint - {user.phone_number}",
+        problem=complaint,
+        status="pending",
+        priority=priority,
+        estimated_completion_time=datetime.utcnow() + timedelta(days=3),  # 3 gün içinde çözülmesi hedefi
+        created_at=datetime.utcnow()
+    )
+    
+    session.add(problem)
+    session.flush()
+    session.refresh(problem)
+    
+    # Şikayeti logla
+    log = AgentIntentLog(
+        user_id=user_id,
+        intent="complaint",
+        message=f"Customer complaint created: {complaint[:100]}...",
+        created_at=datetime.utcnow()
+    )
+    session.add(log)
+    
+    return {
+        "message": "Complaint created successfully",
+        "complaint_id": problem.id,
+        "estimated_resolution": problem.estimated_completion_time
+    }
 
 @router.get("/customer/{user_id}/interaction-history")
-def get_customer_interaction_history(user_id: int, limit: int = 20):
+async def get_customer_interaction_history(user_id: int, limit: int = 20, session: AsyncSession = Depends(get_async_session)):
     """Müşterinin etkileşim geçmişini getir"""
-    with Session(engine) as session:
-        interactions = session.exec(
-            select(AgentIntentLog)
-            .where(AgentIntentLog.user_id == user_id)
-            .order_by(AgentIntentLog.created_at.desc())
-            .limit(limit)
-        ).all()
-        
-        return {
-            "customer_id": user_id,
-            "interactions": [
-                {
-                    "id": interaction.id,
-                    "intent": interaction.intent,
-                    "message": interaction.message,
-                    "confidence": interaction.confidence,
-                    "created_at": interaction.created_at
-                }
-                for interaction in interactions
-            ]
-        }
+    interactions = await get_recent_agent_intent_logs_by_user_async(session, user_id, limit)
+    
+    return {
+        "customer_id": user_id,
+        "interactions": [
+            {
+                "id": interaction.id,
+                "intent": interaction.intent,
+                "message": interaction.message,
+                "confidence": interaction.confidence,
+                "created_at": interaction.created_at
+            }
+            for interaction in interactions
+        ]
+    }
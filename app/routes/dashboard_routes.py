@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
-from sqlmodel import Session, select, func
-from app.db.database import engine
+from sqlmodel import select, func
+from app.db.database import session_scope
+from app.db.replica import read_session_scope
+from app.crud.customer_cache import customer_key, get_cached, set_cached
+from app.crud.customer_summary_crud import get_customer_summary, summary_interactions, summary_snapshot
 from app.models.user import User
 from app.models.subscription import Subscription
 from app.models.invoice import Invoice
@@ -19,7 +22,7 @@ router = APIRouter(
 @router.get("/stats")
 def get_dashboard_stats():
     """Çağrı merkezi dashboard için temel istatistikler"""
-    with Session(engine) as session:
+    with read_session_scope() as session:
         # Kullanıcı istatistikleri
         total_users = session.exec(select(func.count(User.id))).first()
         active_users = session.exec(select(func.count(User.id)).where(User.is_active == True)).first()
@@ -66,7 +69,7 @@ def get_dashboard_stats():
 @router.get("/recent-activities")
 def get_recent_activities(limit: int = 20):
     """Son aktiviteleri getir"""
-    with Session(engine) as session:
+    with read_session_scope() as session:
         # Son agent logları
         recent_logs = session.exec(
             select(AgentIntentLog)
@@ -106,74 +109,58 @@ def get_recent_activities(limit: int = 20):
 @router.get("/user/{user_id}/summary")
 def get_user_summary(user_id: int):
     """Belirli bir kullanıcı için özet bilgiler"""
-    with Session(engine) as session:
-        # Kullanıcı bilgileri
-        user = session.get(User, user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Aktif abonelik
-        active_subscription = session.exec(
-            select(Subscription).where(
-                Subscription.user_id == user_id,
-                Subscription.is_active == True
-            )
-        ).first()
-        
-        # Fatura sayısı
-        invoice_count = session.exec(
-            select(func.count(Invoice.id)).where(Invoice.user_id == user_id)
-        ).first()
-        
-        # Ödenmemiş fatura sayısı
-        unpaid_invoice_count = session.exec(
-            select(func.count(Invoice.id)).where(
-                Invoice.user_id == user_id,
-                Invoice.status == "pending"
-            )
-        ).first()
-        
-        # Son agent logları
-        recent_logs = session.exec(
-            select(AgentIntentLog)
-            .where(AgentIntentLog.user_id == user_id)
-            .order_by(AgentIntentLog.created_at.desc())
-            .limit(5)
-        ).all()
-        
-        return {
-            "user": {
-                "id": user.id,
-                "name": f"{user.name} {user.surname}",
-                "phone": user.phone_number,
-                "email": user.email,
-                "is_active": user.is_active
-            },
-            "subscription": {
-                "has_active": active_subscription is not None,
-                "package_id": active_subscription.package_id if active_subscription else None,
-                "start_date": active_subscription.start_date if active_subscription else None,
-                "end_date": active_subscription.end_date if active_subscription else None,
-                "contract_months": active_subscription.contract_months if active_subscription else None
-            },
-            "invoices": {
-                "total": invoice_count or 0,
-                "unpaid": unpaid_invoice_count or 0
-            },
-            "recent_interactions": [
-                {
-                    "intent": log.intent,
-                    "message": log.message[:100] + "..." if len(log.message) > 100 else log.message,
-                    "created_at": log.created_at
-                }
-                for log in recent_logs
-            ]
-        }
+    cache_key = customer_key(user_id, "summary")
+    cached = get_cached(cache_key)
+    if cached is not None:
+        return cached
+
+    # Özet yazma yollarında güncellenen customer_summary tablosundan tek satır okunur; sonuç
+    # TTL boyunca önbellekte kalacağı için gecikmeli replikadan değil primary'den okunur
+    with session_scope() as session:
+        row = get_customer_summary(user_id, session=session)
+    if not row:
+        raise HTTPException(status_code=404, detail="User not found")
+    subscription = summary_snapshot(row)["subscription"]
+
+    summary = {
+        "user": {
+            "id": row.user_id,
+            "name": f"{row.name} {row.surname}",
+            "phone": row.phone_number,
+            "email": row.email,
+            "is_active": row.is_active
+        },
+        "subscription": {
+            "has_active": subscription is not None,
+            "package_id": subscription["package_id"] if subscription else None,
+            "package_name": row.active_package_name,
+            "start_date": subscription["start_date"] if subscription else None,
+            "end_date": subscription["end_date"] if subscription else None,
+            "contract_months": subscription["contract_months"] if subscription else None
+        },
+        "invoices": {
+            "total": row.invoice_count,
+            "unpaid": row.unpaid_invoice_count,
+            "unpaid_total": row.unpaid_total
+        },
+        "remaining_uses_total": row.remaining_uses_total,
+        "last_interaction_at": row.last_interaction_at,
+        "recent_interactions": [
+            {
+                "intent": log["intent"],
+                "message": log["message"][:100] + "..." if len(log["message"]) > 100 else log["message"],
+                "created_at": log["created_at"]
+            }
+            for log in summary_interactions(row)
+        ]
+    }
+    set_cached(cache_key, summary)
+    return summary
 
 @router.get("/problems/urgent")
 def get_urgent_problems():
     """Acil problemleri getir"""
-    with Session(engine) as session:
+    with read_session_scope() as session:
         # Süresi geçmiş problemler
         overdue_problems = session.exec(
             select(Problem).where(
@@ -218,7 +205,7 @@ def get_urgent_problems():
 @router.get("/revenue/monthly")
 def get_monthly_revenue():
     """Aylık gelir istatistikleri"""
-    with Session(engine) as session:
+    with read_session_scope() as session:
         # Son 12 ayın geliri
         monthly_revenue = []
         for i in range(12):
@@ -0,0 +1,45 @@
+from fastapi import APIRouter
+from app.db.database import engine
+from app.db.async_database import async_engine
+from app.db.replica import replica_engines
+from app.db.pool import pool_status
+from app.db.instrumentation import query_metrics
+from app.crud.user_crud import phone_cache
+from app.crud.agent_log_writer import agent_log_writer
+from app.utils.cache import get_cache_backend
+
+router = APIRouter(
+    prefix="/db",
+    tags=["db"],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.get("/pool")
+async def get_pool_metrics():
+    """Bağlantı havuzlarının durumu: kullanılan bağlantılar, overflow, bekleme sayıları ve checkout gecikmesi"""
+    return {
+        "primary": pool_status(engine.pool),
+        "primary_async": pool_status(async_engine.sync_engine.pool),
+        "replicas": [
+            {"host": replica.url.host or replica.url.database, **pool_status(replica.pool)}
+            for replica in replica_engines
+        ]
+    }
+
+@router.get("/queries")
+async def get_query_metrics():
+    """İstek başına sorgu sayısı, toplam DB süresi ve N+1 uyarısı üreten endpoint'ler"""
+    return query_metrics.snapshot()
+
+@router.get("/cache")
+async def get_cache_metrics():
+    """Process içi ve paylaşılan önbelleklerin isabet/ıska istatistikleri"""
+    return {
+        "phone_to_user": phone_cache.stats(),
+        "shared": get_cache_backend().stats()
+    }
+
+@router.get("/agent-log-writer")
+async def get_agent_log_writer_metrics():
+    """Agent log toplu yazma kuyruğunun doluluğu ve yazma/ret sayaçları"""
+    return agent_log_writer.stats()
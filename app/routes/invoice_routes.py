@@ -1,23 +1,45 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from typing import List, Optional
 from datetime import datetime
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import get_session
+from app.db.async_database import get_async_session
 from app.crud.invoice_crud import (
-    get_active_invoice_by_phone,
+    DuplicateInvoiceError,
+    InvalidInvoiceError,
+    iter_invoices_for_export,
+    get_invoices_page,
+    get_active_invoice_by_user_async,
     get_invoices,
     get_invoice_by_id,
     get_invoices_by_user,
+    get_invoices_by_user_and_period,
+    get_invoices_with_items_by_user,
     get_invoices_by_status,
     get_unpaid_invoices,
+    get_invoice_aging,
+    get_invoice_aging_by_user,
     create_invoice,
     update_invoice,
     delete_invoice,
     mark_invoice_as_paid,
-    get_invoices_by_period
+    get_invoices_by_period,
+    get_invoices_by_user_async
 )
-from app.crud.invoice_item_crud import get_invoice_items_by_invoice
-from app.crud.user_crud import get_user_by_phone
+from app.crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
+from app.crud.invoice_item_crud import (
+    get_invoice_items_by_invoice,
+    get_invoice_items_by_invoice_async,
+    iter_invoice_items_for_export,
+)
+from app.crud.user_crud import get_user_profile_by_phone, get_user_profile_by_phone_async
+from app.crud.customer_summary_crud import get_customer_version_async
 from app.models.invoice import Invoice
 from app.models.invoiceitem import InvoiceItem
+from app.utils.export import ExportFormat, export_response
+from app.utils.http_cache import is_not_modified, make_etag, not_modified_response, set_validators
+from app.utils.json_response import fast_json_enabled, rows_response
 
 router = APIRouter(
     prefix="/invoices",
@@ -26,9 +48,55 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[Invoice])
-def get_all_invoices():
-    """Tüm faturaları getir"""
-    return get_invoices()
+def get_all_invoices(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Faturaları sayfalı getir (sonraki sayfa cursor'ı X-Next-Cursor header'ında döner)"""
+    try:
+        page = get_invoices_page(limit, cursor, as_rows=fast_json_enabled())
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if fast_json_enabled():
+        return rows_response(page.items, response)
+    return page.items
+
+@router.get("/export")
+def export_invoices(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    format: ExportFormat = "ndjson",
+):
+    """Faturaları oluşturulma tarihi aralığına göre NDJSON veya CSV olarak akıtarak dışa aktar"""
+    rows = iter_invoices_for_export(start_date, end_date)
+    return export_response(rows, Invoice.__table__.columns.keys(), format, "invoices")
+
+@router.get("/items/export")
+def export_invoice_items(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    format: ExportFormat = "ndjson",
+):
+    """Fatura kalemlerini fatura tarih aralığına göre NDJSON veya CSV olarak akıtarak dışa aktar"""
+    rows = iter_invoice_items_for_export(start_date, end_date)
+    return export_response(rows, InvoiceItem.__table__.columns.keys(), format, "invoice_items")
+
+@router.get("/aging")
+def get_invoice_aging_report(as_of: Optional[datetime] = None):
+    """Ödenmemiş faturaların vadeden bu yana geçen güne göre (0-30/31-60/61-90/90+) adet ve tutarları"""
+    return get_invoice_aging(as_of)
+
+@router.get("/aging/users")
+def get_invoice_aging_report_by_user(
+    as_of: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Kullanıcı başına yaşlandırma raporu, en yüksek ödenmemiş tutara sahip kullanıcılardan başlayarak"""
+    return get_invoice_aging_by_user(as_of, user_id, limit)
 
 @router.get("/{invoice_id}", response_model=Invoice)
 def get_invoice(invoice_id: int):
@@ -39,46 +107,40 @@ def get_invoice(invoice_id: int):
     return invoice
 
 @router.get("/{invoice_id}/items", response_model=List[InvoiceItem])
-def get_invoice_items(invoice_id: int):
+def get_invoice_items(invoice_id: int, session: Session = Depends(get_session)):
     """Faturanın kalemlerini getir (fiyatı oluşturan ürünler)"""
     # Önce faturanın var olup olmadığını kontrol et
-    invoice = get_invoice_by_id(invoice_id)
+    invoice = get_invoice_by_id(invoice_id, session=session)
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     
     # Fatura kalemlerini getir
-    items = get_invoice_items_by_invoice(invoice_id)
+    items = get_invoice_items_by_invoice(invoice_id, session=session)
     return items
 
 @router.get("/phone/{phone_number}/items", response_model=List[InvoiceItem])
-def get_user_invoice_items_by_phone(phone_number: str):
+def get_user_invoice_items_by_phone(phone_number: str, session: Session = Depends(get_session)):
     """Telefon numarasına göre kullanıcının tüm fatura kalemlerini getir"""
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = get_user_profile_by_phone(phone_number, session=session)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Kullanıcının tüm faturalarını getir
-    user_invoices = get_invoices_by_user(user.id)
+    # Kullanıcının tüm faturalarını kalemleriyle birlikte getir
+    user_invoices = get_invoices_with_items_by_user(user.id, session=session)
     if not user_invoices:
         raise HTTPException(status_code=404, detail="No invoices found for this user")
     
-    # Tüm faturaların kalemlerini topla
-    all_items = []
-    for invoice in user_invoices:
-        items = get_invoice_items_by_invoice(invoice.id)
-        all_items.extend(items)
-    
-    return all_items
+    return [item for invoice in user_invoices for item in invoice.items]
 
 @router.get("/phone/{phone_number}/month/{year}/{month}/items", response_model=List[InvoiceItem])
-def get_user_invoice_items_by_month_by_phone(phone_number: str, year: int, month: int):
+def get_user_invoice_items_by_month_by_phone(phone_number: str, year: int, month: int, session: Session = Depends(get_session)):
     """Telefon numarasına göre kullanıcının belirli bir aydaki fatura kalemlerini getir"""
     if month < 1 or month > 12:
         raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
     
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = get_user_profile_by_phone(phone_number, session=session)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -89,22 +151,13 @@ def get_user_invoice_items_by_month_by_phone(phone_number: str, year: int, month
     else:
         end_date = datetime(year, month + 1, 1)
     
-    # Belirli dönemdeki faturaları getir
-    period_invoices = get_invoices_by_period(start_date, end_date)
-    
-    # Sadece bu kullanıcının faturalarını filtrele
-    user_invoices = [invoice for invoice in period_invoices if invoice.user_id == user.id]
+    # Kullanıcının bu dönemdeki faturalarını kalemleriyle birlikte getir
+    user_invoices = get_invoices_with_items_by_user(user.id, start_date, end_date, session=session)
     
     if not user_invoices:
         raise HTTPException(status_code=404, detail=f"No invoices found for this user in {year}/{month}")
     
-    # Tüm faturaların kalemlerini topla
-    all_items = []
-    for invoice in user_invoices:
-        items = get_invoice_items_by_invoice(invoice.id)
-        all_items.extend(items)
-    
-    return all_items
+    return [item for invoice in user_invoices for item in invoice.items]
 
 @router.get("/user/{user_id}", response_model=List[Invoice])
 def get_user_invoices(user_id: int):
@@ -112,54 +165,61 @@ def get_user_invoices(user_id: int):
     return get_invoices_by_user(user_id)
 
 @router.get("/phone/{phone_number}/invoices", response_model=List[Invoice])
-def get_user_invoices_by_phone(phone_number: str):
+async def get_user_invoices_by_phone(phone_number: str, session: AsyncSession = Depends(get_async_session)):
     """Telefon numarasına göre kullanıcının faturalarını getir"""
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = await get_user_profile_by_phone_async(session, phone_number)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Kullanıcının faturalarını getir
-    return get_invoices_by_user(user.id)
+    return await get_invoices_by_user_async(session, user.id)
 
 @router.get("/phone/{phone_number}/activeinvoice", response_model=Invoice)
-def get_user_active_invoice_by_phone(phone_number: str):
-    """Telefon numarasına göre kullanıcının aktif faturasını ve içeriğini getir"""
-    user = get_user_by_phone(phone_number)
+async def get_user_active_invoice_by_phone(phone_number: str, request: Request, response: Response, session: AsyncSession = Depends(get_async_session)):
+    """Telefon numarasına göre kullanıcının aktif faturasını ve içeriğini getir (If-None-Match ile 304 döner)"""
+    user = await get_user_profile_by_phone_async(session, phone_number)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
+
+    # Müşteri değişmediyse fatura okunmadan 304 dön
+    version = await get_customer_version_async(session, user.id)
+    etag = make_etag(user.id, "activeinvoice", version)
+    if version is not None and is_not_modified(request, etag, version):
+        return not_modified_response(etag, version)
+
     # Kullanıcının aktif faturasını getir
-    active_invoice = get_active_invoice_by_phone(user.phone_number)
+    active_invoice = await get_active_invoice_by_user_async(session, user.id)
     if not active_invoice:
         raise HTTPException(status_code=404, detail="No active invoice found for this user")
-    
+    if version is not None:
+        set_validators(response, etag, version)
     return active_invoice
 
 @router.get("/phone/{phone_number}/activeinvoice/items", response_model=List[InvoiceItem])
-def get_user_active_invoice_items_by_phone(phone_number: str):
+async def get_user_active_invoice_items_by_phone(phone_number: str, session: AsyncSession = Depends(get_async_session)):
     """Telefon numarasına göre kullanıcının aktif faturasının kalemlerini getir"""
-    user = get_user_by_phone(phone_number)
+    user = await get_user_profile_by_phone_async(session, phone_number)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Kullanıcının aktif faturasını getir
-    active_invoice = get_active_invoice_by_phone(user.phone_number)
+    active_invoice = await get_active_invoice_by_user_async(session, user.id)
     if not active_invoice:
         raise HTTPException(status_code=404, detail="No active invoice found for this user")
     
     # Aktif faturanın kalemlerini getir
-    items = get_invoice_items_by_invoice(active_invoice.id)
+    items = await get_invoice_items_by_invoice_async(session, active_invoice.id)
     return items
 
 @router.get("/phone/{phone_number}/month/{year}/{month}", response_model=List[Invoice])
-def get_user_invoices_by_month_by_phone(phone_number: str, year: int, month: int):
+def get_user_invoices_by_month_by_phone(phone_number: str, year: int, month: int, session: Session = Depends(get_session)):
     """Telefon numarasına göre kullanıcının belirli bir aydaki faturalarını getir"""
     if month < 1 or month > 12:
         raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
     
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = get_user_profile_by_phone(phone_number, session=session)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -170,13 +230,8 @@ def get_user_invoices_by_month_by_phone(phone_number: str, year: int, month: int
     else:
         end_date = datetime(year, month + 1, 1)
     
-    # Belirli dönemdeki faturaları getir
-    period_invoices = get_invoices_by_period(start_date, end_date)
-    
-    # Sadece bu kullanıcının faturalarını filtrele
-    user_invoices = [invoice for invoice in period_invoices if invoice.user_id == user.id]
-    
-    return user_invoices
+    # Kullanıcının bu dönemdeki faturalarını getir
+    return get_invoices_by_user_and_period(user.id, start_date, end_date, session=session)
 
 @router.get("/status/{status}", response_model=List[Invoice])
 def get_invoices_by_status_route(status: str):
@@ -190,8 +245,13 @@ def get_all_unpaid_invoices():
 
 @router.post("/", response_model=Invoice)
 def create_new_invoice(invoice: Invoice):
-    """Yeni fatura oluştur"""
-    return create_invoice(invoice)
+    """Yeni fatura oluştur (kullanıcının aynı dönem için faturası varsa 409)"""
+    try:
+        return create_invoice(invoice)
+    except DuplicateInvoiceError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except InvalidInvoiceError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 @router.put("/{invoice_id}", response_model=Invoice)
 def update_invoice_info(invoice_id: int, invoice_data: dict):
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import List, Optional
 from datetime import datetime
 from app.crud.package_change_request_crud import (
+    get_package_change_requests_page,
     get_package_change_requests,
     get_package_change_request_by_id,
     get_package_change_requests_by_user,
@@ -13,6 +14,7 @@ from app.crud.package_change_request_crud import (
     approve_package_change_request,
     reject_package_change_request
 )
+from app.crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
 from app.models.packagechangerequest import PackageChangeRequest
 
 router = APIRouter(
@@ -22,9 +24,19 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[PackageChangeRequest])
-def get_all_package_change_requests():
-    """Tüm paket değişiklik taleplerini getir"""
-    return get_package_change_requests()
+def get_all_package_change_requests(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Paket değişiklik taleplerini sayfalı getir (sonraki sayfa cursor'ı X-Next-Cursor header'ında döner)"""
+    try:
+        page = get_package_change_requests_page(limit, cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
 
 @router.get("/{request_id}", response_model=PackageChangeRequest)
 def get_package_change_request(request_id: int):
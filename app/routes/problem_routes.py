@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import List, Optional
 from datetime import datetime
 from app.crud.problem_crud import (
+    get_problems_page,
     get_problems,
     get_problem_by_id,
     get_problems_by_location,
@@ -13,6 +14,7 @@ from app.crud.problem_crud import (
     search_problems_by_description,
     get_problems_by_date_range
 )
+from app.crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
 from app.models.problems import Problem
 
 router = APIRouter(
@@ -22,9 +24,19 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[Problem])
-def get_all_problems():
-    """Tüm problemleri getir"""
-    return get_problems()
+def get_all_problems(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Problemleri sayfalı getir (sonraki sayfa cursor'ı X-Next-Cursor header'ında döner)"""
+    try:
+        page = get_problems_page(limit, cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
 
 @router.get("/{problem_id}", response_model=Problem)
 def get_problem(problem_id: int):
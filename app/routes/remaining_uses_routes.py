@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from typing import List, Optional
 from datetime import datetime
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import get_session
+from app.db.async_database import get_async_session
 from app.crud.remaining_uses_crud import (
+    get_remaining_uses_page,
     get_remaining_uses,
     get_remaining_uses_by_id,
     get_remaining_uses_by_user,
@@ -10,10 +15,15 @@ from app.crud.remaining_uses_crud import (
     update_remaining_uses,
     delete_remaining_uses,
     decrease_remaining_count,
-    increase_remaining_count
+    increase_remaining_count,
+    get_remaining_uses_by_user_async,
+    get_remaining_uses_by_service_async
 )
-from app.crud.user_crud import get_user_by_phone
+from app.crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
+from app.crud.user_crud import get_user_profile_by_phone, get_user_profile_by_phone_async
+from app.crud.customer_summary_crud import get_customer_version_async
 from app.models.remaininguses import RemainingUses
+from app.utils.http_cache import is_not_modified, make_etag, not_modified_response, set_validators
 
 router = APIRouter(
     prefix="/remaining-uses",
@@ -22,9 +32,19 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[RemainingUses])
-def get_all_remaining_uses():
-    """Tüm kalan kullanımları getir"""
-    return get_remaining_uses()
+def get_all_remaining_uses(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Kalan kullanımları sayfalı getir (sonraki sayfa cursor'ı X-Next-Cursor header'ında döner)"""
+    try:
+        page = get_remaining_uses_page(limit, cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
 
 @router.get("/{remaining_uses_id}", response_model=RemainingUses)
 def get_remaining_use(remaining_uses_id: int):
@@ -40,15 +60,24 @@ def get_user_remaining_uses(user_id: int):
     return get_remaining_uses_by_user(user_id)
 
 @router.get("/phone/{phone_number}", response_model=List[RemainingUses])
-def get_user_remaining_uses_by_phone(phone_number: str):
-    """Telefon numarasına göre kullanıcının kalan kullanımlarını getir"""
+async def get_user_remaining_uses_by_phone(phone_number: str, request: Request, response: Response, session: AsyncSession = Depends(get_async_session)):
+    """Telefon numarasına göre kullanıcının kalan kullanımlarını getir (If-None-Match ile 304 döner)"""
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = await get_user_profile_by_phone_async(session, phone_number)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
+
+    # Müşteri değişmediyse kalan kullanımlar okunmadan 304 dön
+    version = await get_customer_version_async(session, user.id)
+    etag = make_etag(user.id, "remaining-uses", version)
+    if version is not None and is_not_modified(request, etag, version):
+        return not_modified_response(etag, version)
+
     # Kullanıcının kalan kullanımlarını getir
-    return get_remaining_uses_by_user(user.id)
+    remaining_uses = await get_remaining_uses_by_user_async(session, user.id)
+    if version is not None:
+        set_validators(response, etag, version)
+    return remaining_uses
 
 @router.get("/user/{user_id}/service/{service_type}", response_model=RemainingUses)
 def get_user_service_remaining_uses(user_id: int, service_type: str):
@@ -59,15 +88,15 @@ def get_user_service_remaining_uses(user_id: int, service_type: str):
     return remaining_use
 
 @router.get("/phone/{phone_number}/service/{service_type}", response_model=RemainingUses)
-def get_user_service_remaining_uses_by_phone(phone_number: str, service_type: str):
+async def get_user_service_remaining_uses_by_phone(phone_number: str, service_type: str, session: AsyncSession = Depends(get_async_session)):
     """Telefon numarasına göre kullanıcının belirli hizmet için kalan kullanımını getir"""
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = await get_user_profile_by_phone_async(session, phone_number)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Kullanıcının belirli hizmet için kalan kullanımını getir
-    remaining_use = get_remaining_uses_by_service(user.id, service_type)
+    remaining_use = await get_remaining_uses_by_service_async(session, user.id, service_type)
     if not remaining_use:
         raise HTTPException(status_code=404, detail="No remaining uses found for this service")
     return remaining_use
@@ -102,14 +131,14 @@ def decrease_user_remaining_count(user_id: int, service_type: str, count: int =
     return {"message": f"Decreased {count} from remaining uses", "remaining_count": remaining_uses.remaining_count}
 
 @router.put("/phone/{phone_number}/service/{service_type}/decrease")
-def decrease_user_remaining_count_by_phone(phone_number: str, service_type: str, count: int = 1):
+def decrease_user_remaining_count_by_phone(phone_number: str, service_type: str, count: int = 1, session: Session = Depends(get_session)):
     """Telefon numarasına göre kullanıcının kalan kullanım sayısını azalt"""
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = get_user_profile_by_phone(phone_number, session=session)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    remaining_uses = decrease_remaining_count(user.id, service_type, count)
+    remaining_uses = decrease_remaining_count(user.id, service_type, count, session=session)
     if not remaining_uses:
         raise HTTPException(status_code=404, detail="Insufficient remaining uses or service not found")
     return {"message": f"Decreased {count} from remaining uses", "remaining_count": remaining_uses.remaining_count}
@@ -123,14 +152,14 @@ def increase_user_remaining_count(user_id: int, service_type: str, count: int):
     return {"message": f"Added {count} to remaining uses", "remaining_count": remaining_uses.remaining_count}
 
 @router.put("/phone/{phone_number}/service/{service_type}/increase")
-def increase_user_remaining_count_by_phone(phone_number: str, service_type: str, count: int):
+def increase_user_remaining_count_by_phone(phone_number: str, service_type: str, count: int, session: Session = Depends(get_session)):
     """Telefon numarasına göre kullanıcının kalan kullanım sayısını artır"""
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = get_user_profile_by_phone(phone_number, session=session)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    remaining_uses = increase_remaining_count(user.id, service_type, count)
+    remaining_uses = increase_remaining_count(user.id, service_type, count, session=session)
     if not remaining_uses:
         raise HTTPException(status_code=404, detail="Service not found for user")
     return {"message": f"Added {count} to remaining uses", "remaining_count": remaining_uses.remaining_count}
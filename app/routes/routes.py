@@ -12,6 +12,8 @@ from .package_change_request_routes import router as package_request_router
 from .dashboard_routes import router as dashboard_router
 from .customer_service_routes import router as customer_service_router
 from .log_routes import router as log_router
+from .db_routes import router as db_router
+from .billing_routes import router as billing_router
 
 router = APIRouter()
 
@@ -29,4 +31,6 @@ api_router.include_router(package_request_router)
 api_router.include_router(dashboard_router)
 api_router.include_router(customer_service_router)
 api_router.include_router(log_router)  # Log monitoring endpoint'leri
+api_router.include_router(db_router)  # Veritabanı havuz metrikleri
+api_router.include_router(billing_router)  # Toplu fatura kesim çalışmaları
 
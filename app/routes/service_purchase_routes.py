@@ -1,7 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import List, Optional
 from datetime import datetime
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import get_session
+from app.db.async_database import get_async_session
 from app.crud.service_purchase_crud import (
+    iter_service_purchases_for_export,
+    get_service_purchases_page,
     get_service_purchases,
     get_service_purchase_by_id,
     get_service_purchases_by_user,
@@ -11,10 +17,16 @@ from app.crud.service_purchase_crud import (
     update_service_purchase,
     delete_service_purchase,
     get_service_purchases_by_date_range,
-    get_total_spent_by_user
+    get_service_purchases_by_user_and_date_range,
+    get_total_spent_by_user,
+    get_service_purchases_by_user_async,
+    get_service_purchases_by_user_and_type_async
 )
-from app.crud.user_crud import get_user_by_phone
+from app.crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
+from app.crud.user_crud import get_user_profile_by_phone, get_user_profile_by_phone_async
 from app.models.servicepurchase import ServicePurchase
+from app.utils.export import ExportFormat, export_response
+from app.utils.json_response import fast_json_enabled, rows_response
 
 router = APIRouter(
     prefix="/service-purchases",
@@ -23,9 +35,31 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[ServicePurchase])
-def get_all_service_purchases():
-    """Tüm hizmet satın alımlarını getir"""
-    return get_service_purchases()
+def get_all_service_purchases(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Hizmet satın alımlarını sayfalı getir (sonraki sayfa cursor'ı X-Next-Cursor header'ında döner)"""
+    try:
+        page = get_service_purchases_page(limit, cursor, as_rows=fast_json_enabled())
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if fast_json_enabled():
+        return rows_response(page.items, response)
+    return page.items
+
+@router.get("/export")
+def export_service_purchases(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    format: ExportFormat = "ndjson",
+):
+    """Hizmet satın alımlarını tarih aralığına göre NDJSON veya CSV olarak akıtarak dışa aktar"""
+    rows = iter_service_purchases_for_export(start_date, end_date)
+    return export_response(rows, ServicePurchase.__table__.columns.keys(), format, "service_purchases")
 
 @router.get("/{purchase_id}", response_model=ServicePurchase)
 def get_service_purchase(purchase_id: int):
@@ -41,15 +75,15 @@ def get_user_service_purchases(user_id: int):
     return get_service_purchases_by_user(user_id)
 
 @router.get("/phone/{phone_number}", response_model=List[ServicePurchase])
-def get_user_service_purchases_by_phone(phone_number: str):
+async def get_user_service_purchases_by_phone(phone_number: str, session: AsyncSession = Depends(get_async_session)):
     """Telefon numarasına göre kullanıcının hizmet satın alımlarını getir"""
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = await get_user_profile_by_phone_async(session, phone_number)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Kullanıcının hizmet satın alımlarını getir
-    return get_service_purchases_by_user(user.id)
+    return await get_service_purchases_by_user_async(session, user.id)
 
 @router.get("/type/{service_type}", response_model=List[ServicePurchase])
 def get_purchases_by_service_type(service_type: str):
@@ -62,15 +96,15 @@ def get_user_purchases_by_service_type(user_id: int, service_type: str):
     return get_service_purchases_by_user_and_type(user_id, service_type)
 
 @router.get("/phone/{phone_number}/type/{service_type}", response_model=List[ServicePurchase])
-def get_user_purchases_by_service_type_by_phone(phone_number: str, service_type: str):
+async def get_user_purchases_by_service_type_by_phone(phone_number: str, service_type: str, session: AsyncSession = Depends(get_async_session)):
     """Telefon numarasına göre kullanıcı ve hizmet tipine göre satın alımları getir"""
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = await get_user_profile_by_phone_async(session, phone_number)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Kullanıcının belirli hizmet tipi için satın alımlarını getir
-    return get_service_purchases_by_user_and_type(user.id, service_type)
+    return await get_service_purchases_by_user_and_type_async(session, user.id, service_type)
 
 @router.post("/", response_model=ServicePurchase)
 def create_new_service_purchase(service_purchase: ServicePurchase):
@@ -116,13 +150,13 @@ def get_purchases_by_month(year: int, month: int):
     return get_service_purchases_by_date_range(start_date, end_date)
 
 @router.get("/phone/{phone_number}/month/{year}/{month}", response_model=List[ServicePurchase])
-def get_user_purchases_by_month_by_phone(phone_number: str, year: int, month: int):
+def get_user_purchases_by_month_by_phone(phone_number: str, year: int, month: int, session: Session = Depends(get_session)):
     """Telefon numarasına göre kullanıcının belirli bir aydaki hizmet satın alımlarını getir"""
     if month < 1 or month > 12:
         raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
     
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = get_user_profile_by_phone(phone_number, session=session)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -135,13 +169,8 @@ def get_user_purchases_by_month_by_phone(phone_number: str, year: int, month: in
     else:
         end_date = datetime(year, month + 1, 1)
     
-    # Kullanıcının o aydaki tüm satın alımlarını getir
-    all_purchases = get_service_purchases_by_date_range(start_date, end_date)
-    
-    # Sadece bu kullanıcının satın alımlarını filtrele
-    user_purchases = [purchase for purchase in all_purchases if purchase.user_id == user.id]
-    
-    return user_purchases
+    # Kullanıcının o aydaki satın alımlarını getir
+    return get_service_purchases_by_user_and_date_range(user.id, start_date, end_date, session=session)
 
 @router.get("/user/{user_id}/total-spent")
 def get_user_total_spent(user_id: int):
@@ -150,13 +179,13 @@ def get_user_total_spent(user_id: int):
     return {"user_id": user_id, "total_spent": total_spent}
 
 @router.get("/phone/{phone_number}/total-spent")
-def get_user_total_spent_by_phone(phone_number: str):
+def get_user_total_spent_by_phone(phone_number: str, session: Session = Depends(get_session)):
     """Telefon numarasına göre kullanıcının toplam harcamasını getir"""
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = get_user_profile_by_phone(phone_number, session=session)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Kullanıcının toplam harcamasını getir
-    total_spent = get_total_spent_by_user(user.id)
+    total_spent = get_total_spent_by_user(user.id, session=session)
     return {"user_id": user.id, "phone_number": phone_number, "total_spent": total_spent}
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from typing import List
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import get_session
+from app.db.async_database import get_async_session
 from app.crud.subscription_crud import (
     get_commitment_time,
     create_subscription,
     deactivate_subscription,
     get_user_active_subscription,
-    get_user_active_subscription_by_phone
+    get_user_active_subscription_by_phone_async
 )
 from app.crud.package_change_request_crud import (
     create_package_change_request,
@@ -28,19 +32,19 @@ def create_sub(req: PackageChangeRequest):
     return create_package_change_request(req)
 
 @router.post("/approve")
-def approve_package_change_req(package_change_request_id: int):
+def approve_package_change_req(package_change_request_id: int, session: Session = Depends(get_session)):
     """Kullanıcı paket talebi onaylanır"""
     try:
         # Önce paket değişiklik talebini onayla
-        approve_package_change_request(package_change_request_id)
+        approve_package_change_request(package_change_request_id, session=session)
         
         # Paket değişiklik talebini getir
-        package_change_request = get_package_change_request_by_id(package_change_request_id)
+        package_change_request = get_package_change_request_by_id(package_change_request_id, session=session)
         
         if package_change_request:
             print(f"Package change request found: {package_change_request}")
             # PackageChangeRequest objesini create_subscription'a geçir
-            subscription = create_subscription(package_change_request)
+            subscription = create_subscription(package_change_request, session=session)
             print(f"Subscription created: {subscription.id}")
             return {"message": "Package change approved and subscription created", "subscription_id": subscription.id}
         else:
@@ -70,9 +74,9 @@ def get_users_commitment_time(phone_number: str):
         raise HTTPException(status_code=404, detail="No active subscription found for user")
 
 @router.get("/{phone_number}/activesub")
-def get_user_active_sub(phone_number: str):
+async def get_user_active_sub(phone_number: str, session: AsyncSession = Depends(get_async_session)):
     """Kullanıcının aktif aboneliğini döner"""
-    subscription = get_user_active_subscription_by_phone(phone_number)
+    subscription = await get_user_active_subscription_by_phone_async(session, phone_number)
     if subscription:
         return subscription
     else:
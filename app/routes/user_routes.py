@@ -1,16 +1,23 @@
-from fastapi import APIRouter, HTTPException, Request
-from typing import List
+from fastapi import APIRouter, HTTPException, Request, Depends, Query, Response
+from typing import List, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.async_database import get_async_session
 from app.crud.user_crud import (
-    get_users as get_all_users,
+    get_users_page,
     get_user_by_id,
-    get_user_by_phone,
+    get_user_by_phone_async,
+    get_user_profile_by_phone_async,
     create_user,
     update_user,
     delete_user,
 )
-from app.crud.subscription_crud import get_user_active_subscription
+from app.crud.subscription_crud import get_user_active_subscription_async
+from app.crud.customer_cache import customer_key, get_cached_async, set_cached_async
+from app.crud.customer_summary_crud import get_customer_version_async
+from app.crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
 from app.models.user import User
 from app.models.package import Package
+from app.utils.http_cache import is_not_modified, make_etag, not_modified_response, set_validators
 from app.utils.logging_config import get_logger, log_business_operation, log_error
 
 logger = get_logger('app.routes.user')
@@ -22,14 +29,23 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[User])
-def get_users(request: Request):
-    """Tüm kullanıcıları getir"""
+def get_users(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Kullanıcıları sayfalı getir (sonraki sayfa cursor'ı X-Next-Cursor header'ında döner)"""
     try:
         client_ip = request.client.host if request.client else "unknown"
-        logger.info(f"Fetching all users - IP: {client_ip}")
-        result = get_all_users()
-        log_business_operation("GET_ALL_USERS", f"Retrieved {len(result)} users")
-        return result
+        logger.info(f"Fetching users page (limit={limit}) - IP: {client_ip}")
+        page = get_users_page(limit, cursor)
+        if page.next_cursor:
+            response.headers["X-Next-Cursor"] = page.next_cursor
+        log_business_operation("GET_ALL_USERS", f"Retrieved {len(page.items)} users")
+        return page.items
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     except Exception as e:
         log_error(e, "Error fetching all users")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -53,36 +69,54 @@ def get_user(user_id: int, request: Request):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/phone/{phone_number}", response_model=User)
-def get_user_by_phone_number(phone_number: str):
+async def get_user_by_phone_number(phone_number: str, session: AsyncSession = Depends(get_async_session)):
     """Telefon numarasına göre kullanıcı getir"""
-    user = get_user_by_phone(phone_number)
+    user = await get_user_by_phone_async(session, phone_number)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 @router.get("/{user_id}/package", response_model=Package)
-def get_user_package(user_id: int):
+async def get_user_package(user_id: int, session: AsyncSession = Depends(get_async_session)):
     """Kullanıcının mevcut paketini getir"""
-    subscription = get_user_active_subscription(user_id)
-    if subscription and subscription.package:
-        return subscription.package
-    else:
+    package = await _get_active_package_cached(session, user_id)
+    if package is None:
         raise HTTPException(status_code=404, detail="No active package found")
+    return package
 
 @router.get("/phone/{phone_number}/package", response_model=Package)
-def get_user_package_by_phone(phone_number: str):
-    """Telefon numarasına göre kullanıcının mevcut paketini getir"""
+async def get_user_package_by_phone(phone_number: str, request: Request, response: Response, session: AsyncSession = Depends(get_async_session)):
+    """Telefon numarasına göre kullanıcının mevcut paketini getir (If-None-Match ile 304 döner)"""
     # Önce telefon numarasından kullanıcıyı bul
-    user = get_user_by_phone(phone_number)
+    user = await get_user_profile_by_phone_async(session, phone_number)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
+
+    # Müşteri değişmediyse paket okunmadan 304 dön
+    version = await get_customer_version_async(session, user.id)
+    etag = make_etag(user.id, "package", version)
+    if version is not None and is_not_modified(request, etag, version):
+        return not_modified_response(etag, version)
+
     # Kullanıcının aktif aboneliğini getir
-    subscription = get_user_active_subscription(user.id)
-    if subscription and subscription.package:
-        return subscription.package
-    else:
+    package = await _get_active_package_cached(session, user.id)
+    if package is None:
         raise HTTPException(status_code=404, detail="No active package found for this user")
+    if version is not None:
+        set_validators(response, etag, version)
+    return package
+
+async def _get_active_package_cached(session: AsyncSession, user_id: int) -> Optional[dict]:
+    """Aktif aboneliğin paketini paylaşılan önbellek üzerinden getir"""
+    cache_key = customer_key(user_id, "package")
+    package = await get_cached_async(cache_key)
+    if package is None:
+        subscription = await get_user_active_subscription_async(session, user_id)
+        if not subscription or not subscription.package:
+            return None
+        package = subscription.package.model_dump()
+        await set_cached_async(cache_key, package)
+    return package
 
 @router.post("/", response_model=User)
 def add_user(user: User):
@@ -0,0 +1,95 @@
+from typing import Iterable, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+
+# Para tutarları kuruş cinsinden tamsayı olarak hesaplanır; float yalnızca giriş ve çıkışta kullanılır
+CENTS = 100
+DEFAULT_TAX_RATE = 0.18  # %18 KDV
+# Vergi oranı on binde bir hassasiyetle tamsayıya çevrilir (0.18 -> 1800)
+TAX_RATE_SCALE = 10_000
+
+
+class Amounts(NamedTuple):
+    """Kuruş cinsinden net, vergi ve brüt tutar"""
+    net: int
+    tax: int
+    gross: int
+
+
+class BatchAmounts(NamedTuple):
+    """Kalem ve fatura bazında kuruş cinsinden tutar dizileri (int64)"""
+    item_net: np.ndarray
+    item_tax: np.ndarray
+    item_gross: np.ndarray
+    invoice_net: np.ndarray
+    invoice_tax: np.ndarray
+    invoice_gross: np.ndarray
+
+
+def to_cents(amount: float) -> int:
+    """TL tutarını en yakın kuruşa yuvarla"""
+    return int(round(amount * CENTS))
+
+
+def from_cents(cents: int) -> float:
+    return int(cents) / CENTS
+
+
+def _tax_cents(net: int, rate_units: int) -> int:
+    # Yarım kuruş yukarı yuvarlanır; toplu yol aynı tamsayı işlemini yapar
+    return (net * rate_units + TAX_RATE_SCALE // 2) // TAX_RATE_SCALE
+
+
+def line_amounts(
+    quantity: int, unit_price: float, tax_rate: Optional[float] = DEFAULT_TAX_RATE, net_price: Optional[float] = None
+) -> Amounts:
+    """Tek kalemin tutarları: net = adet x kuruş birim fiyat, vergi kalem bazında yuvarlanır
+
+    net_price verilirse (ör. hizmet alımının kayıtlı purchase_price'ı) net olarak o kullanılır;
+    kuruş altı birim fiyatlarda adet x yuvarlanmış birim fiyat kayıtlı tutardan sapabilir.
+    """
+    net = to_cents(net_price) if net_price is not None else int(quantity) * to_cents(unit_price)
+    tax = _tax_cents(net, int(round((tax_rate or 0) * TAX_RATE_SCALE)))
+    return Amounts(net, tax, net + tax)
+
+
+def invoice_amounts(lines: Iterable[Tuple[int, float, Optional[float]]]) -> Amounts:
+    """(adet, birim fiyat, vergi oranı) kalemlerinden faturanın tutarları; kalem vergilerinin toplamı kullanılır"""
+    net = tax = 0
+    for quantity, unit_price, tax_rate in lines:
+        amounts = line_amounts(quantity, unit_price, tax_rate)
+        net += amounts.net
+        tax += amounts.tax
+    return Amounts(net, tax, net + tax)
+
+
+def batch_amounts(
+    invoice_index: Sequence[int],
+    quantities: Sequence[int],
+    unit_prices: Sequence[float],
+    tax_rates: Sequence[float],
+    invoice_count: Optional[int] = None,
+    net_prices: Optional[Sequence[Optional[float]]] = None,
+) -> BatchAmounts:
+    """Binlerce faturanın kalemlerini kolon dizileriyle tek seferde hesapla
+
+    invoice_index[i], i. kalemin ait olduğu faturanın 0 tabanlı sırasıdır. net_prices[i]
+    None değilse i. kalemin neti odur (line_amounts'un net_price'ı). Yuvarlama
+    line_amounts / invoice_amounts ile birebir aynıdır; sonuçlar kuruşu kuruşuna eşleşir.
+    """
+    invoice_index = np.asarray(invoice_index, dtype=np.int64)
+    net = np.asarray(quantities, dtype=np.int64) * np.rint(np.asarray(unit_prices, dtype=np.float64) * CENTS).astype(np.int64)
+    if net_prices is not None:
+        # None -> NaN: kayıtlı tutarı olmayan kalemler adet x birim fiyatla kalır
+        stored = np.asarray(net_prices, dtype=np.float64)
+        has_stored = ~np.isnan(stored)
+        net[has_stored] = np.rint(stored[has_stored] * CENTS).astype(np.int64)
+    rate_units = np.rint(np.nan_to_num(np.asarray(tax_rates, dtype=np.float64)) * TAX_RATE_SCALE).astype(np.int64)
+    tax = (net * rate_units + TAX_RATE_SCALE // 2) // TAX_RATE_SCALE
+
+    if invoice_count is None:
+        invoice_count = int(invoice_index.max()) + 1 if invoice_index.size else 0
+    invoice_net = np.zeros(invoice_count, dtype=np.int64)
+    invoice_tax = np.zeros(invoice_count, dtype=np.int64)
+    np.add.at(invoice_net, invoice_index, net)
+    np.add.at(invoice_tax, invoice_index, tax)
+    return BatchAmounts(net, tax, net + tax, invoice_net, invoice_tax, invoice_net + invoice_tax)
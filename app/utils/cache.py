@@ -0,0 +1,204 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Hashable, Optional
+from app.db.config import get_settings
+from app.utils.logging_config import get_logger
+
+logger = get_logger('app.utils.cache')
+
+# Önbellekte hiç olmayan anahtar ile önbelleğe alınmış None (negatif sonuç) ayrımı için
+MISSING = object()
+
+
+class TTLCache:
+    """Boyutu sınırlı, süreli (TTL) ve LRU çıkarmalı process içi önbellek
+
+    None değerleri de saklanabilir (negatif önbellek); bunlar için ayrı, genelde daha
+    kısa bir süre verilebilir. get() anahtar yoksa veya süresi dolduysa MISSING döner.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            if value is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """İsabet/ıska sayaçları ve doluluk"""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "negative_ttl_seconds": self.negative_ttl,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class CacheBackend(ABC):
+    """Worker'lar arasında paylaşılabilen anahtar/değer önbellek arayüzü (değerler bytes)"""
+
+    # Ağ üzerinden çalışan backend'ler async kodda threadpool'a alınır
+    is_remote = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Anahtar yoksa, süresi dolduysa veya backend'e ulaşılamıyorsa None döner"""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Tek process için backend (geliştirme, testler ve tek worker'lı kurulumlar)"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self._cache.get(key)
+        return None if value is MISSING else value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    def delete(self, *keys: str) -> None:
+        self._cache.invalidate(*keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", **self._cache.stats()}
+
+
+class RedisCacheBackend(CacheBackend):
+    """Redis protokolü konuşan sunucular için backend (Redis, KeyDB, Valkey...)
+
+    Önbellek hataları isteği düşürmez: ulaşılamayan sunucu ıska gibi davranır.
+    Testlerde aynı arayüze sahip bir istemci (ör. fakeredis) client ile verilebilir.
+    """
+
+    is_remote = True
+
+    def __init__(self, url: Optional[str] = None, socket_timeout: float = 0.1, client: Any = None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+            client = redis.Redis.from_url(url, socket_timeout=socket_timeout, socket_connect_timeout=socket_timeout)
+        self._client = client
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _record(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            value = self._client.get(key)
+        except Exception as e:
+            self._record("errors")
+            logger.warning(f"Cache get failed for {key}: {e}")
+            return None
+        self._record("hits" if value is not None else "misses")
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        try:
+            self._client.set(key, value, px=max(1, int(ttl * 1000)))
+        except Exception as e:
+            self._record("errors")
+            logger.warning(f"Cache set failed for {key}: {e}")
+
+    def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        try:
+            self._client.delete(*keys)
+        except Exception as e:
+            self._record("errors")
+            logger.warning(f"Cache invalidation failed for {keys}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": "redis", "hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+@lru_cache()
+def get_cache_backend() -> CacheBackend:
+    """Ayarlara göre (CACHE_BACKEND) paylaşılan önbellek backend'ini oluştur"""
+    settings = get_settings()
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.CACHE_REDIS_URL, socket_timeout=settings.CACHE_SOCKET_TIMEOUT)
+    if settings.CACHE_BACKEND != "memory":
+        raise ValueError(f"Unknown CACHE_BACKEND: {settings.CACHE_BACKEND}")
+    return InMemoryCacheBackend(maxsize=settings.CACHE_MEMORY_SIZE, ttl=settings.CUSTOMER_CACHE_TTL)
@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Iterable, Iterator, Literal, Mapping, Sequence
+from fastapi.responses import StreamingResponse
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Küçük satırları tek tek göndermek yerine bu kadar satır birikince chunk yollanır
+ROWS_PER_CHUNK = 500
+
+
+def _to_json_value(value: Any) -> Any:
+    """JSON'a doğrudan yazılamayan değerleri serileştirilebilir hale getir"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def iter_ndjson(rows: Iterable[Mapping[str, Any]]) -> Iterator[bytes]:
+    """Satırları her satırda bir JSON nesnesi olacak şekilde (NDJSON) yaz"""
+    buffer = []
+    for row in rows:
+        buffer.append(json.dumps(dict(row), default=_to_json_value, ensure_ascii=False))
+        if len(buffer) >= ROWS_PER_CHUNK:
+            yield ("\n".join(buffer) + "\n").encode()
+            buffer.clear()
+    if buffer:
+        yield ("\n".join(buffer) + "\n").encode()
+
+
+def iter_csv(rows: Iterable[Mapping[str, Any]], columns: Sequence[str]) -> Iterator[bytes]:
+    """Satırları başlık satırıyla birlikte CSV olarak yaz"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    # Başlık ilk veri gelmeden gönderilir, böylece istemci ilk byte'ları hemen alır
+    yield output.getvalue().encode()
+    output.seek(0)
+    output.truncate()
+
+    pending = 0
+    for row in rows:
+        writer.writerow([_to_csv_value(row[column]) for column in columns])
+        pending += 1
+        if pending >= ROWS_PER_CHUNK:
+            yield output.getvalue().encode()
+            output.seek(0)
+            output.truncate()
+            pending = 0
+    if pending:
+        yield output.getvalue().encode()
+
+
+def _to_csv_value(value: Any) -> Any:
+    """CSV hücresi için değeri dönüştür"""
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def export_response(rows: Iterable[Mapping[str, Any]], columns: Sequence[str],
+                    export_format: ExportFormat, filename: str) -> StreamingResponse:
+    """Satır akışını istenen formatta indirilebilir bir StreamingResponse olarak döndür"""
+    if export_format == "csv":
+        body = iter_csv(rows, columns)
+    else:
+        body = iter_ndjson(rows)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'},
+    )
@@ -0,0 +1,38 @@
+from functools import lru_cache
+from typing import Iterable, Type
+from fastapi import Response
+from fastapi.responses import JSONResponse, ORJSONResponse
+from app.db.config import get_settings
+from app.utils.logging_config import get_logger
+
+logger = get_logger('app.utils.json_response')
+
+
+@lru_cache()
+def fast_json_enabled() -> bool:
+    """FAST_JSON açık ve orjson kurulu mu"""
+    if not get_settings().FAST_JSON:
+        return False
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        logger.warning("FAST_JSON is enabled but 'orjson' is not installed, falling back to stdlib json")
+        return False
+    return True
+
+
+def default_response_class() -> Type[JSONResponse]:
+    return ORJSONResponse if fast_json_enabled() else JSONResponse
+
+
+def rows_response(rows: Iterable, response: Response) -> Response:
+    """Kolon satırlarını response_model doğrulaması olmadan doğrudan JSON'a çevir
+
+    Satırlar tablo kolonlarını birebir seçtiği için çıktı, aynı modelin response_model ile
+    serileştirilmiş haliyle aynıdır. Endpoint'in response'una eklenen header'lar korunur.
+    """
+    fast = default_response_class()([dict(row._mapping) for row in rows])
+    for name, value in response.headers.items():
+        if name not in ("content-length", "content-type"):
+            fast.headers[name] = value
+    return fast
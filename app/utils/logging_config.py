@@ -3,6 +3,7 @@ import logging.config
 import os
 from datetime import datetime
 from pathlib import Path
+from app.db.config import get_settings
 
 
 # Log dizinini oluştur
@@ -84,6 +85,11 @@ LOGGING_CONFIG = {
             'level': 'INFO',
             'propagate': False
         },
+        'sqlalchemy.engine': {  # SQL sorguları (seviye SQL_LOG_LEVEL ile ayarlanır)
+            'handlers': ['file_handler', 'error_handler'],
+            'level': get_settings().SQL_LOG_LEVEL,
+            'propagate': False
+        },
         'uvicorn.error': {
             'handlers': ['console', 'file_handler'],
             'level': 'INFO',
@@ -0,0 +1,71 @@
+"""Telefonla müşteri sorgusu: thread havuzundaki sync yol ile async yolun karşılaştırması
+
+Aynı anda gelen N sorgu, FastAPI'nin sync endpoint'lere yaptığı gibi anyio thread havuzunda
+(varsayılan 40 thread) get_user_by_phone ile ve event loop üzerinde get_user_by_phone_async
+ile çalıştırılır. Toplam süre, saniyedeki sorgu ve gecikme yüzdelikleri raporlanır.
+
+    python -m bench.async_vs_sync [--users 2000] [--concurrency 50 200 1000]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from bench.common import phone_number, prepare_database, print_table, seed_customers, setup_environment
+
+setup_environment("async-vs-sync")
+
+import anyio.to_thread  # noqa: E402
+from app.crud.user_crud import get_user_by_phone, get_user_by_phone_async  # noqa: E402
+from app.db.async_database import async_session_factory, dispose_async_engine  # noqa: E402
+
+
+async def _timed(coroutine_factory):
+    start = time.perf_counter()
+    await coroutine_factory()
+    return (time.perf_counter() - start) * 1000
+
+
+async def run_sync(phones):
+    return await asyncio.gather(*(_timed(lambda phone=phone: anyio.to_thread.run_sync(get_user_by_phone, phone)) for phone in phones))
+
+
+async def run_async(phones):
+    async def lookup(phone):
+        async with async_session_factory() as session:
+            return await get_user_by_phone_async(session, phone)
+    return await asyncio.gather(*(_timed(lambda phone=phone: lookup(phone)) for phone in phones))
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def main(user_count: int, concurrency_levels, rounds: int):
+    prepare_database()
+    user_ids = seed_customers(user_count)
+    rows = []
+    for concurrency in concurrency_levels:
+        for name, runner in (("sync+threadpool", run_sync), ("async", run_async)):
+            await runner([phone_number(user_id) for user_id in user_ids[:10]])  # ısınma
+            walls, latencies = [], []
+            for _ in range(rounds):
+                phones = [phone_number(random.choice(user_ids)) for _ in range(concurrency)]
+                start = time.perf_counter()
+                latencies.extend(await runner(phones))
+                walls.append(time.perf_counter() - start)
+            wall = statistics.median(walls)
+            rows.append([name, concurrency, wall * 1000, concurrency / wall, _percentile(latencies, 0.5), _percentile(latencies, 0.99)])
+    await dispose_async_engine()
+    print_table("Eşzamanlı telefon sorguları", ["yol", "eşzamanlı", "toplam_ms", "sorgu/sn", "p50_ms", "p99_ms"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.concurrency, args.rounds))
@@ -0,0 +1,71 @@
+"""IVR ön yükleme: N müşterinin görünümünü toplu sorguyla ve tek tek getirmenin maliyeti
+
+Her N için POST /customer-service/customers/batch'in kullandığı
+get_customer_snapshots_by_phone_async ile aynı fonksiyonun N kez tek numarayla çağrılması
+karşılaştırılır; süre ve çalışan SQL sorgusu sayısı raporlanır. Toplu yolda sorgu
+sayısı N'den bağımsız kalmalı, süre satır sayısıyla doğrusal artmalıdır.
+
+    python -m bench.batch_lookup [--users 5000] [--sizes 1 10 50 100 200]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from bench.common import phone_number, prepare_database, print_table, seed_customers, setup_environment
+
+setup_environment("batch-lookup")
+
+from sqlalchemy import event  # noqa: E402
+from app.crud.customer_crud import get_customer_snapshots_by_phone_async  # noqa: E402
+from app.db.async_database import async_engine, async_session_factory, dispose_async_engine  # noqa: E402
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+async def batch(phones):
+    async with async_session_factory() as session:
+        return await get_customer_snapshots_by_phone_async(session, phones)
+
+
+async def one_by_one(phones):
+    async with async_session_factory() as session:
+        return [await get_customer_snapshots_by_phone_async(session, [phone]) for phone in phones]
+
+
+async def main(user_count: int, sizes, rounds: int):
+    prepare_database()
+    user_ids = seed_customers(user_count, invoices_per_user=6)
+    counter = StatementCounter(async_engine.sync_engine)
+    rows = []
+    for size in sizes:
+        for name, runner in (("batch", batch), ("tek tek", one_by_one)):
+            timings, statements = [], []
+            for _ in range(rounds):
+                phones = [phone_number(user_id) for user_id in random.sample(user_ids, size)]
+                before = counter.count
+                start = time.perf_counter()
+                await runner(phones)
+                timings.append((time.perf_counter() - start) * 1000)
+                statements.append(counter.count - before)
+            wall = statistics.median(timings)
+            rows.append([name, size, max(statements), wall, wall / size])
+    await dispose_async_engine()
+    print_table("Müşteri görünümü ön yükleme", ["yol", "N", "sorgu", "toplam_ms", "müşteri_başı_ms"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.sizes, args.rounds))
@@ -0,0 +1,78 @@
+"""Fatura tutarı hesabı: float döngü, fatura başına kuruş hesabı ve numpy toplu hesap
+
+Her fatura sayısı için aynı kalemler üç yolla hesaplanır: eski float toplama
+(adet x birim fiyat, sonra round), invoice_amounts ile fatura fatura kuruş hesabı ve
+toplu kesimin kullandığı batch_amounts. Süreler ve kuruşluk sapma yapan fatura sayısı
+raporlanır; kuruş yolları birbirinin aynısı olmalıdır.
+
+    python -m bench.billing_calculator [--invoices 1000 10000 100000] [--items 6]
+"""
+import argparse
+import random
+
+from bench.common import measure, print_table
+from app.utils.billing_calculator import DEFAULT_TAX_RATE, batch_amounts, line_amounts, to_cents
+
+
+def make_invoices(invoice_count: int, items_per_invoice: int):
+    """Paket ücreti + hizmet alımları; birim fiyatların bir kısmı kuruş altı (1.255 gibi)"""
+    random.seed(invoice_count)
+    invoices = []
+    for _ in range(invoice_count):
+        lines = [(1, random.choice([99.9, 149.9, 249.9]), DEFAULT_TAX_RATE, None)]
+        for _ in range(items_per_invoice - 1):
+            count, unit_price = random.randint(1, 5), random.choice([1.255, 2.5, 0.125, 9.99, 4.345])
+            lines.append((count, unit_price, DEFAULT_TAX_RATE, round(count * unit_price, 2)))
+        invoices.append(lines)
+    return invoices
+
+
+def float_loop(invoices):
+    # Eski yol: float çarpım ve toplam, sonda yuvarlama; vergi fatura toplamından
+    totals = []
+    for lines in invoices:
+        net = sum(count * unit_price for count, unit_price, _, _ in lines)
+        totals.append(round(net + net * DEFAULT_TAX_RATE, 2))
+    return totals
+
+
+def per_invoice_cents(invoices):
+    # Fatura fatura, kalem kalem tamsayı kuruş hesabı (create_invoice'ın yolu)
+    return [sum(line_amounts(count, unit_price, tax_rate, net_price=net_price).gross
+                for count, unit_price, tax_rate, net_price in lines)
+            for lines in invoices]
+
+
+def numpy_batch(invoices):
+    index, counts, unit_prices, tax_rates, net_prices = [], [], [], [], []
+    for position, lines in enumerate(invoices):
+        for count, unit_price, tax_rate, net_price in lines:
+            index.append(position)
+            counts.append(count)
+            unit_prices.append(unit_price)
+            tax_rates.append(tax_rate)
+            net_prices.append(net_price)
+    amounts = batch_amounts(index, counts, unit_prices, tax_rates, invoice_count=len(invoices), net_prices=net_prices)
+    return amounts.invoice_gross.tolist()
+
+
+def main(sizes, items_per_invoice: int, repeat: int):
+    rows = []
+    for size in sizes:
+        invoices = make_invoices(size, items_per_invoice)
+        cents = per_invoice_cents(invoices)
+        assert numpy_batch(invoices) == cents
+        drift = sum(1 for total, exact in zip(float_loop(invoices), cents) if to_cents(total) != exact)
+        for name, runner in (("float döngü", float_loop), ("fatura başına kuruş", per_invoice_cents), ("numpy toplu", numpy_batch)):
+            timing = measure(lambda: runner(invoices), repeat)
+            rows.append([name, size, timing["wall_ms"], timing["wall_ms"] * 1000 / size, drift if name == "float döngü" else 0])
+    print_table("Fatura tutarı hesabı", ["yol", "fatura", "toplam_ms", "fatura_başı_us", "sapan_fatura"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--invoices", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--items", type=int, default=6, help="Fatura başına kalem sayısı (paket ücreti dahil)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.invoices, args.items, args.repeat)
@@ -0,0 +1,135 @@
+"""Benchmark script'leri için ortak kurulum ve veri üretimi
+
+Script'ler depo kökünden `python -m bench.<ad>` ile çalıştırılır. DATABASE_URL verilmemişse
+geçici bir SQLite veritabanı kullanılır; üretime yakın sonuçlar için DATABASE_URL /
+ASYNC_DATABASE_URL ile boş bir Postgres veritabanı gösterin. setup_environment() app
+modülleri import edilmeden önce çağrılmalıdır.
+"""
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Sequence
+
+
+def setup_environment(name: str) -> str:
+    """Ortam değişkenlerini ayarla; kullanılacak veritabanı adresini döndür"""
+    if not os.environ.get("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(prefix=f"bench-{name}-"), "bench.sqlite")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+        os.environ.setdefault("REPLICA_DATABASE_URLS", "")
+    for key, value in {
+        "POSTGRES_USER": "bench",
+        "POSTGRES_PASSWORD": "bench",
+        "POSTGRES_SERVER": "localhost",
+        "POSTGRES_PORT": "5432",
+        "POSTGRES_DB": "bench",
+        "CACHE_BACKEND": "memory",
+    }.items():
+        os.environ.setdefault(key, value)
+    return os.environ["DATABASE_URL"]
+
+
+def prepare_database() -> None:
+    """Migration'ları çalıştır; ölçümü etkilememesi için uyarı altı logları kapat"""
+    import logging
+    from app.db.database import init_db
+    init_db()
+    logging.disable(logging.WARNING)
+
+
+def measure(fn: Callable[[], object], repeat: int = 5) -> Dict[str, float]:
+    """fn'i repeat kez çalıştır; duvar saati ve CPU süresinin medyanını ms olarak döndür"""
+    wall, cpu = [], []
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        fn()
+        wall.append((time.perf_counter() - wall_start) * 1000)
+        cpu.append((time.process_time() - cpu_start) * 1000)
+    return {"wall_ms": statistics.median(wall), "cpu_ms": statistics.median(cpu)}
+
+
+def print_table(title: str, headers: Sequence[str], rows: List[Sequence[object]]) -> None:
+    print(f"\n{title}")
+    cells = [[str(header) for header in headers]] + [[f"{value:.2f}" if isinstance(value, float) else str(value) for value in row] for row in rows]
+    widths = [max(len(row[index]) for row in cells) for index in range(len(headers))]
+    for position, row in enumerate(cells):
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+        if position == 0:
+            print("  ".join("-" * width for width in widths))
+
+
+def seed_customers(
+    user_count: int,
+    invoices_per_user: int = 0,
+    purchases_per_user: int = 0,
+    logs_per_user: int = 0,
+    start: datetime = datetime(2024, 1, 1),
+    batch_size: int = 5000,
+) -> List[int]:
+    """Core toplu insert'lerle aktif aboneli müşteriler ve isteğe bağlı fatura/satın alma/log üret
+
+    Faturalar aylık dönemlere, satın almalar ve loglar `start`tan itibaren günlere yayılır.
+    Özet tablosu en sonda tek seferde yeniden hesaplanır. Üretilen kullanıcı id'lerini döndürür.
+    """
+    from sqlalchemy import func, insert, select
+    from app.crud.customer_summary_crud import refresh_all_customer_summaries
+    from app.db.database import engine
+    from app.models.agentintentlog import AgentIntentLog
+    from app.models.invoice import Invoice
+    from app.models.package import Package
+    from app.models.servicepurchase import ServicePurchase
+    from app.models.subscription import Subscription
+    from app.models.user import User
+
+    def insert_rows(connection, table, rows):
+        for offset in range(0, len(rows), batch_size):
+            connection.execute(insert(table), rows[offset:offset + batch_size])
+
+    with engine.begin() as connection:
+        package_id = connection.execute(
+            insert(Package.__table__).returning(Package.__table__.c.id),
+            {"name": "Bench", "type": "mobile", "details": {}, "commitment": "yok", "monthly_fee": 100.0, "is_active": True},
+        ).scalar_one()
+        first_id = (connection.execute(select(func.max(User.__table__.c.id))).scalar() or 0) + 1
+        user_ids = list(range(first_id, first_id + user_count))
+        insert_rows(connection, User.__table__, [
+            {"id": user_id, "name": "Bench", "surname": f"User{user_id}", "phone_number": f"5{user_id:09d}", "is_active": True, "created_at": start}
+            for user_id in user_ids
+        ])
+        insert_rows(connection, Subscription.__table__, [
+            {"user_id": user_id, "package_id": package_id, "start_date": start, "is_active": True, "created_at": start}
+            for user_id in user_ids
+        ])
+
+        invoices, purchases, logs = [], [], []
+        for user_id in user_ids:
+            for month in range(invoices_per_user):
+                period_start = datetime(start.year + (start.month - 1 + month) // 12, (start.month - 1 + month) % 12 + 1, 1)
+                invoices.append({
+                    "user_id": user_id, "invoice_number": f"BENCH-{user_id}-{month}",
+                    "billing_period_start": period_start, "billing_period_end": period_start + timedelta(days=27),
+                    "total_amount": 118.0, "status": "paid" if month % 3 else "pending",
+                    "due_date": period_start + timedelta(days=45), "created_at": period_start + timedelta(days=28),
+                })
+            for number in range(purchases_per_user):
+                purchases.append({
+                    "user_id": user_id, "service_type": "SMS", "count": 2, "unit_price": 1.255, "purchase_price": 2.51,
+                    "purchase_date": start + timedelta(days=number % 365, minutes=user_id % 1440), "is_used": False,
+                })
+            for number in range(logs_per_user):
+                logs.append({
+                    "user_id": user_id, "intent": "fatura_sorgulama", "message": "Son faturamı öğrenmek istiyorum",
+                    "confidence": 0.9, "created_at": start + timedelta(days=number % 365, seconds=user_id),
+                })
+        insert_rows(connection, Invoice.__table__, invoices)
+        insert_rows(connection, ServicePurchase.__table__, purchases)
+        insert_rows(connection, AgentIntentLog.__table__, logs)
+        refresh_all_customer_summaries(connection)
+    return user_ids
+
+
+def phone_number(user_id: int) -> str:
+    return f"5{user_id:09d}"
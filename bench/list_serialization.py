@@ -0,0 +1,68 @@
+"""Liste endpoint'lerinin serileştirme maliyeti: response_model yolu ile orjson satır yolu
+
+/invoices/, /agent-logs/ ve /service-purchases/ üzerinde ~10k satır, sayfa sayfa
+(X-Next-Cursor) TestClient ile okunur. Her yol için tüm sayfaların CPU süresi (istemci
+tarafı JSON çözme dahil), gövde boyutu ve gzip ile aktarılan bayt raporlanır.
+
+    python -m bench.list_serialization [--rows 10000] [--page-size 500]
+"""
+import argparse
+import time
+
+from bench.common import prepare_database, print_table, seed_customers, setup_environment
+
+setup_environment("list-serialization")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.db.config import get_settings  # noqa: E402
+from app.utils.json_response import fast_json_enabled  # noqa: E402
+
+ENDPOINTS = ["/api/v1/invoices/", "/api/v1/agent-logs/", "/api/v1/service-purchases/"]
+
+
+def set_fast_json(enabled: bool) -> None:
+    get_settings().FAST_JSON = enabled
+    fast_json_enabled.cache_clear()
+
+
+def read_all_pages(client: TestClient, path: str, page_size: int, encoding: str):
+    """Tüm sayfaları oku; (satır sayısı, gövde baytı, aktarılan bayt, CPU saniyesi) döndür"""
+    rows = body_bytes = wire_bytes = 0
+    cursor = None
+    start = time.process_time()
+    while True:
+        params = {"limit": page_size, **({"cursor": cursor} if cursor else {})}
+        response = client.get(path, params=params, headers={"Accept-Encoding": encoding})
+        response.raise_for_status()
+        rows += len(response.json())
+        body_bytes += len(response.content)
+        wire_bytes += response.num_bytes_downloaded
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return rows, body_bytes, wire_bytes, time.process_time() - start
+
+
+def main(row_count: int, page_size: int):
+    prepare_database()
+    # Her müşteriye 10 fatura, 10 satın alma ve 10 log düşer
+    seed_customers(row_count // 10, invoices_per_user=10, purchases_per_user=10, logs_per_user=10)
+    import main as app_module
+
+    results = []
+    with TestClient(app_module.app) as client:
+        for path in ENDPOINTS:
+            for name, fast in (("response_model", False), ("orjson", True)):
+                set_fast_json(fast)
+                read_all_pages(client, path, page_size, "identity")  # ısınma
+                rows, body_bytes, _, cpu = read_all_pages(client, path, page_size, "identity")
+                _, _, gzip_bytes, _ = read_all_pages(client, path, page_size, "gzip")
+                results.append([path, name, rows, cpu * 1000, body_bytes, gzip_bytes])
+    print_table("Liste endpoint'leri", ["endpoint", "yol", "satır", "cpu_ms", "bayt", "gzip_bayt"], results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+    main(args.rows, args.page_size)
@@ -0,0 +1,53 @@
+"""Kullanıcının aylık faturaları / hizmet alımları: ayın tüm satırlarını süzmek ve kullanıcıya göre sorgulamak
+
+Her aylık hacim (o ay fatura kesilen kullanıcı sayısı) ayrı bir aya yazılır. Eski yol
+ayın tüm satırlarını getirip Python'da kullanıcıya göre süzer; yeni yol
+get_invoices_by_user_and_period / get_service_purchases_by_user_and_date_range ile
+yalnızca kullanıcının satırlarını index üzerinden okur. Yeni yolun süresi aylık
+hacimden bağımsız kalmalıdır.
+
+    python -m bench.month_queries [--volumes 2000 20000 100000] [--purchases 3]
+"""
+import argparse
+import random
+from datetime import datetime
+
+from bench.common import measure, prepare_database, print_table, seed_customers, setup_environment
+
+setup_environment("month-queries")
+
+from app.crud.invoice_crud import get_invoices_by_period, get_invoices_by_user_and_period  # noqa: E402
+from app.crud.service_purchase_crud import (  # noqa: E402
+    get_service_purchases_by_date_range,
+    get_service_purchases_by_user_and_date_range,
+)
+
+
+def main(volumes, purchases_per_user: int, repeat: int):
+    prepare_database()
+    rows = []
+    for month, volume in enumerate(volumes, start=1):
+        start = datetime(2030 + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+        end = datetime(2030 + month // 12, month % 12 + 1, 1)
+        user_ids = seed_customers(volume, invoices_per_user=1, purchases_per_user=purchases_per_user, start=start)
+        user_id = random.choice(user_ids)
+        cases = (
+            ("fatura", "ayı süz", lambda: [invoice for invoice in get_invoices_by_period(start, end) if invoice.user_id == user_id]),
+            ("fatura", "kullanıcı sorgusu", lambda: get_invoices_by_user_and_period(user_id, start, end)),
+            ("hizmet alımı", "ayı süz",
+             lambda: [purchase for purchase in get_service_purchases_by_date_range(start, end) if purchase.user_id == user_id]),
+            ("hizmet alımı", "kullanıcı sorgusu", lambda: get_service_purchases_by_user_and_date_range(user_id, start, end)),
+        )
+        for table, name, runner in cases:
+            timing = measure(runner, repeat)
+            rows.append([table, name, volume, timing["wall_ms"], timing["cpu_ms"]])
+    print_table("Aylık kullanıcı sorguları", ["tablo", "yol", "aylık_hacim", "wall_ms", "cpu_ms"], rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--volumes", type=int, nargs="+", default=[2000, 20000, 100000])
+    parser.add_argument("--purchases", type=int, default=3, help="Kullanıcı başına aylık hizmet alımı")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.volumes, args.purchases, args.repeat)
@@ -1,15 +1,23 @@
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.routes.routes import api_router
 from app.db.database import init_db
+from app.db.async_database import dispose_async_engine
+from app.db.config import get_settings
 from app.utils.logging_config import setup_logging, get_logger, log_api_request
 from app.middleware.error_handler import error_handling_middleware
+from app.middleware.query_stats import query_stats_middleware
+from app.utils.json_response import default_response_class
+from app.crud.agent_log_writer import agent_log_writer
+from starlette.concurrency import run_in_threadpool
 import time
 import logging
 
 # Logging sistemini başlat
 setup_logging()
 logger = get_logger('app.main')
+settings = get_settings()
 
 # Veritabanını başlat
 init_db()
@@ -18,7 +26,8 @@ logger.info("Database initialized successfully")
 app = FastAPI(
     title="Call Center Backend API",
     description="Call Center Management System Backend API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=default_response_class()
 )
 
 # CORS middleware
@@ -30,6 +39,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Büyük cevaplar (listeler, dışa aktarımlar) istemci kabul ediyorsa gzip ile sıkıştırılır
+if settings.GZIP_MINIMUM_SIZE > 0:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=settings.GZIP_MINIMUM_SIZE,
+        compresslevel=settings.GZIP_COMPRESS_LEVEL,
+    )
+
+# SQL sorgu sayacı middleware
+@app.middleware("http")
+async def track_queries(request: Request, call_next):
+    return await query_stats_middleware(request, call_next)
+
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -78,6 +100,9 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application shutdown initiated")
+    # Kuyrukta bekleyen agent loglarını kapanmadan önce yaz
+    await run_in_threadpool(agent_log_writer.stop)
+    await dispose_async_engine()
 
 # if __name__ == '__main__':
 #      uvicorn.run(app, host='0.0.0.0', port=8000)
\ No newline at end of file
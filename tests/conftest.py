@@ -0,0 +1,76 @@
+"""Testler geçici bir SQLite veritabanında çalışır; ortam, uygulama modülleri import edilmeden önce ayarlanır"""
+import os
+import tempfile
+from itertools import count
+
+_DB_DIR = tempfile.mkdtemp(prefix="callcenter-tests-")
+os.environ.update({
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_DB": "test",
+    "DATABASE_URL": f"sqlite:///{_DB_DIR}/test.sqlite",
+    "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{_DB_DIR}/test.sqlite",
+    "REPLICA_DATABASE_URLS": "",
+    "CACHE_BACKEND": "memory",
+})
+
+from datetime import datetime
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.models.package import Package
+from app.models.subscription import Subscription
+from app.models.user import User
+
+_phone_numbers = count(1)
+
+
+@pytest.fixture(scope="session")
+def app():
+    # main import edilirken migration'lar çalışır
+    import main
+    return main.app
+
+
+@pytest.fixture(scope="session")
+def engine(app):
+    from app.db.database import engine
+    return engine
+
+
+@pytest.fixture
+def client(app):
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def package(session):
+    package = Package(name="Gold", type="mobile", details={"gb": "10"}, commitment="12 ay", monthly_fee=100.0)
+    session.add(package)
+    session.commit()
+    session.refresh(package)
+    return package
+
+
+@pytest.fixture
+def make_user(session, package):
+    """Aktif aboneliği olan, benzersiz telefon numaralı kullanıcı oluşturur"""
+    def make_user(subscribed: bool = True) -> User:
+        user = User(name="Test", surname="User", phone_number=f"599{next(_phone_numbers):07d}")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        if subscribed:
+            session.add(Subscription(user_id=user.id, package_id=package.id, start_date=datetime.utcnow(), is_active=True))
+            session.commit()
+        return user
+    return make_user
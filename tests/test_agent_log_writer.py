@@ -0,0 +1,122 @@
+"""Toplu log yazıcısı: batch'leme, dolu kuyrukta backpressure ve hatalı satırların batch'ten ayıklanması"""
+import threading
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app.crud import agent_log_writer as writer_module
+from app.crud.agent_log_writer import AgentLogQueueFullError, AgentLogWriteTimeoutError, AgentLogWriter
+from app.models.agentintentlog import AgentIntentLog
+
+
+@pytest.fixture
+def writer(app):
+    writer = AgentLogWriter(queue_size=100, batch_size=50, flush_interval=0.05)
+    yield writer
+    writer.stop(timeout=5)
+
+
+@pytest.fixture
+def blocked_insert(monkeypatch):
+    """Yazıcının INSERT'ini release set edilene kadar bekletir; started ilk batch alınınca set edilir"""
+    started, release = threading.Event(), threading.Event()
+    inserted = []
+
+    def insert(self, batch):
+        started.set()
+        release.wait(timeout=5)
+        inserted.append(len(batch))
+        return list(range(len(batch)))
+
+    monkeypatch.setattr(AgentLogWriter, "_insert", insert)
+    yield started, release, inserted
+    release.set()
+
+
+def test_records_are_written_in_batches(session, make_user):
+    user = make_user()
+    # Uzun flush aralığı: batch'ler zamanla değil boyutla kapanır, son eksik batch stop() ile boşaltılır
+    writer = AgentLogWriter(queue_size=100, batch_size=5, flush_interval=1)
+    futures = [writer.submit(AgentIntentLog(user_id=user.id, intent="fatura", message=f"mesaj {n}")) for n in range(12)]
+    writer.stop(timeout=5)
+
+    ids = [future.result(timeout=0) for future in futures]
+    assert len(set(ids)) == 12
+    assert [session.get(AgentIntentLog, log_id).message for log_id in ids] == [f"mesaj {n}" for n in range(12)]
+    assert writer.stats()["batches"] == 3
+    assert writer.stats()["written"] == 12
+
+
+def test_full_queue_rejects_after_timeout(blocked_insert):
+    started, release, inserted = blocked_insert
+    writer = AgentLogWriter(queue_size=1, batch_size=1, flush_interval=0.01)
+    first = writer.submit(AgentIntentLog(intent="fatura", message="yazılıyor"))
+    assert started.wait(timeout=5)
+    queued = writer.submit(AgentIntentLog(intent="fatura", message="kuyrukta"))
+
+    with pytest.raises(AgentLogQueueFullError):
+        writer.submit(AgentIntentLog(intent="fatura", message="reddedilir"), timeout=0.01)
+    assert writer.stats()["rejected"] == 1
+
+    release.set()
+    assert first.result(timeout=5) == 0 and queued.result(timeout=5) == 0
+    writer.stop(timeout=5)
+    assert inserted == [1, 1]
+
+
+def test_bad_row_fails_only_its_own_future(writer, session, make_user):
+    user = make_user()
+    logs = [AgentIntentLog(user_id=user.id, intent="fatura", message=f"mesaj {number}") for number in range(7)]
+    # intent NOT NULL; yalnızca bu kayıt reddedilmeli
+    logs[3].intent = None
+    futures = [writer.submit(log) for log in logs]
+
+    ids = []
+    for number, future in enumerate(futures):
+        if number == 3:
+            with pytest.raises(IntegrityError):
+                future.result(timeout=5)
+        else:
+            ids.append(future.result(timeout=5))
+
+    assert len(set(ids)) == 6
+    assert all(session.get(AgentIntentLog, log_id).user_id == user.id for log_id in ids)
+    assert writer.stats()["written"] == 6
+    assert writer.stats()["failed"] == 1
+
+
+def test_full_queue_returns_503_with_retry_after(client, monkeypatch, make_user):
+    user = make_user(subscribed=False)
+
+    def reject(agent_intent_log, timeout=None):
+        raise AgentLogQueueFullError("full")
+
+    monkeypatch.setattr(writer_module.settings, "AGENT_LOG_INGEST_MODE", "write_behind")
+    monkeypatch.setattr(writer_module.agent_log_writer, "submit", reject)
+
+    responses = [
+        client.post("/api/v1/agent-logs/", json={"user_id": user.id, "intent": "fatura", "message": "mesaj"}),
+        client.post("/api/v1/customer-service/log-interaction",
+                    params={"user_id": user.id, "phone_number": user.phone_number, "intent": "fatura", "message": "mesaj"}),
+    ]
+    for response in responses:
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+
+def test_durable_wait_is_bounded(client, monkeypatch, blocked_insert):
+    started, release, _ = blocked_insert
+    writer = AgentLogWriter(queue_size=10, batch_size=1, flush_interval=0.01)
+    monkeypatch.setattr(writer_module, "agent_log_writer", writer)
+    monkeypatch.setattr(writer_module.settings, "AGENT_LOG_INGEST_MODE", "write_behind")
+    monkeypatch.setattr(writer_module.settings, "AGENT_LOG_DURABLE", True)
+    monkeypatch.setattr(writer_module.settings, "AGENT_LOG_DURABLE_TIMEOUT", 0.05)
+
+    with pytest.raises(AgentLogWriteTimeoutError):
+        writer_module.ingest_agent_intent_log(AgentIntentLog(intent="fatura", message="bekler"))
+    response = client.post("/api/v1/agent-logs/", json={"intent": "fatura", "message": "bekler"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    release.set()
+    writer.stop(timeout=5)
+    # Zaman aşımı kaydı düşürmez, kuyruktakiler yine yazılır
+    assert writer.stats()["written"] == 2
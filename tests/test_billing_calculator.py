@@ -0,0 +1,48 @@
+"""Hizmet alımı kalemleri kayıtlı purchase_price ile faturalanır, adet x yuvarlanmış birim fiyatla değil"""
+from datetime import datetime
+from sqlmodel import select
+from app.crud.billing_crud import _chunk_amounts
+from app.crud.invoice_crud import create_invoice
+from app.models.invoice import Invoice
+from app.models.invoiceitem import InvoiceItem
+from app.models.servicepurchase import ServicePurchase
+from app.utils.billing_calculator import batch_amounts, invoice_amounts, line_amounts
+
+
+def test_stored_net_price_overrides_quantity_times_rounded_unit_price():
+    assert line_amounts(2, 1.255).net == 250
+    assert line_amounts(2, 1.255, net_price=2.51).net == 251
+
+    amounts = batch_amounts([0, 0, 1], [2, 1, 2], [1.255, 100.0, 1.255], [0.18] * 3, net_prices=[2.51, None, None])
+    assert amounts.item_net.tolist() == [251, 10000, 250]
+    assert amounts.invoice_net.tolist() == [10251, 250]
+    assert amounts.invoice_tax.tolist() == [
+        line_amounts(2, 1.255, net_price=2.51).tax + line_amounts(1, 100.0).tax,
+        invoice_amounts([(2, 1.255, 0.18)]).tax,
+    ]
+
+
+def test_bulk_billing_uses_purchase_price_for_purchase_lines():
+    package_line = {"service_type": "Package", "description": "Paket", "quantity": 1, "unit_price": 100.0, "tax_rate": 0.18}
+    purchase_line = {"service_type": "SMS", "description": "SMS - 2 adet", "quantity": 2, "unit_price": 1.255,
+                     "total_price": 2.51, "tax_rate": 0.18}
+
+    amounts = _chunk_amounts([(1, [package_line, purchase_line])])
+
+    assert purchase_line["total_price"] == 2.51
+    assert package_line["total_price"] == 100.0
+    assert amounts.invoice_net.tolist() == [10251]
+
+
+def test_create_invoice_uses_purchase_price(session, make_user):
+    user = make_user(subscribed=False)
+    session.add(ServicePurchase(user_id=user.id, service_type="SMS", count=2, unit_price=1.255, purchase_price=2.51,
+                                purchase_date=datetime.utcnow()))
+    session.commit()
+
+    invoice = create_invoice(Invoice(user_id=user.id, invoice_number=f"PP-{user.id}", billing_period_start=datetime(2031, 6, 1),
+                                     billing_period_end=datetime(2031, 6, 30), total_amount=0, status="pending"))
+
+    items = session.exec(select(InvoiceItem).where(InvoiceItem.invoice_id == invoice.id)).all()
+    assert [item.total_price for item in items] == [2.51]
+    assert invoice.total_amount == 2.51
@@ -0,0 +1,90 @@
+"""Fatura kesim çalışmasının sahiplenilmesi ve dönem başına tek fatura kuralı"""
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from app.crud.billing_crud import BillingRunActiveError, claim_billing_run, month_period, run_billing
+from app.crud.invoice_crud import create_invoice
+from app.jobs import monthly_billing
+from app.db.config import get_settings
+from app.models.billingrun import BillingRun
+from app.models.invoice import Invoice
+from app.routes import billing_routes, invoice_routes
+
+
+@pytest.fixture
+def launches(monkeypatch):
+    """Job process'i başlatılmaz; başlatma istekleri kaydedilir"""
+    calls = []
+    monkeypatch.setattr(billing_routes.monthly_billing, "launch", lambda year, month: calls.append((year, month)))
+    return calls
+
+
+def test_repeated_post_returns_active_run_without_second_job(client, launches):
+    first = client.post("/api/v1/billing/runs", params={"year": 2031, "month": 1})
+    second = client.post("/api/v1/billing/runs", params={"year": 2031, "month": 1})
+
+    assert first.status_code == 202
+    assert second.status_code == 200
+    assert second.json()["id"] == first.json()["id"]
+    assert second.json()["status"] == "running"
+    assert launches == [(2031, 1)]
+
+
+def test_run_billing_refuses_period_claimed_by_another_runner(app):
+    period_start, period_end = month_period(2031, 2)
+    run, claimed = claim_billing_run(period_start, period_end)
+    assert claimed
+
+    with pytest.raises(BillingRunActiveError):
+        run_billing(period_start, period_end)
+    assert claim_billing_run(period_start, period_end) == (run, False)
+
+
+def test_stale_run_can_be_claimed_again(session, client, launches):
+    period_start, period_end = month_period(2031, 3)
+    run, _ = claim_billing_run(period_start, period_end)
+    stale = datetime.utcnow() - timedelta(seconds=get_settings().BILLING_RUN_STALE_SECONDS + 60)
+    run = session.get(BillingRun, run.id)
+    run.updated_at = stale
+    session.add(run)
+    session.commit()
+
+    response = client.post("/api/v1/billing/runs", params={"year": 2031, "month": 3})
+
+    assert response.status_code == 202
+    assert response.json()["id"] == run.id
+    assert launches == [(2031, 3)]
+
+
+def test_duplicate_invoice_for_period_is_a_conflict(make_user):
+    user = make_user()
+
+    def invoice(number):
+        return Invoice(user_id=user.id, invoice_number=number, billing_period_start=datetime(2031, 4, 1),
+                       billing_period_end=datetime(2031, 4, 30, 23, 59, 59), total_amount=0, status="pending")
+
+    create_invoice(invoice(f"DUP-{user.id}-1"))
+    with pytest.raises(HTTPException) as error:
+        invoice_routes.create_new_invoice(invoice(f"DUP-{user.id}-2"))
+    assert error.value.status_code == 409
+
+
+def test_launched_job_is_reaped_when_it_exits(monkeypatch):
+    real_popen = subprocess.Popen
+    # Fatura işi yerine hemen çıkan bir process
+    monkeypatch.setattr(monthly_billing.subprocess, "Popen",
+                        lambda command, **kwargs: real_popen([sys.executable, "-c", "pass"], **kwargs))
+
+    process = monthly_billing.launch(2031, 9)
+
+    deadline = time.monotonic() + 10
+    while process.returncode is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert process.returncode == 0
+    # Reaper beklediği için çocuk process tablosunda zombi olarak kalmaz
+    with pytest.raises(ChildProcessError):
+        os.waitpid(process.pid, os.WNOHANG)
@@ -0,0 +1,145 @@
+"""Paylaşılan önbellek backend'leri ve müşteri önbelleğinin commit sonrası geçersiz kılınması
+
+Redis backend'i ağ yerine aynı get / set(px=) / delete arayüzüne sahip sahte bir istemciyle çalışır.
+"""
+from datetime import datetime
+import pytest
+from app.crud import customer_cache
+from app.crud.customer_cache import customer_key, get_cached, set_cached
+from app.models.invoice import Invoice
+from app.utils import cache
+from app.utils.cache import InMemoryCacheBackend, RedisCacheBackend
+
+
+class FakeRedis:
+    """redis.Redis'in kullanılan alt kümesi; süreler elle ilerletilen saatle dolar"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.data = {}
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(("get", key))
+        value, expires_at = self.data.get(key, (None, None))
+        if value is None or expires_at <= self.now:
+            self.data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, px):
+        self.calls.append(("set", key))
+        self.data[key] = (value, self.now + px / 1000)
+
+    def delete(self, *keys):
+        self.calls.append(("delete",) + keys)
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+
+class BrokenRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis is down")
+        return fail
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, fake_redis):
+    if request.param == "memory":
+        return InMemoryCacheBackend(maxsize=100, ttl=60)
+    return RedisCacheBackend(client=fake_redis)
+
+
+def test_backend_get_set_delete(backend):
+    assert backend.get("a") is None
+    backend.set("a", b"1", ttl=60)
+    backend.set("b", b"2", ttl=60)
+
+    assert backend.get("a") == b"1"
+    backend.delete("a", "b", "missing")
+    assert backend.get("a") is None
+    assert backend.get("b") is None
+
+
+def test_redis_backend_passes_ttl_in_milliseconds(fake_redis):
+    backend = RedisCacheBackend(client=fake_redis)
+    backend.set("key", b"value", ttl=1.5)
+
+    fake_redis.now = 1.4
+    assert backend.get("key") == b"value"
+    fake_redis.now = 1.5
+    assert backend.get("key") is None
+    assert backend.stats() == {"backend": "redis", "hits": 1, "misses": 1, "errors": 0}
+
+
+def test_unreachable_redis_behaves_like_a_miss():
+    backend = RedisCacheBackend(client=BrokenRedis())
+
+    backend.set("key", b"value", ttl=60)
+    assert backend.get("key") is None
+    backend.delete("key")
+    assert backend.stats()["errors"] == 3
+
+
+@pytest.fixture
+def redis_customer_cache(monkeypatch, fake_redis):
+    backend = RedisCacheBackend(client=fake_redis)
+    monkeypatch.setattr(customer_cache, "get_cache_backend", lambda: backend)
+    return fake_redis
+
+
+def _invoice(user_id, number):
+    start = datetime(2032, 1, 1)
+    return Invoice(user_id=user_id, invoice_number=f"CACHE-{user_id}-{number}", billing_period_start=start,
+                   billing_period_end=datetime(2032, 1, 31), total_amount=10.0, status="pending", created_at=start)
+
+
+def test_customer_views_are_invalidated_after_commit(redis_customer_cache, session, make_user):
+    user = make_user(subscribed=False)
+    set_cached(customer_key(user.id, "info"), {"cached": True})
+    set_cached(customer_key(user.id, "version"), "v1")
+
+    session.add(_invoice(user.id, 1))
+    session.flush()
+    # Flush commit değildir: başka istekler hâlâ eski veriyi okuyabilir, önbellek silinmez
+    assert get_cached(customer_key(user.id, "info")) == {"cached": True}
+
+    session.commit()
+    assert get_cached(customer_key(user.id, "info")) is None
+    assert get_cached(customer_key(user.id, "version")) is None
+    assert any(call[0] == "delete" and customer_key(user.id, "info") in call for call in redis_customer_cache.calls)
+
+
+def test_rolled_back_write_does_not_invalidate(redis_customer_cache, session, make_user):
+    user = make_user(subscribed=False)
+    set_cached(customer_key(user.id, "info"), {"cached": True})
+    # make_user'ın kendi commit'i de geçersiz kılma yayınlar; yalnızca sonrası sayılır
+    redis_customer_cache.calls.clear()
+
+    session.add(_invoice(user.id, 2))
+    session.flush()
+    session.rollback()
+    session.commit()
+
+    assert get_cached(customer_key(user.id, "info")) == {"cached": True}
+    assert not any(call[0] == "delete" for call in redis_customer_cache.calls)
+
+
+def test_redis_backend_is_selected_from_settings(monkeypatch, fake_redis):
+    monkeypatch.setattr(cache, "get_settings", lambda: type("Settings", (), {
+        "CACHE_BACKEND": "redis", "CACHE_REDIS_URL": "redis://cache:6379/0", "CACHE_SOCKET_TIMEOUT": 0.1,
+    })())
+    created = []
+    monkeypatch.setattr(cache.RedisCacheBackend, "__init__",
+                        lambda self, url=None, socket_timeout=0.1, client=None: created.append((url, socket_timeout)))
+    cache.get_cache_backend.cache_clear()
+    try:
+        assert isinstance(cache.get_cache_backend(), RedisCacheBackend)
+    finally:
+        cache.get_cache_backend.cache_clear()
+    assert created == [("redis://cache:6379/0", 0.1)]
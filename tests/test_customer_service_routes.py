@@ -0,0 +1,82 @@
+"""POST /customer-service/log-interactions/bulk: numaralar tek sorguda çözülür, kayıtlar tek INSERT ile eklenir"""
+from contextlib import contextmanager
+from sqlalchemy import event
+from app.models.agentintentlog import AgentIntentLog
+from app.routes.customer_service_routes import BULK_LOG_LIMIT
+
+BULK_LOG_URL = "/api/v1/customer-service/log-interactions/bulk"
+
+
+@contextmanager
+def captured_statements(engine):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def interaction(number, **fields):
+    return {"intent": "fatura", "message": f"etkileşim {number}", **fields}
+
+
+def test_bulk_log_resolves_phones_and_keeps_order(client, engine, session, make_user):
+    first, second = make_user(subscribed=False), make_user(subscribed=False)
+    interactions = [
+        interaction(0, phone_number=first.phone_number),
+        interaction(1, phone_number="5000000000"),
+        interaction(2, user_id=second.id),
+        interaction(3, phone_number=second.phone_number),
+        interaction(4),
+        interaction(5, phone_number=first.phone_number),
+    ]
+
+    with captured_statements(engine) as statements:
+        response = client.post(BULK_LOG_URL, json={"interactions": interactions})
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["created"] == len(interactions)
+    results = body["results"]
+    assert [result["user_id"] for result in results] == [first.id, None, second.id, second.id, None, first.id]
+    assert [result["user_resolved"] for result in results] == [True, False, True, True, False, True]
+    assert [result["phone_number"] for result in results] == [item.get("phone_number") for item in interactions]
+    assert [session.get(AgentIntentLog, result["id"]).message for result in results] == [
+        item["message"] for item in interactions
+    ]
+
+    inserts = [statement for statement in statements if statement.lstrip().upper().startswith("INSERT INTO AGENT_INTENT_LOG")]
+    assert len(inserts) == 1
+    # Numara çözümleme + INSERT + özet tazeleme; kayıt sayısıyla büyümez
+    assert int(response.headers["X-DB-Query-Count"]) <= 6
+
+
+def test_bulk_log_query_count_does_not_grow_with_batch_size(client, make_user):
+    user = make_user(subscribed=False)
+    # İlk istek telefon önbelleğini doldurur; karşılaştırılan iki istek aynı durumda başlasın
+    client.post(BULK_LOG_URL, json={"interactions": [interaction(0, phone_number=user.phone_number)]})
+
+    small = client.post(BULK_LOG_URL, json={"interactions": [interaction(0, phone_number=user.phone_number)]})
+    large = client.post(BULK_LOG_URL, json={
+        "interactions": [interaction(number, phone_number=user.phone_number) for number in range(50)]
+    })
+
+    assert small.status_code == large.status_code == 200
+    assert large.headers["X-DB-Query-Count"] == small.headers["X-DB-Query-Count"]
+
+
+def test_bulk_log_rejects_more_than_limit(client):
+    response = client.post(BULK_LOG_URL, json={"interactions": [interaction(number) for number in range(BULK_LOG_LIMIT + 1)]})
+
+    assert response.status_code == 422
+
+
+def test_bulk_log_rejects_empty_request(client):
+    response = client.post(BULK_LOG_URL, json={"interactions": []})
+
+    assert response.status_code == 422
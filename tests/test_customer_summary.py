@@ -0,0 +1,141 @@
+"""customer_summary'nin artımlı güncellemelerinin tam yeniden hesapla aynı sonucu verdiğini doğrular"""
+import json
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, insert
+from app.crud.agent_intent_log_crud import create_agent_intent_logs
+from app.crud.customer_cache import customer_key, get_cached, set_cached
+from app.crud.customer_crud import normalize_json
+from app.crud.customer_summary_crud import SUMMARY_COLUMNS, _summary_query, mark_rows_inserted
+from app.crud.invoice_crud import mark_invoice_as_paid
+from app.models.agentintentlog import AgentIntentLog
+from app.models.customersummary import CustomerSummary
+from app.models.invoice import Invoice
+from app.models.remaininguses import RemainingUses
+from app.models.user import User
+
+SCALAR_COLUMNS = ["invoice_count", "unpaid_invoice_count", "remaining_uses_total", "last_interaction_at", "active_package_name"]
+JSON_COLUMNS = ["subscription", "recent_invoices", "remaining_uses", "recent_interactions"]
+
+
+def _json(value):
+    return normalize_json(json.loads(value) if isinstance(value, str) else value)
+
+
+def assert_summary_matches_recompute(session, user_id):
+    session.expire_all()
+    stored = session.get(CustomerSummary, user_id)
+    fresh = dict(zip(SUMMARY_COLUMNS, session.connection().execute(_summary_query(User.id == user_id)).one()))
+    for column in SCALAR_COLUMNS:
+        assert getattr(stored, column) == fresh[column], column
+    assert stored.unpaid_total == pytest.approx(fresh["unpaid_total"])
+    for column in JSON_COLUMNS:
+        assert _json(getattr(stored, column)) == _json(fresh[column]), column
+
+
+def make_invoice(user_id, number, status="pending", total=118.0):
+    start = datetime(2025, 1, 1) + timedelta(days=31 * number)
+    return Invoice(user_id=user_id, invoice_number=f"SUM-{user_id}-{number}", billing_period_start=start,
+                   billing_period_end=start + timedelta(days=27), total_amount=total, status=status,
+                   created_at=start + timedelta(days=28))
+
+
+def test_orm_writes_keep_summary_consistent(session, make_user):
+    user = make_user()
+    invoices = [make_invoice(user.id, number) for number in range(3)]
+    session.add_all(invoices)
+    session.add(RemainingUses(user_id=user.id, service_type="SMS", remaining_count=10, total_allocated=10))
+    session.add(AgentIntentLog(user_id=user.id, intent="fatura", message="fatura sorgusu"))
+    session.commit()
+    assert_summary_matches_recompute(session, user.id)
+
+    mark_invoice_as_paid(invoices[0].id, session=session)
+    assert_summary_matches_recompute(session, user.id)
+
+    session.delete(session.get(Invoice, invoices[1].id))
+    session.commit()
+    assert_summary_matches_recompute(session, user.id)
+    assert session.get(CustomerSummary, user.id).invoice_count == 2
+
+
+def test_bulk_log_insert_updates_summary_without_full_recompute(engine, session, make_user):
+    user = make_user()
+    session.add(make_invoice(user.id, 0))
+    session.commit()
+
+    statements = []
+    capture = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        create_agent_intent_logs([
+            AgentIntentLog(user_id=user.id, intent="paket", message=f"mesaj {number}", created_at=datetime(2025, 6, 1, 12, number))
+            for number in range(7)
+        ])
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    # Log eklemek fatura/abonelik toplamlarını yeniden hesaplatmamalı
+    assert not any("FROM invoice" in statement for statement in statements)
+    assert_summary_matches_recompute(session, user.id)
+    summary = session.get(CustomerSummary, user.id)
+    assert summary.last_interaction_at == datetime(2025, 6, 1, 12, 6)
+    assert len(summary.recent_interactions) == 5
+
+
+def test_core_invoice_insert_applies_deltas(session, make_user):
+    user = make_user()
+    session.add(make_invoice(user.id, 0, status="paid"))
+    session.commit()
+
+    rows = [{**make_invoice(user.id, number, total=10.05).model_dump(exclude={"id"})} for number in range(1, 4)]
+    session.connection().execute(insert(Invoice.__table__), rows)
+    mark_rows_inserted(session, Invoice, rows)
+    session.commit()
+
+    assert_summary_matches_recompute(session, user.id)
+    summary = session.get(CustomerSummary, user.id)
+    assert (summary.invoice_count, summary.unpaid_invoice_count) == (4, 3)
+
+
+def test_insert_for_user_without_summary_row_builds_the_row(session, make_user):
+    user = make_user()
+    session.connection().execute(CustomerSummary.__table__.delete().where(CustomerSummary.__table__.c.user_id == user.id))
+    session.commit()
+
+    session.add(make_invoice(user.id, 0))
+    session.commit()
+    assert_summary_matches_recompute(session, user.id)
+
+
+def test_package_edit_refreshes_and_invalidates_subscribers(session, make_user, package):
+    user = make_user()
+    for view in ("version", "package"):
+        set_cached(customer_key(user.id, view), "stale")
+
+    package.name = "Platinum"
+    session.add(package)
+    session.commit()
+
+    assert session.get(CustomerSummary, user.id).active_package_name == "Platinum"
+    assert get_cached(customer_key(user.id, "version")) is None
+    assert get_cached(customer_key(user.id, "package")) is None
+
+
+def test_customer_info_rebuilds_missing_summary_row(session, client, make_user):
+    user = make_user()
+    session.add(make_invoice(user.id, 0))
+    session.commit()
+    # Özet satırı ORM hook'ları dışından yazılmış bir kullanıcıdaki gibi yok
+    session.connection().execute(CustomerSummary.__table__.delete().where(CustomerSummary.__table__.c.user_id == user.id))
+    session.commit()
+
+    response = client.get(f"/api/v1/customer-service/customer/{user.phone_number}")
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["customer"]["id"] == user.id
+    assert [invoice["invoice_number"] for invoice in body["recent_invoices"]] == [f"SUM-{user.id}-0"]
+    assert body["subscription"]["package"]["name"] == "Gold"
+    session.expire_all()
+    assert session.get(CustomerSummary, user.id) is not None
+    assert_summary_matches_recompute(session, user.id)
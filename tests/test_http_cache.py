@@ -0,0 +1,75 @@
+"""Telefonla okunan müşteri görünümleri: ETag ile 200, If-None-Match ile 304, yazmadan sonra yeni ETag"""
+from datetime import datetime
+import pytest
+from app.models.invoice import Invoice
+from app.models.package import Package
+
+ROUTES = [
+    "/api/v1/users/phone/{phone}/package",
+    "/api/v1/invoices/phone/{phone}/activeinvoice",
+    "/api/v1/remaining-uses/phone/{phone}",
+]
+
+
+@pytest.fixture
+def customer(session, make_user):
+    user = make_user()
+    invoice = Invoice(user_id=user.id, invoice_number=f"ETAG-{user.id}", billing_period_start=datetime(2033, 1, 1),
+                      billing_period_end=datetime(2033, 1, 31), total_amount=100.0, status="pending",
+                      created_at=datetime.utcnow())
+    session.add(invoice)
+    session.commit()
+    session.refresh(invoice)
+    return user, invoice
+
+
+def get_etag(client, route, phone):
+    response = client.get(route.format(phone=phone))
+    assert response.status_code == 200, response.text
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    return response.headers["ETag"]
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_matching_etag_returns_304(client, customer, route):
+    user, _ = customer
+    etag = get_etag(client, route, user.phone_number)
+
+    response = client.get(route.format(phone=user.phone_number), headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    stale = client.get(route.format(phone=user.phone_number), headers={"If-None-Match": '"stale"'})
+    assert stale.status_code == 200
+
+
+def test_paying_invoice_changes_etags(client, customer):
+    user, invoice = customer
+    before = {route: get_etag(client, route, user.phone_number) for route in ROUTES}
+
+    assert client.put(f"/api/v1/invoices/{invoice.id}/pay").status_code == 200
+
+    for route in ROUTES:
+        response = client.get(route.format(phone=user.phone_number), headers={"If-None-Match": before[route]})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != before[route]
+    assert client.get(ROUTES[1].format(phone=user.phone_number)).json()["status"] == "paid"
+
+
+def test_package_change_changes_etags(client, session, customer):
+    user, _ = customer
+    platinum = Package(name="Platinum", type="mobile", details={"gb": "50"}, commitment="12 ay", monthly_fee=300.0)
+    session.add(platinum)
+    session.commit()
+    before = {route: get_etag(client, route, user.phone_number) for route in ROUTES}
+
+    change = client.post("/api/v1/subs/createsubs", json={"user_id": user.id, "requested_package_id": platinum.id})
+    assert change.status_code == 200, change.text
+    approved = client.post("/api/v1/subs/approve", params={"package_change_request_id": change.json()["id"]})
+    assert approved.status_code == 200, approved.text
+
+    for route in ROUTES:
+        response = client.get(route.format(phone=user.phone_number), headers={"If-None-Match": before[route]})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != before[route]
@@ -0,0 +1,27 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError, StatementError
+from app.models.invoice import Invoice
+
+
+def test_failed_statement_does_not_leave_timer_on_connection(engine):
+    with engine.connect() as connection:
+        with pytest.raises(SQLAlchemyError):
+            connection.execute(text("SELECT * FROM no_such_table"))
+        assert connection.info["query_start_time"] == []
+
+        connection.execute(text("SELECT 1"))
+        assert connection.info["query_start_time"] == []
+
+
+def test_error_before_execute_keeps_outer_timer(engine):
+    with engine.connect() as connection:
+        connection.info.setdefault("query_start_time", []).append(0.0)
+        # SQLite datetime parametresi string olunca sorgu cursor'a gitmeden hata verir
+        with pytest.raises(StatementError):
+            connection.execute(Invoice.__table__.update().where(Invoice.__table__.c.id == 0).values(due_date="2025-01-01"))
+        assert connection.info["query_start_time"] == [0.0]
+        connection.info["query_start_time"].clear()
+        connection.execute(Invoice.__table__.select().where(Invoice.__table__.c.due_date > datetime(2025, 1, 1)))
+        assert connection.info["query_start_time"] == []
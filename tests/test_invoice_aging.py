@@ -0,0 +1,98 @@
+"""Fatura yaşlandırma raporu: aralık sınırları, ödenmiş faturaların dışlanması ve kullanıcı başına toplamlar"""
+from datetime import datetime, timedelta
+from itertools import count
+import pytest
+from app.crud.invoice_crud import get_invoice_aging, get_invoice_aging_by_user
+from app.models.invoice import Invoice
+
+AS_OF = datetime(2040, 6, 1, 12, 0)
+_periods = count()
+
+
+def add_invoice(session, user, days_past_due, amount=10.0, status="pending", due_date=True, created_at=None):
+    """Vadesi AS_OF'tan days_past_due gün önce olan fatura; dönemler kullanıcı başına benzersiz"""
+    period = next(_periods)
+    period_start = datetime(2030, 1, 1) + timedelta(days=period)
+    invoice = Invoice(user_id=user.id, invoice_number=f"AGING-{period}",
+                      billing_period_start=period_start, billing_period_end=period_start + timedelta(hours=1),
+                      total_amount=amount, status=status, created_at=created_at or period_start,
+                      due_date=AS_OF - timedelta(days=days_past_due) if due_date else None)
+    session.add(invoice)
+    session.flush()
+    return invoice
+
+
+def bucket_counts(report):
+    return {label: bucket["count"] for label, bucket in report["buckets"].items()}
+
+
+@pytest.fixture
+def uncommitted(session):
+    """Rapor aynı session'dan okunur; faturalar test sonunda geri alınır"""
+    yield session
+    session.rollback()
+
+
+def test_bucket_edges(uncommitted, make_user):
+    user = make_user(subscribed=False)
+    for days in (-5, 0, 30, 31, 60, 61, 90, 91, 400):
+        add_invoice(uncommitted, user, days)
+
+    report = get_invoice_aging_by_user(AS_OF, user_id=user.id, session=uncommitted)
+
+    [row] = report["users"]
+    # Vadesi gelmemiş (-5) ve tam 30 gün geçmiş faturalar 0-30'da, 31. günden itibaren bir sonraki aralıkta
+    assert bucket_counts(row) == {"0-30": 3, "31-60": 2, "61-90": 2, "90+": 2}
+    assert row["count"] == 9
+    assert row["total"] == 90.0
+
+
+def test_missing_due_date_ages_from_creation(uncommitted, make_user):
+    user = make_user(subscribed=False)
+    add_invoice(uncommitted, user, 0, due_date=False, created_at=AS_OF - timedelta(days=45))
+
+    [row] = get_invoice_aging_by_user(AS_OF, user_id=user.id, session=uncommitted)["users"]
+
+    assert bucket_counts(row)["31-60"] == 1
+
+
+def test_paid_and_canceled_invoices_are_excluded(uncommitted, make_user):
+    user = make_user(subscribed=False)
+    before = get_invoice_aging(AS_OF, session=uncommitted)
+    add_invoice(uncommitted, user, 10, amount=25.0, status="overdue")
+    add_invoice(uncommitted, user, 10, amount=1000.0, status="paid")
+    add_invoice(uncommitted, user, 100, amount=1000.0, status="canceled")
+
+    after = get_invoice_aging(AS_OF, session=uncommitted)
+
+    assert after["count"] - before["count"] == 1
+    assert after["buckets"]["0-30"]["count"] - before["buckets"]["0-30"]["count"] == 1
+    assert after["total"] - before["total"] == pytest.approx(25.0)
+    [row] = get_invoice_aging_by_user(AS_OF, user_id=user.id, session=uncommitted)["users"]
+    assert row["total"] == 25.0
+
+
+def test_per_user_totals_are_ordered_by_amount(uncommitted, make_user):
+    small, large = make_user(subscribed=False), make_user(subscribed=False)
+    add_invoice(uncommitted, small, 5, amount=10.0)
+    add_invoice(uncommitted, small, 75, amount=15.5)
+    add_invoice(uncommitted, large, 200, amount=5000.0)
+    add_invoice(uncommitted, large, 35, amount=0.25)
+
+    rows = {row["user_id"]: row for row in get_invoice_aging_by_user(AS_OF, session=uncommitted, limit=10_000)["users"]}
+
+    assert rows[small.id]["total"] == 25.5
+    assert rows[small.id]["buckets"]["61-90"] == {"count": 1, "total": 15.5}
+    assert rows[large.id]["total"] == 5000.25
+    assert rows[large.id]["buckets"]["90+"] == {"count": 1, "total": 5000.0}
+    order = list(rows)
+    assert order.index(large.id) < order.index(small.id)
+
+
+def test_user_without_unpaid_invoices_has_empty_report(uncommitted, make_user):
+    user = make_user(subscribed=False)
+    add_invoice(uncommitted, user, 40, status="paid")
+
+    report = get_invoice_aging_by_user(AS_OF, user_id=user.id, session=uncommitted)
+
+    assert report == {"as_of": AS_OF, "users": []}
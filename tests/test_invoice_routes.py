@@ -0,0 +1,30 @@
+"""POST /invoices/: JSON gövdesindeki tarihler çözülür, numara verilmezse dönemden üretilir"""
+import re
+
+
+def invoice_body(user_id, **fields):
+    return {"user_id": user_id, "billing_period_start": "2031-07-01T00:00:00", "billing_period_end": "2031-07-31T23:59:59",
+            "due_date": "2031-08-15", "total_amount": 0, "status": "pending", **fields}
+
+
+def test_create_invoice_without_number_generates_one(client, make_user):
+    user = make_user(subscribed=False)
+
+    response = client.post("/api/v1/invoices/", json=invoice_body(user.id))
+
+    assert response.status_code == 200, response.text
+    invoice = response.json()
+    assert re.fullmatch(r"INV-203107-\d{9}", invoice["invoice_number"])
+    assert invoice["billing_period_start"] == "2031-07-01T00:00:00"
+    assert invoice["due_date"] == "2031-08-15T00:00:00"
+
+    duplicate = client.post("/api/v1/invoices/", json=invoice_body(user.id))
+    assert duplicate.status_code == 409
+
+
+def test_create_invoice_rejects_invalid_date(client, make_user):
+    user = make_user(subscribed=False)
+
+    response = client.post("/api/v1/invoices/", json=invoice_body(user.id, billing_period_start="07/2031"))
+
+    assert response.status_code == 422
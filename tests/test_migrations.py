@@ -0,0 +1,73 @@
+"""Migration zincirinin boş veritabanında modellerle aynı şemayı kurduğunu doğrular"""
+from datetime import datetime
+from sqlalchemy import create_engine, inspect, text
+from sqlmodel import SQLModel
+from app.db.migrations import (
+    INVOICE_PERIOD_INDEX,
+    MIGRATIONS,
+    find_duplicate_invoice_periods,
+    run_migrations,
+    schema_migrations,
+)
+from app.db.baseline_schema import baseline_metadata
+
+
+def index_names(engine, tables):
+    inspector = inspect(engine)
+    return {table: {index["name"] for index in inspector.get_indexes(table)} for table in tables}
+
+
+def test_baseline_creates_only_frozen_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/baseline.sqlite")
+    baseline = next(migration for migration in MIGRATIONS if migration.version == 1)
+    with engine.begin() as connection:
+        baseline.upgrade(connection)
+
+    assert set(inspect(engine).get_table_names()) == set(baseline_metadata.tables)
+    indexes = index_names(engine, ["invoice"])["invoice"]
+    # Sonraki migration'ların index'leri baseline'da oluşmamalı
+    assert "ix_invoice_user_id" in indexes
+    assert "uq_invoice_user_id_billing_period" not in indexes
+    assert "ix_invoice_unpaid" not in indexes
+
+
+def test_migrations_build_model_schema_from_scratch(tmp_path, app):
+    engine = create_engine(f"sqlite:///{tmp_path}/fresh.sqlite")
+    assert run_migrations(engine) == [migration.version for migration in MIGRATIONS]
+
+    tables = SQLModel.metadata.tables
+    assert set(tables) <= set(inspect(engine).get_table_names())
+    expected = {name: {index.name for index in table.indexes} for name, table in tables.items()}
+    assert index_names(engine, tables) == expected
+
+
+def test_duplicate_invoice_periods_do_not_block_startup(tmp_path, app):
+    engine = create_engine(f"sqlite:///{tmp_path}/duplicates.sqlite")
+    before_partitions = [migration for migration in MIGRATIONS if migration.version < 6]
+    with engine.begin() as connection:
+        for migration in before_partitions:
+            migration.upgrade(connection)
+        schema_migrations.create(connection)
+        connection.execute(schema_migrations.insert(), [
+            {"version": migration.version, "name": migration.name, "applied_at": datetime.utcnow()}
+            for migration in before_partitions
+        ])
+        connection.execute(text('INSERT INTO "user" (id, name, surname, phone_number, is_active, created_at) '
+                                "VALUES (1, 'A', 'B', '5000000001', 1, '2025-01-01 00:00:00')"))
+        for number in ("DUP-1", "DUP-2"):
+            connection.execute(text(
+                "INSERT INTO invoice (user_id, invoice_number, billing_period_start, billing_period_end, "
+                "total_amount, status, created_at) VALUES (1, :number, '2025-01-01 00:00:00', "
+                "'2025-01-31 23:59:59', 0, 'pending', '2025-02-01 00:00:00')"
+            ), {"number": number})
+
+    run_migrations(engine)
+    assert INVOICE_PERIOD_INDEX not in index_names(engine, ["invoice"])["invoice"]
+    with engine.connect() as connection:
+        assert [tuple(row)[0::3] for row in find_duplicate_invoice_periods(connection)] == [(1, 2)]
+
+    # Mükerrer kayıt silinince index bir sonraki açılışta oluşur
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM invoice WHERE invoice_number = 'DUP-2'"))
+    assert run_migrations(engine) == []
+    assert INVOICE_PERIOD_INDEX in index_names(engine, ["invoice"])["invoice"]
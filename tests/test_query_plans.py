@@ -0,0 +1,121 @@
+"""Sıcak sorguların index kullandığını SQLite EXPLAIN QUERY PLAN ile doğrular"""
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, func, text
+from sqlmodel import select
+from app.crud.agent_intent_log_crud import get_agent_intent_logs_page
+from app.crud.invoice_crud import get_invoice_aging, get_invoice_aging_by_user, get_invoices_page
+from app.crud.package_change_request_crud import get_package_change_requests_page
+from app.crud.pagination import encode_cursor
+from app.crud.problem_crud import get_problems_page
+from app.crud.agent_intent_log_crud import get_agent_intent_logs_by_user
+from app.crud.invoice_crud import get_invoices_with_items_by_user
+from app.crud.remaining_uses_crud import get_remaining_uses_by_service
+from app.crud.service_purchase_crud import get_service_purchases_by_user_and_date_range, get_service_purchases_page
+from app.crud.subscription_crud import get_user_active_subscription
+from app.models.agentintentlog import AgentIntentLog
+from app.models.invoice import Invoice
+from app.models.problems import Problem
+from app.models.remaininguses import RemainingUses
+from app.models.servicepurchase import ServicePurchase
+
+
+def query_plan(engine, run) -> str:
+    """run() içinde çalışan ilk sorgunun planını tek satır olarak döndür (selectinload sorguları sonra gelir)"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    statement, parameters = statements[0]
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return " | ".join(row[-1] for row in rows)
+
+
+def uses_index(plan: str, index_name: str) -> bool:
+    return f"USING INDEX {index_name}" in plan or f"USING COVERING INDEX {index_name}" in plan
+
+
+@pytest.mark.parametrize("get_page, index_name", [
+    (get_invoices_page, "ix_invoice_created_at_id"),
+    (get_agent_intent_logs_page, "ix_agent_intent_log_created_at_id"),
+    (get_service_purchases_page, "ix_service_purchase_purchase_date_id"),
+    (get_problems_page, "ix_problem_created_at_id"),
+    (get_package_change_requests_page, "ix_package_change_request_requested_at_id"),
+])
+@pytest.mark.parametrize("cursor", [None, encode_cursor([datetime(2025, 1, 1), 1000])])
+def test_keyset_pages_read_the_sort_index(engine, session, get_page, index_name, cursor):
+    plan = query_plan(engine, lambda: get_page(limit=50, cursor=cursor, session=session))
+    assert uses_index(plan, index_name), plan
+    assert "TEMP B-TREE" not in plan, plan
+
+
+@pytest.fixture(scope="module")
+def seeded(engine, app):
+    """Her tabloya birkaç kullanıcının verisini yazıp planlayıcı istatistiklerini güncelle"""
+    from sqlmodel import Session
+    from app.models.package import Package
+    from app.models.subscription import Subscription
+    from app.models.user import User
+
+    start = datetime(2025, 1, 1)
+    with Session(engine) as session:
+        package = Package(name="Plan", type="mobile", details={}, commitment="yok", monthly_fee=50.0)
+        session.add(package)
+        session.flush()
+        users = [User(name="Plan", surname=str(number), phone_number=f"598{number:07d}") for number in range(300)]
+        session.add_all(users)
+        session.flush()
+        for user in users:
+            session.add(Subscription(user_id=user.id, package_id=package.id, is_active=True))
+            session.add(RemainingUses(user_id=user.id, service_type="SMS", remaining_count=10, total_allocated=10))
+            for month in range(6):
+                period_start = start + timedelta(days=31 * month)
+                session.add(Invoice(user_id=user.id, invoice_number=f"PLAN-{user.id}-{month}", billing_period_start=period_start,
+                                    billing_period_end=period_start + timedelta(days=27), total_amount=59.0, created_at=period_start,
+                                    # Gerçek veride olduğu gibi yalnızca son dönemin faturası ödenmemiş
+                                    status="pending" if month == 5 else "paid"))
+                session.add(ServicePurchase(user_id=user.id, service_type="SMS", count=1, unit_price=1.0, purchase_price=1.0, purchase_date=period_start))
+                session.add(AgentIntentLog(user_id=user.id, intent="fatura", message="fatura", created_at=period_start))
+        for number in range(40):
+            session.add(Problem(location="Ankara", problem="Kesinti", estimated_completion_time=start,
+                                status=("pending", "in_progress", "completed")[number % 3], priority=("low", "high")[number % 2]))
+        session.commit()
+        user_id = users[0].id
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+    return user_id
+
+
+def test_hot_queries_use_composite_indexes(engine, session, seeded):
+    user_id = seeded
+    year = (datetime(2025, 1, 1), datetime(2025, 12, 31))
+    hot_queries = {
+        "ix_subscription_user_id_is_active": lambda: get_user_active_subscription(user_id, session=session),
+        "ix_invoice_user_id_created_at": lambda: session.exec(
+            select(Invoice).where(Invoice.user_id == user_id).order_by(Invoice.created_at.desc())).all(),
+        "uq_invoice_user_id_billing_period": lambda: get_invoices_with_items_by_user(user_id, *year, session=session),
+        "ix_service_purchase_user_id_purchase_date_is_used": lambda: get_service_purchases_by_user_and_date_range(user_id, *year, session=session),
+        "ix_agent_intent_log_user_id_created_at": lambda: get_agent_intent_logs_by_user(user_id, session=session),
+        "ix_problem_status_priority": lambda: session.exec(select(func.count(Problem.id)).where(Problem.status == "pending")).one(),
+        "ix_remaining_uses_user_id_service_type": lambda: get_remaining_uses_by_service(user_id, "SMS", session=session),
+    }
+    for index_name, run in hot_queries.items():
+        plan = query_plan(engine, run)
+        assert uses_index(plan, index_name), f"{index_name}: {plan}"
+
+
+@pytest.mark.parametrize("aging_report", [
+    lambda session, user_id: get_invoice_aging(datetime(2026, 1, 1), session=session),
+    lambda session, user_id: get_invoice_aging_by_user(datetime(2026, 1, 1), session=session),
+    lambda session, user_id: get_invoice_aging_by_user(datetime(2026, 1, 1), user_id=user_id, session=session),
+], ids=["totals", "by-user", "one-user"])
+def test_aging_report_reads_only_the_unpaid_index(engine, session, seeded, aging_report):
+    plan = query_plan(engine, lambda: aging_report(session, seeded))
+    assert uses_index(plan, "ix_invoice_unpaid"), plan
@@ -0,0 +1,93 @@
+"""Okuma yönlendirmesi: iki SQLite dosyası primary ve replika yerine geçer"""
+import itertools
+import pytest
+from sqlalchemy import create_engine
+from sqlmodel import SQLModel, Session
+from app.db import replica as replica_module
+from app.db.database import engine
+from app.db.replica import get_read_engine, read_session_scope
+from app.models.user import User
+
+# Yalnızca replika dosyasında bulunan kullanıcı; okunabiliyorsa sorgu replikaya gitmiştir
+REPLICA_ONLY_USER_ID = 900_000_001
+
+
+@pytest.fixture
+def lags():
+    """Replika engine -> _measure_lag'in döndüreceği gecikme"""
+    return {}
+
+
+@pytest.fixture
+def replica(app, tmp_path, monkeypatch, lags):
+    replica_engine = create_engine(f"sqlite:///{tmp_path}/replica.sqlite")
+    SQLModel.metadata.create_all(replica_engine)
+    with Session(replica_engine) as session:
+        session.add(User(id=REPLICA_ONLY_USER_ID, name="Replica", surname="Only", phone_number="5900000001"))
+        session.commit()
+
+    lags[replica_engine] = 0.0
+    monkeypatch.setattr(replica_module, "replica_engines", [replica_engine])
+    monkeypatch.setattr(replica_module, "_replica_cycle", itertools.cycle([replica_engine]))
+    monkeypatch.setattr(replica_module, "_lag_cache", {})
+    monkeypatch.setattr(replica_module, "_measure_lag", lambda engine: lags[engine])
+    yield replica_engine
+    replica_engine.dispose()
+
+
+def read_replica_only_user(**kwargs):
+    with read_session_scope(**kwargs) as session:
+        return session.get(User, REPLICA_ONLY_USER_ID)
+
+
+def set_lag(lags, replica, lag, monkeypatch):
+    lags[replica] = lag
+    # Önbellekteki eski ölçüm beklenmesin
+    monkeypatch.setattr(replica_module, "_lag_cache", {})
+
+
+def test_reads_go_to_replica_within_lag(replica):
+    assert get_read_engine() is replica
+    assert read_replica_only_user() is not None
+
+
+def test_lagging_replica_falls_back_to_primary(replica, lags, monkeypatch):
+    set_lag(lags, replica, 2.0, monkeypatch)
+
+    assert get_read_engine(max_lag=1.0) is engine
+    assert read_replica_only_user(max_lag=1.0) is None
+    assert get_read_engine(max_lag=5.0) is replica
+
+
+def test_zero_max_lag_forces_primary_unless_replica_is_current(replica, lags, monkeypatch):
+    set_lag(lags, replica, 0.5, monkeypatch)
+    assert read_replica_only_user(max_lag=0) is None
+    assert get_read_engine(max_lag=0) is engine
+
+
+def test_unreachable_replica_falls_back_to_primary(replica, lags, monkeypatch):
+    set_lag(lags, replica, None, monkeypatch)
+    assert get_read_engine() is engine
+
+
+def test_passed_session_stays_on_primary(replica, session):
+    # Kendi yazdığını okuma: istek kapsamındaki session replikaya değil primary'ye bağlı kalır
+    user = User(name="Primary", surname="Write", phone_number="5800000001")
+    session.add(user)
+    session.flush()
+
+    with read_session_scope(session) as read_session:
+        assert read_session is session
+        assert read_session.get(User, user.id) is user
+        assert read_session.get(User, REPLICA_ONLY_USER_ID) is None
+    session.rollback()
+
+
+def test_lag_is_cached_between_checks(replica, monkeypatch):
+    calls = []
+    monkeypatch.setattr(replica_module, "_measure_lag", lambda engine: calls.append(engine) or 0.0)
+
+    for _ in range(5):
+        get_read_engine()
+
+    assert calls == [replica]
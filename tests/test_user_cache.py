@@ -0,0 +1,49 @@
+"""Telefon önbelleği kullanıcı yazmalarında commit'ten sonra, rollback'te hiç geçersiz kılınmaz"""
+import pytest
+from sqlmodel import Session
+from app.crud.user_crud import create_user, get_user_profile_by_phone, phone_cache, update_user
+from app.models.user import User
+
+
+@pytest.fixture
+def unit_of_work(engine):
+    """İstek kapsamındaki session gibi: CRUD fonksiyonları yalnızca flush eder"""
+    with Session(engine) as session:
+        session.info["unit_of_work"] = True
+        yield session
+        session.rollback()
+
+
+def test_update_evicts_profile_only_after_commit(unit_of_work, make_user):
+    user = make_user(subscribed=False)
+    assert get_user_profile_by_phone(user.phone_number).name == "Test"
+
+    update_user(user.id, {"name": "Updated"}, session=unit_of_work)
+    # Flush edildi ama commit edilmedi: eş zamanlı okuma eski profili görür ve önbelleğe yazar
+    assert get_user_profile_by_phone(user.phone_number).name == "Test"
+
+    unit_of_work.commit()
+    assert get_user_profile_by_phone(user.phone_number).name == "Updated"
+
+
+def test_rolled_back_update_keeps_cached_profile(unit_of_work, make_user):
+    user = make_user(subscribed=False)
+    cached = get_user_profile_by_phone(user.phone_number)
+
+    update_user(user.id, {"name": "Discarded"}, session=unit_of_work)
+    unit_of_work.rollback()
+    unit_of_work.commit()
+
+    assert phone_cache.get(user.phone_number) is cached
+    assert get_user_profile_by_phone(user.phone_number).name == "Test"
+
+
+def test_create_clears_negative_entry_after_commit(unit_of_work):
+    phone_number = "5730000001"
+    assert get_user_profile_by_phone(phone_number) is None
+
+    create_user(User(name="New", surname="User", phone_number=phone_number), session=unit_of_work)
+    assert get_user_profile_by_phone(phone_number) is None
+
+    unit_of_work.commit()
+    assert get_user_profile_by_phone(phone_number).name == "New"
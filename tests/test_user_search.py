@@ -0,0 +1,68 @@
+"""Müşteri arama: en iyi eşleşme tüm eşleşmeler arasından seçilir, toplam sayı sınırlıdır
+
+Testler SQLite'ta process içi TrigramIndex'i kullanır; sıralama ve kısa terim kuralları
+Postgres yoluyla aynıdır.
+"""
+from datetime import datetime
+import pytest
+from sqlalchemy import insert
+from app.crud.user_search import SEARCH_CANDIDATE_CAP, search_users, user_search_index
+from app.models.user import User
+
+
+@pytest.fixture(scope="module")
+def search_users_seeded(engine):
+    now = datetime.utcnow()
+    # Zayıf eşleşmeler önce, en iyi eşleşme ("Qzv Qzv") en son eklenir
+    rows = [
+        {"name": f"Qzvxyw{number}", "surname": "Soyad", "phone_number": f"571{number:07d}", "is_active": True, "created_at": now}
+        for number in range(SEARCH_CANDIDATE_CAP + 5)
+    ]
+    rows += [
+        {"name": "Qzv", "surname": "Qzv", "phone_number": "5720000001", "is_active": True, "created_at": now},
+        {"name": "Bxq", "surname": "Kisa", "phone_number": "5720000002", "is_active": True, "created_at": now},
+        {"name": "Abxq", "surname": "Orta", "phone_number": "5720000003", "is_active": True, "created_at": now},
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(User.__table__), rows)
+    # Core insert kullanıcı yazma yollarını atladığı için index elle tazelenir
+    user_search_index.invalidate()
+
+
+def test_best_match_ranks_first_among_more_than_cap_matches(search_users_seeded):
+    result = search_users("qzv", limit=3)
+
+    assert (result.hits[0].name, result.hits[0].surname) == ("Qzv", "Qzv")
+    assert result.hits[0].score == 1.0
+    assert [hit.score for hit in result.hits] == sorted((hit.score for hit in result.hits), reverse=True)
+    assert result.total_found == SEARCH_CANDIDATE_CAP
+    assert result.total_capped
+
+
+def test_count_below_cap_is_exact(search_users_seeded):
+    result = search_users("qzvxyw100", limit=50)
+
+    # qzvxyw100 ve qzvxyw1000..1004
+    assert result.total_found == 6
+    assert not result.total_capped
+    assert result.hits[0].name == "Qzvxyw100"
+
+
+def test_short_term_matches_prefix_only(search_users_seeded):
+    names = {hit.name for hit in search_users("bx", limit=50).hits}
+
+    assert "Bxq" in names
+    assert "Abxq" not in names
+    assert all(hit.phone_number.startswith("57") for hit in search_users("57", limit=50).hits)
+    assert search_users("71", limit=50).total_found == 0
+
+
+def test_quick_search_reports_capped_total(search_users_seeded, client):
+    response = client.get("/api/v1/customer-service/quick-search/qzv", params={"limit": 2})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["results"][0]["name"] == "Qzv Qzv"
+    assert len(body["results"]) == 2
+    assert body["total_found"] == SEARCH_CANDIDATE_CAP
+    assert body["total_capped"] is True